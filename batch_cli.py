@@ -0,0 +1,160 @@
+"""批量查询命令行工具
+
+不依赖 tkinter，可在服务器或流水线中运行。进度输出到标准输出，
+使用 --json 时每行输出一个 JSON 事件，便于其他程序解析；调试日志输出到标准错误。
+
+用法:
+    python batch_cli.py input.xlsx
+    python batch_cli.py a.xlsx b.csv --output-dir results --format csv --workers 8
+    python batch_cli.py big.csv --json --threshold 0.5 --top-k 3
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+from batch_io import OUTPUT_FORMATS
+from batch_processor import BatchProcessor
+from tariff_api import TariffAPI
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ('completed', 'error', 'cancelled')
+
+
+def _emit(event: Dict, as_json: bool):
+    """输出一条进度事件"""
+    if as_json:
+        print(json.dumps(event, ensure_ascii=False), flush=True)
+        return
+
+    if event['event'] == 'progress':
+        print(
+            f"[{event['job_id']}] {event['file_name']}: {event['status']} "
+            f"{event['progress']*100:.1f}% ({event['processed']} 行, {event['throughput']:.1f} 行/秒)",
+            flush=True
+        )
+    elif event['event'] == 'finished':
+        if event['status'] == 'completed':
+            print(f"[{event['job_id']}] 完成: {event['output_file']}", flush=True)
+        else:
+            print(f"[{event['job_id']}] {event['status']}: {event.get('error') or ''}", flush=True)
+    elif event['event'] == 'summary':
+        print(
+            f"共 {event['jobs']} 个文件，成功 {event['completed']} 个，"
+            f"处理 {event['rows']} 行，耗时 {event['elapsed']:.1f} 秒",
+            flush=True
+        )
+
+
+def run(input_files: List[str], output_dir: str = "output", output_format: str = "xlsx",
+        workers: int = 0, threshold: float = 0.2, top_k: int = 1, db_path: str = "tariffs.db",
+        chunk_size: int = 1000, as_json: bool = False, interval: float = 1.0,
+        snapshot_path: Optional[str] = None) -> int:
+    """处理输入文件并输出进度
+
+    Returns:
+        退出码，全部成功为0
+    """
+    start = time.time()
+    processor = BatchProcessor(
+        output_dir=output_dir,
+        api=TariffAPI(db_path, snapshot_path),
+        chunk_size=chunk_size,
+        max_workers=max(1, min(len(input_files), 2)),
+        fuzzy_threshold=threshold,
+        top_k=top_k,
+        processes=workers,
+    )
+
+    job_ids = [processor.submit_file(path, output_format) for path in input_files]
+    reported = set()
+    last_processed = {}
+
+    try:
+        while True:
+            # 命令行不显示逐行日志，及时清空避免占用内存
+            processor.get_logs()
+
+            jobs = [processor.get_job(job_id) for job_id in job_ids]
+            for job in jobs:
+                if job['job_id'] in reported:
+                    continue
+                if job['status'] in FINISHED_STATUSES:
+                    reported.add(job['job_id'])
+                    _emit({'event': 'finished', **job}, as_json)
+                elif job['status'] == 'processing' and last_processed.get(job['job_id']) != job['processed']:
+                    # 只在进度变化时输出
+                    last_processed[job['job_id']] = job['processed']
+                    _emit({'event': 'progress', **job}, as_json)
+
+            if len(reported) == len(job_ids):
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        for job_id in job_ids:
+            processor.cancel_job(job_id)
+        logger.warning("已取消所有任务")
+    finally:
+        processor.shutdown()
+
+    jobs = [processor.get_job(job_id) for job_id in job_ids]
+    completed = [job for job in jobs if job['status'] == 'completed']
+    _emit({
+        'event': 'summary',
+        'jobs': len(jobs),
+        'completed': len(completed),
+        'rows': sum(job['processed'] for job in jobs),
+        'elapsed': time.time() - start,
+        'outputs': [job['output_file'] for job in completed],
+    }, as_json)
+
+    return 0 if len(completed) == len(jobs) else 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="批量查询商品编码税率")
+    parser.add_argument('inputs', nargs='+', help="输入的Excel或CSV文件，需包含code列")
+    parser.add_argument('-o', '--output-dir', default="output", help="输出目录")
+    parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS, default='xlsx', help="输出格式")
+    parser.add_argument('-w', '--workers', type=int, default=0,
+                        help="匹配进程数，0表示在当前进程中匹配")
+    parser.add_argument('--threshold', type=float, default=0.2, help="模糊匹配相似度阈值(0-1)")
+    parser.add_argument('--top-k', type=int, default=1, help="每个编码输出的候选数")
+    parser.add_argument('--db', default="tariffs.db", help="数据库文件")
+    parser.add_argument('--snapshot', help="tariff_snapshot.py 导出的快照，用于精确匹配")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="每块处理的编码数")
+    parser.add_argument('--json', action='store_true', help="以JSON行格式输出进度")
+    parser.add_argument('--interval', type=float, default=1.0, help="进度输出间隔(秒)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+
+    missing = [path for path in args.inputs if not os.path.exists(path)]
+    if missing:
+        logger.error(f"文件不存在: {', '.join(missing)}")
+        return 2
+    if not os.path.exists(args.db):
+        logger.error(f"数据库不存在: {args.db}")
+        return 2
+
+    return run(
+        args.inputs,
+        output_dir=args.output_dir,
+        output_format=args.format,
+        workers=args.workers,
+        threshold=args.threshold,
+        top_k=args.top_k,
+        db_path=args.db,
+        chunk_size=args.chunk_size,
+        as_json=args.json,
+        interval=args.interval,
+        snapshot_path=args.snapshot,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
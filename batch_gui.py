@@ -1,9 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import threading
-import queue
 import logging
 from batch_processor import BatchProcessor
+from ui_dispatcher import UIDispatcher
+from log_buffer import TextLogView
 import os
 import webbrowser
 
@@ -13,7 +13,6 @@ class BatchProcessFrame(ttk.Frame):
     def __init__(self, master):
         super().__init__(master)
         self.processor = BatchProcessor()
-        self.update_queue = queue.Queue()
         self.create_widgets()
         self.layout_widgets()
         self.setup_periodic_updates()
@@ -37,6 +36,15 @@ class BatchProcessFrame(ttk.Frame):
             text="开始处理",
             command=self.start_processing
         )
+        # 输出格式
+        self.format_var = tk.StringVar(value='xlsx')
+        self.format_combo = ttk.Combobox(
+            self.file_frame,
+            textvariable=self.format_var,
+            values=('xlsx', 'csv'),
+            state='readonly',
+            width=6
+        )
         # 添加下载模板按钮
         self.template_btn = ttk.Button(
             self.file_frame,
@@ -58,6 +66,32 @@ class BatchProcessFrame(ttk.Frame):
             textvariable=self.status_var
         )
 
+        # 任务队列部分
+        self.job_frame = ttk.LabelFrame(self, text="任务队列")
+        job_columns = ('任务ID', '文件', '状态', '进度', '速度(行/秒)')
+        self.job_tree = ttk.Treeview(
+            self.job_frame,
+            columns=job_columns,
+            show='headings',
+            height=4
+        )
+        for col in job_columns:
+            self.job_tree.heading(col, text=col)
+            self.job_tree.column(col, width=100)
+        self.job_tree.column('文件', width=200)
+        self.job_scroll = ttk.Scrollbar(
+            self.job_frame,
+            command=self.job_tree.yview
+        )
+        self.job_tree.configure(yscrollcommand=self.job_scroll.set)
+        self.cancel_btn = ttk.Button(
+            self.job_frame,
+            text="取消选中任务",
+            command=self.cancel_selected_jobs
+        )
+        # 已完成并处理过的任务
+        self.finished_jobs = set()
+
         # 日志显示部分
         self.log_frame = ttk.LabelFrame(self, text="处理日志")
         self.log_text = tk.Text(
@@ -74,7 +108,7 @@ class BatchProcessFrame(ttk.Frame):
 
         # 历史记录部分
         self.history_frame = ttk.LabelFrame(self, text="历史记录")
-        columns = ('文件名', '处理时间', '大小')
+        columns = ('文件名', '处理时间', '大小', '状态', '速度(行/秒)')
         self.history_tree = ttk.Treeview(
             self.history_frame,
             columns=columns,
@@ -113,6 +147,7 @@ class BatchProcessFrame(ttk.Frame):
         self.file_frame.pack(fill=tk.X, padx=5, pady=5)
         self.file_entry.pack(side=tk.LEFT, padx=5, pady=5)
         self.browse_btn.pack(side=tk.LEFT, padx=5, pady=5)
+        self.format_combo.pack(side=tk.LEFT, padx=5, pady=5)
         self.process_btn.pack(side=tk.LEFT, padx=5, pady=5)
         self.template_btn.pack(side=tk.LEFT, padx=5, pady=5)
 
@@ -121,6 +156,12 @@ class BatchProcessFrame(ttk.Frame):
         self.progress_bar.pack(fill=tk.X, padx=5, pady=5)
         self.status_label.pack(padx=5, pady=5)
 
+        # 任务队列布局
+        self.job_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.cancel_btn.pack(side=tk.BOTTOM, anchor=tk.W, padx=5, pady=5)
+        self.job_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.job_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
         # 日志显示布局
         self.log_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         self.log_scroll.pack(side=tk.RIGHT, fill=tk.Y)
@@ -137,57 +178,49 @@ class BatchProcessFrame(ttk.Frame):
         self.refresh_btn.pack(side=tk.LEFT, padx=5)
 
     def browse_file(self):
-        """选择Excel文件"""
-        file_path = filedialog.askopenfilename(
-            filetypes=[("Excel files", "*.xlsx *.xls")]
+        """选择Excel文件，可多选"""
+        file_paths = filedialog.askopenfilenames(
+            filetypes=[("Excel files", "*.xlsx *.xls"), ("CSV files", "*.csv")]
         )
-        if file_path:
-            self.file_path_var.set(file_path)
+        if file_paths:
+            self.file_path_var.set(";".join(file_paths))
 
     def start_processing(self):
-        """开始处理文件"""
-        file_path = self.file_path_var.get()
-        if not file_path:
+        """把选中的文件加入任务队列"""
+        file_paths = [p for p in self.file_path_var.get().split(";") if p.strip()]
+        if not file_paths:
             messagebox.showerror("错误", "请先选择要处理的文件")
             return
 
-        if not os.path.exists(file_path):
-            messagebox.showerror("错误", "文件不存在")
+        missing = [p for p in file_paths if not os.path.exists(p)]
+        if missing:
+            messagebox.showerror("错误", f"文件不存在: {missing[0]}")
             return
 
-        # 禁用按钮
-        self.process_btn.configure(state='disabled')
-        self.browse_btn.configure(state='disabled')
-
-        # 清空日志
-        self.log_text.delete(1.0, tk.END)
+        for file_path in file_paths:
+            self.processor.submit_file(file_path, self.format_var.get())
+        self.file_path_var.set("")
+        self.refresh_jobs()
 
-        # 启动处理线程
-        thread = threading.Thread(
-            target=self._process_file,
-            args=(file_path,),
-            daemon=True
-        )
-        thread.start()
+    def cancel_selected_jobs(self):
+        """取消选中的任务"""
+        selection = self.job_tree.selection()
+        if not selection:
+            messagebox.showwarning("警告", "请先选择要取消的任务")
+            return
 
-    def _process_file(self, file_path: str):
-        """在后台线程中处理文件"""
-        try:
-            output_file = self.processor.process_file(file_path)
-            if output_file:
-                self.update_queue.put(("success", f"处理完成: {output_file}"))
-                self.refresh_history()
-            else:
-                self.update_queue.put(("error", "处理失败"))
-        except Exception as e:
-            self.update_queue.put(("error", f"处理出错: {str(e)}"))
-        finally:
-            self.update_queue.put(("enable_buttons", None))
+        # 表格项ID即任务ID
+        for job_id in selection:
+            self.processor.cancel_job(job_id)
 
     def setup_periodic_updates(self):
-        """设置定期更新UI的任务"""
+        """处理器状态变化时刷新UI，代替定时轮询；短时间内的多次变化合并为一次刷新"""
+        self.dispatcher = UIDispatcher.for_widget(self)
+        self.log_view = TextLogView(self.log_text, self.dispatcher.log)
+        self.processor.set_change_callback(
+            lambda: self.dispatcher.latest((self, 'update_ui'), self.update_ui)
+        )
         self.update_ui()
-        self.after(100, self.setup_periodic_updates)
 
     def update_ui(self):
         """更新UI显示"""
@@ -200,21 +233,43 @@ class BatchProcessFrame(ttk.Frame):
         )
 
         # 更新日志
-        logs = self.processor.get_logs()
-        for log in logs:
-            self.log_text.insert(tk.END, log + "\n")
-            self.log_text.see(tk.END)
-
-        # 处理更新队列中的消息
-        while not self.update_queue.empty():
-            msg_type, msg = self.update_queue.get()
-            if msg_type == "success":
-                messagebox.showinfo("成功", msg)
-            elif msg_type == "error":
-                messagebox.showerror("错误", msg)
-            elif msg_type == "enable_buttons":
-                self.process_btn.configure(state='normal')
-                self.browse_btn.configure(state='normal')
+        for log in self.processor.get_logs():
+            self.log_view.add(log)
+
+        # 更新任务列表
+        self.refresh_jobs()
+
+    def refresh_jobs(self):
+        """刷新任务列表，已有任务原地更新，任务刚结束时提示处理结果"""
+        history_changed = False
+        notices = []
+        for job in self.processor.get_jobs():
+            values = (
+                job['job_id'],
+                job['file_name'],
+                job['status'],
+                f"{job['progress']*100:.1f}%",
+                f"{job['throughput']:.1f}"
+            )
+            if self.job_tree.exists(job['job_id']):
+                self.job_tree.item(job['job_id'], values=values)
+            else:
+                self.job_tree.insert('', 'end', iid=job['job_id'], values=values)
+
+            if job['status'] in ('completed', 'error', 'cancelled') \
+                    and job['job_id'] not in self.finished_jobs:
+                self.finished_jobs.add(job['job_id'])
+                history_changed = True
+                if job['status'] == 'completed':
+                    notices.append((messagebox.showinfo, "成功", f"处理完成: {job['output_file']}"))
+                elif job['status'] == 'error':
+                    notices.append((messagebox.showerror, "错误", f"处理出错: {job['error'] or job['file_name']}"))
+
+        if history_changed:
+            self.refresh_history()
+        # 提示框会阻塞，放在列表和历史记录刷新之后
+        for show, title, message in notices:
+            show(title, message)
 
     def refresh_history(self):
         """刷新历史记录"""
@@ -230,7 +285,9 @@ class BatchProcessFrame(ttk.Frame):
                 values=(
                     file_info['filename'],
                     file_info['time'],
-                    file_info['size']
+                    file_info['size'],
+                    file_info['status'],
+                    f"{file_info['throughput']:.1f}" if file_info['throughput'] else ''
                 ),
                 tags=(file_info['path'],)
             )
@@ -247,9 +304,10 @@ class BatchProcessFrame(ttk.Frame):
             file_path = self.history_tree.item(item)['tags'][0]
             if os.path.exists(file_path):
                 # 打开文件保存对话框
+                extension = os.path.splitext(file_path)[1] or ".xlsx"
                 save_path = filedialog.asksaveasfilename(
-                    defaultextension=".xlsx",
-                    filetypes=[("Excel files", "*.xlsx")],
+                    defaultextension=extension,
+                    filetypes=[(f"{extension[1:].upper()} files", f"*{extension}")],
                     initialfile=os.path.basename(file_path)
                 )
                 if save_path:
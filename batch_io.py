@@ -0,0 +1,253 @@
+"""批量处理的文件读写
+
+输入按块流式读取（openpyxl 只读模式或 CSV），不再把整个工作簿加载为 DataFrame，
+内存占用与输入文件大小无关。
+"""
+import csv
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CODE_COLUMN = 'code'
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+CSV_EXTENSIONS = ('.csv', '.txt')
+
+
+class MissingCodeColumnError(ValueError):
+    """输入文件缺少 code 列"""
+
+
+def _cell_to_code(value) -> Optional[str]:
+    """把单元格的值转换为编码文本，与 pandas 按 str 读取的结果保持一致"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    code = str(value).strip()
+    return code or None
+
+
+def _find_code_column(header, file_type: str = "Excel") -> int:
+    """在表头中查找 code 列"""
+    for index, name in enumerate(header or ()):
+        if name is not None and str(name).strip() == CODE_COLUMN:
+            return index
+    raise MissingCodeColumnError(f"错误：{file_type}文件必须包含'code'列")
+
+
+def _iter_excel_codes(file_path: str) -> Iterator[str]:
+    """以只读模式逐行读取 Excel 中的编码"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        column = _find_code_column(next(rows, None))
+
+        for row in rows:
+            if column < len(row):
+                code = _cell_to_code(row[column])
+                if code:
+                    yield code
+    finally:
+        workbook.close()
+
+
+def _iter_csv_codes(file_path: str) -> Iterator[str]:
+    """逐行读取 CSV 中的编码"""
+    with open(file_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        column = _find_code_column(next(reader, None), "CSV")
+
+        for row in reader:
+            if column < len(row):
+                code = _cell_to_code(row[column])
+                if code:
+                    yield code
+
+
+def _iter_legacy_excel_codes(file_path: str) -> Iterator[str]:
+    """旧版 .xls 文件不支持流式读取，回退到 pandas"""
+    import pandas as pd
+
+    df = pd.read_excel(file_path, dtype={CODE_COLUMN: str})
+    if CODE_COLUMN not in df.columns:
+        raise MissingCodeColumnError("错误：Excel文件必须包含'code'列")
+    for value in df[CODE_COLUMN]:
+        if isinstance(value, str):
+            code = _cell_to_code(value)
+            if code:
+                yield code
+
+
+def iter_codes(file_path: str) -> Iterator[str]:
+    """按文件类型逐个读取编码
+
+    Raises:
+        MissingCodeColumnError: 文件没有 code 列
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in CSV_EXTENSIONS:
+        return _iter_csv_codes(file_path)
+    if extension == '.xls':
+        return _iter_legacy_excel_codes(file_path)
+    return _iter_excel_codes(file_path)
+
+
+def iter_code_chunks(file_path: str, chunk_size: int = 1000) -> Iterator[List[str]]:
+    """按块读取编码，每块最多 chunk_size 个"""
+    chunk = []
+    for code in iter_codes(file_path):
+        chunk.append(code)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def estimate_rows(file_path: str) -> int:
+    """估算数据行数，用于显示进度；无法确定时返回0"""
+    extension = os.path.splitext(file_path)[1].lower()
+    try:
+        if extension in CSV_EXTENSIONS:
+            with open(file_path, 'rb') as f:
+                return max(sum(1 for _ in f) - 1, 0)
+        if extension in EXCEL_EXTENSIONS:
+            from openpyxl import load_workbook
+
+            workbook = load_workbook(file_path, read_only=True)
+            try:
+                # 只读模式下 max_row 来自工作表的 dimension 记录，无需遍历
+                max_row = workbook.active.max_row
+            finally:
+                workbook.close()
+            return max((max_row or 0) - 1, 0)
+    except Exception as e:
+        logger.warning(f"估算行数失败: {str(e)}")
+    return 0
+
+
+RESULT_COLUMNS = ['code', 'rate', 'ni_rate', '相似度']
+OUTPUT_FORMATS = ('xlsx', 'csv', 'parquet')
+
+
+class ResultWriter(ABC):
+    """结果写入器基类，逐行写入，不在内存中保留结果"""
+
+    def __init__(self, path: str, columns: List[str] = None):
+        self.path = path
+        self.columns = columns or RESULT_COLUMNS
+        self.rows_written = 0
+
+    def write_row(self, row: dict):
+        self._write([row.get(column) for column in self.columns])
+        self.rows_written += 1
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write_row(row)
+
+    @abstractmethod
+    def _write(self, values: list):
+        """写入一行"""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ExcelResultWriter(ResultWriter):
+    """openpyxl 只写模式，code 列在写入时即设置为文本格式"""
+
+    def __init__(self, path: str, columns: List[str] = None):
+        super().__init__(path, columns)
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+
+        self._cell_class = WriteOnlyCell
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet('Sheet1')
+        self.sheet.append(self.columns)
+
+    def _write(self, values: list):
+        code = self._cell_class(self.sheet, value=values[0])
+        code.number_format = '@'
+        self.sheet.append([code] + values[1:])
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class CsvResultWriter(ResultWriter):
+    """CSV 输出，使用带 BOM 的 UTF-8 以便 Excel 正确识别中文表头"""
+
+    def __init__(self, path: str, columns: List[str] = None):
+        super().__init__(path, columns)
+        self.file = open(path, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.columns)
+
+    def _write(self, values: list):
+        self.writer.writerow(['' if value is None else value for value in values])
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetResultWriter(ResultWriter):
+    """Parquet 输出，按行组分批写入，所有列均为字符串类型"""
+
+    def __init__(self, path: str, columns: List[str] = None, row_group_size: int = 10000):
+        super().__init__(path, columns)
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("输出Parquet格式需要安装 pyarrow")
+
+        self._pa = pa
+        self.schema = pa.schema([(column, pa.string()) for column in self.columns])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.row_group_size = row_group_size
+        self.buffer = []
+
+    def _write(self, values: list):
+        self.buffer.append(values)
+        if len(self.buffer) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        arrays = [
+            self._pa.array([None if row[i] is None else str(row[i]) for row in self.buffer],
+                           type=self._pa.string())
+            for i in range(len(self.columns))
+        ]
+        self.writer.write_table(self._pa.Table.from_arrays(arrays, schema=self.schema))
+        self.buffer = []
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+
+def open_result_writer(path: str, output_format: str = 'xlsx',
+                       columns: List[str] = None) -> ResultWriter:
+    """按格式创建结果写入器"""
+    if output_format == 'csv':
+        return CsvResultWriter(path, columns)
+    if output_format == 'parquet':
+        return ParquetResultWriter(path, columns)
+    if output_format == 'xlsx':
+        return ExcelResultWriter(path, columns)
+    raise ValueError(f"不支持的输出格式: {output_format}")
@@ -1,120 +1,427 @@
-import pandas as pd
 import logging
 from datetime import datetime
 import os
-from typing import List, Dict, Optional
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Iterator, List, Dict, Optional
 from tariff_api import TariffAPI
+from batch_io import (
+    iter_code_chunks,
+    estimate_rows,
+    open_result_writer,
+    MissingCodeColumnError,
+    RESULT_COLUMNS
+)
 import queue
 import threading
 
 logger = logging.getLogger(__name__)
 
+# 两条进度日志之间的最小间隔（秒）
+PROGRESS_LOG_INTERVAL = 1.0
+
+# 返回多个候选（top_k > 1）时的输出列
+TOP_K_COLUMNS = ['code', 'rank', 'match_code', 'rate', 'ni_rate', '相似度']
+
+
+def match_codes(api: TariffAPI, codes: List[str], threshold: float = 0.2,
+                top_k: int = 1) -> List[Dict]:
+    """为一组编码查找最佳匹配
+
+    top_k 为1时每个编码输出一行；大于1时每个候选输出一行，并附带排名和匹配到的编码。
+    """
+    results = []
+    for code in codes:
+        # 使用模糊搜索找到最佳匹配
+        matches = api.fuzzy_search(code, limit=top_k, threshold=threshold)
+        if top_k > 1:
+            for rank, match in enumerate(matches, start=1):
+                results.append({
+                    'code': code,
+                    'rank': rank,
+                    'match_code': match['code'],
+                    'rate': match['rate'],
+                    'ni_rate': match['north_ireland_rate'],
+                    '相似度': f"{match['similarity']*100:.1f}%"
+                })
+            if matches:
+                continue
+
+        if matches:
+            best_match = matches[0]
+            results.append({
+                'code': code,  # 使用原始code
+                'rate': best_match['rate'],
+                'ni_rate': best_match['north_ireland_rate'],
+                '相似度': f"{best_match['similarity']*100:.1f}%"
+            })
+        else:
+            results.append({
+                'code': code,  # 使用原始code
+                'rate': '',
+                'ni_rate': '',
+                '相似度': "0.0%"
+            })
+    return results
+
+
+# 多进程匹配时每个工作进程持有自己的 TariffAPI 和内存索引
+_worker_api = None
+_worker_options = {}
+
+
+def _init_match_worker(db_path: str, threshold: float, top_k: int,
+                       snapshot_path: Optional[str] = None):
+    """初始化匹配进程
+
+    没有快照时预先加载内存索引。提供快照时各进程映射同一个快照文件，精确匹配共享一份页缓存，
+    内存索引在第一次需要模糊匹配时才加载，只有精确匹配的进程不必读取整张表。
+    """
+    global _worker_api, _worker_options
+    _worker_api = TariffAPI(db_path, snapshot_path)
+    if snapshot_path is None:
+        _worker_api.load_index()
+    _worker_options = {'threshold': threshold, 'top_k': top_k}
+
+
+def _match_chunk_in_worker(codes: List[str]) -> List[Dict]:
+    return match_codes(_worker_api, codes, **_worker_options)
+
+
+class BatchJob:
+    """批量处理任务"""
+
+    def __init__(self, file_path: str, output_format: str = 'xlsx'):
+        self.job_id = uuid.uuid4().hex[:8]
+        self.file_path = file_path
+        self.file_name = os.path.basename(file_path)
+        self.output_format = output_format
+        self.output_file = None
+        self.status = "queued"
+        self.progress = 0
+        self.total = 0
+        self.processed = 0
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("completed", "error", "cancelled")
+
+    @property
+    def throughput(self) -> float:
+        """处理速度（行/秒）"""
+        if not self.started_at:
+            return 0.0
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.job_id,
+            'file_name': self.file_name,
+            'file_path': self.file_path,
+            'output_file': self.output_file,
+            'status': self.status,
+            'progress': self.progress,
+            'total': self.total,
+            'processed': self.processed,
+            'throughput': self.throughput,
+            'error': self.error,
+        }
+
+
 class BatchProcessor:
-    def __init__(self, output_dir: str = "output"):
-        self.api = TariffAPI()
+    def __init__(self, output_dir: str = "output", api: Optional[TariffAPI] = None,
+                 chunk_size: int = 1000, max_workers: int = 2,
+                 fuzzy_threshold: float = 0.2, top_k: int = 1, processes: int = 0):
+        """
+        Args:
+            output_dir: 输出目录
+            api: 共享的 TariffAPI，默认新建
+            chunk_size: 每次读取和匹配的编码数
+            max_workers: 同时处理的任务（文件）数
+            fuzzy_threshold: 模糊匹配相似度阈值
+            top_k: 每个编码输出的候选数
+            processes: 大于0时使用多进程匹配，适合多核服务器上的大文件
+        """
+        self.api = api or TariffAPI()
         self.output_dir = output_dir
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.fuzzy_threshold = fuzzy_threshold
+        self.top_k = top_k
+        self.processes = processes
+        self._process_pool = None
         self.progress = 0
         self.total = 0
         self.status = "idle"
         self.log_queue = queue.Queue()
         self.current_file = None
+        self._change_callback = None
+
+        # 任务队列，所有工作线程共享同一个 TariffAPI 及其内存索引
+        self.jobs: Dict[str, BatchJob] = {}
+        self._jobs_lock = threading.Lock()
+        self._executor = None
 
         # 创建输出目录
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
-    def process_file(self, file_path: str) -> Optional[str]:
-        """处理Excel文件
+    def set_change_callback(self, callback: Optional[Callable]):
+        """设置状态变化回调，有新日志或进度变化时在工作线程中调用，界面据此刷新而不必轮询"""
+        self._change_callback = callback
+
+    def _notify(self):
+        callback = self._change_callback
+        if callback:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"状态变化回调失败: {str(e)}")
+
+    def _log(self, message: str):
+        self.log_queue.put(message)
+        self._notify()
+
+    def submit_file(self, file_path: str, output_format: str = 'xlsx') -> str:
+        """提交文件到任务队列
+
+        Returns:
+            任务ID
+        """
+        job = BatchJob(file_path, output_format)
+        with self._jobs_lock:
+            self.jobs[job.job_id] = job
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="batch-worker"
+                )
+            self._executor.submit(self._run_job, job)
+        self._log(f"[{job.job_id}] 已加入队列: {job.file_name}")
+        return job.job_id
+
+    def cancel_job(self, job_id: str) -> bool:
+        """取消任务，排队中的任务不会再开始，处理中的任务在下一行前停止"""
+        job = self.jobs.get(job_id)
+        if not job or job.is_finished:
+            return False
+        job.cancel_event.set()
+        self._log(f"[{job.job_id}] 正在取消: {job.file_name}")
+        return True
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        job = self.jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def get_jobs(self) -> List[Dict]:
+        """获取所有任务的状态，按提交顺序排列"""
+        with self._jobs_lock:
+            jobs = list(self.jobs.values())
+        return [job.to_dict() for job in jobs]
+
+    def shutdown(self, wait: bool = True):
+        """取消排队中的任务并关闭工作线程"""
+        with self._jobs_lock:
+            for job in self.jobs.values():
+                if job.status == "queued":
+                    job.cancel_event.set()
+            executor, self._executor = self._executor, None
+            process_pool, self._process_pool = self._process_pool, None
+        if executor:
+            executor.shutdown(wait=wait)
+        if process_pool:
+            process_pool.shutdown(wait=wait)
+
+    def process_file(self, file_path: str, output_format: str = 'xlsx') -> Optional[str]:
+        """处理Excel/CSV文件（在当前线程中同步执行）
 
         Args:
-            file_path: Excel文件路径
+            file_path: Excel或CSV文件路径
+            output_format: 输出格式，xlsx、csv 或 parquet
 
         Returns:
             输出文件路径，处理失败返回None
         """
-        try:
-            # 读取Excel文件，将code列作为文本处理
-            df = pd.read_excel(file_path, dtype={'code': str})
-            if 'code' not in df.columns:
-                self.log_queue.put("错误：Excel文件必须包含'code'列")
-                return None
+        job = BatchJob(file_path, output_format)
+        with self._jobs_lock:
+            self.jobs[job.job_id] = job
+        return self._run_job(job)
 
-            self.total = len(df)
-            self.progress = 0
-            self.status = "processing"
-            self.current_file = os.path.basename(file_path)
-
-            # 处理每一行
-            results = []
-            for index, row in df.iterrows():
-                # 获取code并且去掉空格
-                code = str(row['code']).strip()
-
-                # 使用模糊搜索找到最佳匹配
-                matches = self.api.fuzzy_search(code, limit=1)
-                if matches:
-                    best_match = matches[0]
-                    results.append({
-                        'code': code,  # 使用原始code
-                        'rate': best_match['rate'],
-                        'ni_rate': best_match['north_ireland_rate'],
-                        '相似度': f"{best_match['similarity']*100:.1f}%"
-                    })
-                else:
-                    results.append({
-                        'code': code,  # 使用原始code
-                        'rate': '',
-                        'ni_rate': '',
-                        '相似度': "0.0%"
-                    })
+    def _output_path(self, job: BatchJob) -> str:
+        """生成输出文件名
 
-                self.progress = (index + 1) / self.total
-                self.log_queue.put(f"处理进度: {self.progress*100:.1f}% - 正在处理: {code}")
+        结果文件在写入结束时才创建，无法靠检查文件是否存在避免重名，
+        文件名中始终带上任务ID，同一秒内处理同名文件的任务不会互相覆盖。
+        """
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        base_name = os.path.splitext(job.file_name)[0]
+        return os.path.join(
+            self.output_dir,
+            f"processed_{timestamp}_{job.job_id}_{base_name}.{job.output_format}"
+        )
 
-            # 创建结果DataFrame
-            result_df = pd.DataFrame(results)
+    def _run_job(self, job: BatchJob) -> Optional[str]:
+        """执行单个任务"""
+        if job.cancel_event.is_set():
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            self._log(f"[{job.job_id}] 已取消: {job.file_name}")
+            return None
 
-            # 生成输出文件名
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_file = os.path.join(
-                self.output_dir,
-                f"processed_{timestamp}_{os.path.basename(file_path)}"
-            )
+        try:
+            job.started_at = time.time()
+            job.total = estimate_rows(job.file_path)
+            job.status = "processing"
+            self.status = "processing"
+            self.current_file = job.file_name
+            job.output_file = self._output_path(job)
+
+            # 按块流式读取编码，匹配结果直接写入输出文件，code列写入时即为文本格式
+            columns = TOP_K_COLUMNS if self.top_k > 1 else RESULT_COLUMNS
+            with open_result_writer(job.output_file, job.output_format, columns) as writer:
+                last_log = 0.0
+                for codes, results in self._iter_matches(job):
+                    writer.write_rows(results)
+                    job.processed += len(codes)
+                    if job.total:
+                        job.progress = min(job.processed / job.total, 1.0)
+                    # 进度日志按时间限流，大文件不会产生与行数相同数量的日志
+                    now = time.monotonic()
+                    if now - last_log >= PROGRESS_LOG_INTERVAL:
+                        last_log = now
+                        self._log(
+                            f"[{job.job_id}] 处理进度: {job.progress*100:.1f}% - "
+                            f"已处理 {job.processed} 行，当前: {codes[-1] if codes else ''}"
+                        )
+                    self._update_progress(job)
 
-            # 保存结果，确保code列作为文本保存
-            with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-                result_df.to_excel(writer, index=False)
-                # 设置code列为文本格式
-                worksheet = writer.sheets['Sheet1']
-                for cell in worksheet['A']:
-                    cell.number_format = '@'
+            job.finished_at = time.time()
+            if job.cancel_event.is_set():
+                job.status = "cancelled"
+                self._remove_partial_output(job.output_file)
+                job.output_file = None
+                self._log(f"[{job.job_id}] 已取消: {job.file_name}")
+                return None
 
+            job.total = job.processed
+            job.progress = 1.0
+            job.status = "completed"
+            self._update_progress(job)
             self.status = "completed"
-            self.log_queue.put(f"处理完成，结果已保存到: {output_file}")
+            self._log(
+                f"[{job.job_id}] 处理完成，共 {job.processed} 行，"
+                f"{job.throughput:.1f} 行/秒，结果已保存到: {job.output_file}"
+            )
 
-            return output_file
+            return job.output_file
 
+        except MissingCodeColumnError as e:
+            self._fail_job(job, str(e))
+            return None
         except Exception as e:
-            self.status = "error"
             error_msg = f"处理文件失败: {str(e)}"
             logger.error(error_msg)
-            self.log_queue.put(error_msg)
+            self._fail_job(job, error_msg)
             return None
 
+    def _iter_matches(self, job: BatchJob) -> Iterator:
+        """按块产出 (编码, 匹配结果)，保持输入顺序"""
+        chunks = iter_code_chunks(job.file_path, self.chunk_size)
+        if self.processes <= 0:
+            for codes in chunks:
+                if job.cancel_event.is_set():
+                    return
+                yield codes, self.match_codes(codes)
+            return
+
+        # 多进程匹配：限制同时在途的块数，内存占用与文件大小无关
+        pool = self._get_process_pool()
+        pending = deque()
+        for codes in chunks:
+            if job.cancel_event.is_set():
+                break
+            pending.append((codes, pool.submit(_match_chunk_in_worker, codes)))
+            if len(pending) >= self.processes * 2:
+                codes, future = pending.popleft()
+                yield codes, future.result()
+
+        while pending:
+            codes, future = pending.popleft()
+            if job.cancel_event.is_set():
+                future.cancel()
+                continue
+            yield codes, future.result()
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """获取匹配进程池，各进程启动时加载一次索引"""
+        with self._jobs_lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    initializer=_init_match_worker,
+                    initargs=(self.api.db.db_path, self.fuzzy_threshold, self.top_k,
+                              self.api.snapshot_path)
+                )
+            return self._process_pool
+
+    def _fail_job(self, job: BatchJob, error_msg: str):
+        """标记任务失败"""
+        job.status = "error"
+        job.error = error_msg
+        job.finished_at = time.time()
+        self.status = "error"
+        self._log(f"[{job.job_id}] {error_msg}")
+        self._remove_partial_output(job.output_file)
+        job.output_file = None
+
+    def _update_progress(self, job: BatchJob):
+        """更新兼容旧接口的整体进度（最近更新的任务）"""
+        self.progress = job.progress
+        self.total = job.total
+        self.current_file = job.file_name
+        self._notify()
+
+    def _remove_partial_output(self, output_file: Optional[str]):
+        """删除处理失败时留下的不完整输出文件"""
+        if output_file and os.path.exists(output_file):
+            try:
+                os.remove(output_file)
+            except OSError as e:
+                logger.warning(f"删除不完整的输出文件失败: {str(e)}")
+
+    def match_codes(self, codes: List[str]) -> List[Dict]:
+        """为一组编码查找最佳匹配"""
+        return match_codes(self.api, codes, self.fuzzy_threshold, self.top_k)
+
     def get_history_files(self) -> List[Dict]:
-        """获取历史处理文件列表"""
+        """获取历史处理文件列表，附带对应任务的状态和处理速度"""
         try:
+            jobs_by_output = {
+                os.path.abspath(job['output_file']): job
+                for job in self.get_jobs() if job['output_file']
+            }
             files = []
             for file in os.listdir(self.output_dir):
                 if file.startswith("processed_"):
                     file_path = os.path.join(self.output_dir, file)
+                    job = jobs_by_output.get(os.path.abspath(file_path))
                     files.append({
                         'filename': file,
                         'path': file_path,
                         'time': datetime.fromtimestamp(
                             os.path.getctime(file_path)
                         ).strftime('%Y-%m-%d %H:%M:%S'),
-                        'size': f"{os.path.getsize(file_path)/1024:.1f}KB"
+                        'size': f"{os.path.getsize(file_path)/1024:.1f}KB",
+                        'status': job['status'] if job else '',
+                        'throughput': job['throughput'] if job else None
                     })
             return sorted(files, key=lambda x: x['time'], reverse=True)
         except Exception as e:
@@ -134,4 +441,4 @@ class BatchProcessor:
         logs = []
         while not self.log_queue.empty():
             logs.append(self.log_queue.get())
-        return logs
\ No newline at end of file
+        return logs
@@ -0,0 +1,327 @@
+"""关税查询性能基准测试
+
+在 `tariffs copy.db` 的副本上测量 TariffAPI 精确/模糊查询和
+BatchProcessor.process_file 的延迟分位数、吞吐量和峰值内存，
+结果可保存为 JSON 基线，后续运行自动与基线比较并标记性能回退。
+
+用法:
+    python benchmark.py                          # 运行全部场景并与基线比较
+    python benchmark.py --save-baseline          # 运行并保存为新基线
+    python benchmark.py --batch-sizes 1000       # 只运行1k行批量场景
+    python benchmark.py --skip-batch --queries 20
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOURCE_DB = "tariffs copy.db"
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_BATCH_SIZES = [1000, 10000, 50000]
+
+# 模糊查询场景：按前缀位数截取真实编码，另加一个单字符错误的10位编码
+FUZZY_PREFIX_LENGTHS = [4, 6, 8, 10]
+
+# 数值越大越差的指标；throughput 数值越大越好
+LOWER_IS_BETTER = ('p50_ms', 'p90_ms', 'p99_ms', 'peak_rss_mb', 'total_s')
+HIGHER_IS_BETTER = ('throughput',)
+
+
+def _peak_rss_mb() -> float:
+    """获取当前进程的峰值常驻内存(MB)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位为KB，macOS 单位为字节
+        if sys.platform == 'darwin':
+            return peak / (1024 * 1024)
+        return peak / 1024
+    except ImportError:
+        pass
+
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    except ImportError:
+        return 0.0
+
+
+def summarize_latencies(latencies: List[float]) -> Dict:
+    """根据单次耗时(秒)计算分位数和吞吐量"""
+    if not latencies:
+        return {}
+
+    ordered = sorted(latencies)
+
+    def percentile(p: float) -> float:
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index] * 1000
+
+    total = sum(ordered)
+    return {
+        'count': len(ordered),
+        'mean_ms': statistics.mean(ordered) * 1000,
+        'p50_ms': percentile(50),
+        'p90_ms': percentile(90),
+        'p99_ms': percentile(99),
+        'max_ms': ordered[-1] * 1000,
+        'throughput': len(ordered) / total if total > 0 else 0.0,
+    }
+
+
+def make_typo(code: str, rng: random.Random) -> str:
+    """把编码中的一位数字替换为另一个数字"""
+    index = rng.randrange(len(code))
+    digit = rng.choice([d for d in '0123456789' if d != code[index]])
+    return code[:index] + digit + code[index + 1:]
+
+
+def sample_codes(db_path: str, count: int, seed: int) -> List[str]:
+    """从数据库中按固定随机种子抽取编码"""
+    from tariff_db import TariffDB
+
+    codes = sorted(TariffDB.get(db_path).get_all_codes())
+    if not codes:
+        raise ValueError(f"数据库中没有编码: {db_path}")
+    rng = random.Random(seed)
+    return [rng.choice(codes) for _ in range(count)]
+
+
+def build_queries(db_path: str, count: int, seed: int) -> Dict[str, List[str]]:
+    """构建各个查询场景的输入"""
+    codes = sample_codes(db_path, count, seed)
+    rng = random.Random(seed + 1)
+
+    scenarios = {'exact_search': list(codes)}
+    for length in FUZZY_PREFIX_LENGTHS:
+        scenarios[f'fuzzy_search_{length}'] = [code[:length] for code in codes]
+    scenarios['fuzzy_search_typo'] = [make_typo(code, rng) for code in codes]
+    return scenarios
+
+
+def _run_search_scenario(db_path: str, name: str, queries: List[str], warmup: int) -> Dict:
+    """在子进程中执行查询场景"""
+    from tariff_api import TariffAPI
+
+    api = TariffAPI(db_path)
+    search = api.exact_search if name == 'exact_search' else api.fuzzy_search
+
+    for query in queries[:warmup]:
+        search(query)
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        latencies.append(time.perf_counter() - start)
+
+    result = summarize_latencies(latencies)
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+
+def write_batch_input(path: str, codes: List[str]):
+    """生成批量查询的Excel输入文件"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(['code'])
+    for code in codes:
+        sheet.append([code])
+    workbook.save(path)
+
+
+def _run_batch_scenario(db_path: str, input_path: str, output_dir: str, rows: int) -> Dict:
+    """在子进程中执行批量处理场景"""
+    from tariff_api import TariffAPI
+    from batch_processor import BatchProcessor
+
+    processor = BatchProcessor(output_dir=output_dir, api=TariffAPI(db_path))
+
+    start = time.perf_counter()
+    output_file = processor.process_file(input_path)
+    total = time.perf_counter() - start
+
+    if not output_file:
+        raise RuntimeError(f"批量处理失败: {input_path}")
+
+    return {
+        'count': rows,
+        'total_s': total,
+        'throughput': rows / total if total > 0 else 0.0,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def run_benchmarks(source_db: str = DEFAULT_SOURCE_DB,
+                   queries: int = 50,
+                   warmup: int = 3,
+                   batch_sizes: Optional[List[int]] = None,
+                   seed: int = 42) -> Dict:
+    """运行全部场景，每个场景在独立子进程中执行以便单独统计峰值内存"""
+    if batch_sizes is None:
+        batch_sizes = DEFAULT_BATCH_SIZES
+
+    workdir = tempfile.mkdtemp(prefix="tariff_bench_")
+    try:
+        db_path = os.path.join(workdir, "tariffs.db")
+        shutil.copyfile(source_db, db_path)
+
+        results = {}
+        context = multiprocessing.get_context('spawn')
+
+        for name, scenario_queries in build_queries(db_path, queries, seed).items():
+            logger.info(f"运行场景 {name}，共 {len(scenario_queries)} 次查询")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                results[name] = pool.submit(
+                    _run_search_scenario, db_path, name, scenario_queries, warmup
+                ).result()
+
+        for rows in batch_sizes:
+            codes = sample_codes(db_path, rows, seed)
+            rng = random.Random(seed + rows)
+            # 约三成输入带错误，走模糊匹配路径
+            codes = [make_typo(code, rng) if rng.random() < 0.3 else code for code in codes]
+
+            input_path = os.path.join(workdir, f"batch_{rows}.xlsx")
+            write_batch_input(input_path, codes)
+
+            name = f"batch_process_{rows}"
+            logger.info(f"运行场景 {name}")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                results[name] = pool.submit(
+                    _run_batch_scenario, db_path, input_path,
+                    os.path.join(workdir, "output"), rows
+                ).result()
+
+        return {
+            'meta': {
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'source_db': source_db,
+                'queries': queries,
+                'seed': seed,
+            },
+            'results': results,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare_results(current: Dict, baseline: Dict, tolerance: float = 0.1) -> List[str]:
+    """与基线比较，返回超出容差的回退项"""
+    regressions = []
+    baseline_results = baseline.get('results', {})
+
+    for name, metrics in current.get('results', {}).items():
+        base = baseline_results.get(name)
+        if not base:
+            continue
+
+        for key in LOWER_IS_BETTER:
+            if key in metrics and base.get(key):
+                if metrics[key] > base[key] * (1 + tolerance):
+                    regressions.append(
+                        f"{name}.{key}: {base[key]:.2f} -> {metrics[key]:.2f}"
+                    )
+
+        for key in HIGHER_IS_BETTER:
+            if key in metrics and base.get(key):
+                if metrics[key] < base[key] * (1 - tolerance):
+                    regressions.append(
+                        f"{name}.{key}: {base[key]:.2f} -> {metrics[key]:.2f}"
+                    )
+
+    return regressions
+
+
+def format_report(report: Dict) -> str:
+    """格式化基准测试结果"""
+    def cell(metrics: Dict, key: str, width: int, precision: int) -> str:
+        value = metrics.get(key)
+        if value is None:
+            return f"{'-':>{width}}"
+        return f"{value:>{width}.{precision}f}"
+
+    lines = [f"{'场景':<24}{'次数':>8}{'p50(ms)':>10}{'p99(ms)':>10}{'总耗时(s)':>10}{'吞吐(/s)':>12}{'峰值内存(MB)':>14}"]
+    for name, m in report['results'].items():
+        lines.append(
+            f"{name:<24}{m.get('count', 0):>8}"
+            f"{cell(m, 'p50_ms', 10, 2)}{cell(m, 'p99_ms', 10, 2)}{cell(m, 'total_s', 10, 2)}"
+            f"{cell(m, 'throughput', 12, 1)}{cell(m, 'peak_rss_mb', 14, 1)}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="关税查询性能基准测试")
+    parser.add_argument('--db', default=DEFAULT_SOURCE_DB, help="源数据库（会复制后再测试）")
+    parser.add_argument('--queries', type=int, default=50, help="每个查询场景的查询次数")
+    parser.add_argument('--warmup', type=int, default=3, help="预热查询次数")
+    parser.add_argument('--batch-sizes', type=int, nargs='*', default=DEFAULT_BATCH_SIZES,
+                        help="批量处理场景的行数")
+    parser.add_argument('--skip-batch', action='store_true', help="跳过批量处理场景")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="基线JSON文件")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为基线")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="允许的回退比例")
+    parser.add_argument('--output', help="把本次结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    report = run_benchmarks(
+        source_db=args.db,
+        queries=args.queries,
+        warmup=args.warmup,
+        batch_sizes=[] if args.skip_batch else args.batch_sizes,
+        seed=args.seed,
+    )
+    print(format_report(report))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logger.info(f"基线已保存到: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        logger.info(f"未找到基线文件 {args.baseline}，跳过比较")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    regressions = compare_results(report, baseline, args.tolerance)
+    if regressions:
+        print("\n性能回退:")
+        for item in regressions:
+            print(f"  {item}")
+        return 1
+
+    print("\n未发现性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
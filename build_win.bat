@@ -1 +1 @@
-pyinstaller --onefile --noconsole ./tariff_gui.py --name "uk-tax-tools"
\ No newline at end of file
+pyinstaller --onefile --noconsole ./tariff_gui.py --name "uk-tax-tools" --hidden-import batch_gui --hidden-import update_gui --hidden-import update_tariffs
\ No newline at end of file
@@ -7,11 +7,13 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('templates', 'templates'), ('tariffs.db', '.')],  # 添加需要的资源文件
-    hiddenimports=[],
+    # 标签页模块通过 importlib 按需加载，静态分析找不到
+    hiddenimports=['batch_gui', 'update_gui', 'update_tariffs'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # 程序未使用、但可能被 pandas 等依赖间接带入的大型包
+    excludes=['matplotlib', 'scipy', 'IPython', 'notebook', 'pytest'],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -0,0 +1,205 @@
+"""全量导入
+
+完整抓取或生成数据集时，逐条 add_tariff 每行提交一次事务并同时维护全部索引，
+耗时主要花在提交上。BulkLoader 在目标文件旁边的临时文件中建库：
+关闭日志和同步写盘、去掉二级索引，按大事务 executemany 写入，
+写完后重建索引并 ANALYZE，最后用 os.replace 原子替换目标文件。
+抓取错误和搜索记录在替换前一刻才从旧文件复制，导入期间写入的也会保留。
+导入中途失败时目标文件保持不变。
+
+用法:
+    with BulkLoader("tariffs.db") as loader:
+        for chunk in chunks:
+            loader.add_many(chunk)
+"""
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from optimizations import audit_indexes, drop_indexes
+from tariff_db import TariffDB
+
+logger = logging.getLogger(__name__)
+
+# 每个事务写入的记录数
+BATCH_SIZE = 50000
+# 从旧数据库保留的表：抓取错误和搜索记录不属于抓取结果
+CARRY_OVER_TABLES = ("scrape_errors", "query_log")
+
+INDEX_SQL = (
+    "SELECT name, sql FROM {schema}.sqlite_master "
+    "WHERE type = 'index' AND tbl_name = 'tariff_rows' AND sql IS NOT NULL"
+)
+
+INSERT_SQL = """
+    INSERT OR REPLACE INTO tariffs
+    (code, description, rate, url, north_ireland_rate, north_ireland_url)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+class BulkLoader:
+    """在临时文件中构建全新的关税数据库，完成后替换目标文件
+
+    Args:
+        db_path: 目标数据库
+        batch_size: 每个事务写入的记录数
+        carry_over: 从已有目标数据库复制到新库的表
+    """
+
+    def __init__(self, db_path: str, batch_size: int = BATCH_SIZE,
+                 carry_over: Sequence[str] = CARRY_OVER_TABLES):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.carry_over = carry_over
+        self.tmp_path = f"{db_path}.building"
+        self.written = 0
+        self._pending: List[tuple] = []
+        self._indexes: List[str] = []
+        self._conn: Optional[sqlite3.Connection] = None
+        self._start = None
+
+    def __enter__(self) -> "BulkLoader":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.finish()
+        else:
+            self.abort()
+        return False
+
+    def open(self):
+        """创建临时数据库并切换到导入模式"""
+        self._start = time.perf_counter()
+        self._remove_tmp()
+
+        # 表结构与 TariffDB 保持一致
+        TariffDB(self.tmp_path).close()
+
+        conn = sqlite3.connect(self.tmp_path, isolation_level=None)
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA locking_mode = EXCLUSIVE")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA cache_size = -65536")
+        self._conn = conn
+
+        # 二级索引在写完后重建，写入时只维护主键；旧数据库上手动建的索引同样重建
+        indexes = dict(conn.execute(INDEX_SQL.format(schema='main')).fetchall())
+        for name in indexes:
+            conn.execute(f'DROP INDEX "{name}"')
+        if os.path.exists(self.db_path):
+            with self._attach_old():
+                for name, sql in conn.execute(INDEX_SQL.format(schema='old')).fetchall():
+                    indexes.setdefault(name, sql)
+        self._indexes = list(indexes.values())
+
+    @contextmanager
+    def _attach_old(self):
+        self._conn.execute("ATTACH DATABASE ? AS old", (self.db_path,))
+        try:
+            yield
+        finally:
+            self._conn.execute("DETACH DATABASE old")
+
+    def _copy_carry_over(self):
+        """从旧数据库复制保留的表，在替换前调用，期间旧文件不会再有写入"""
+        if not os.path.exists(self.db_path):
+            return
+        conn = self._conn
+        with self._attach_old():
+            for table in self.carry_over:
+                row = conn.execute(
+                    "SELECT sql FROM old.sqlite_master WHERE type = 'table' AND name = ?", (table,)
+                ).fetchone()
+                if row is None:
+                    continue
+                exists = conn.execute(
+                    "SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,)
+                ).fetchone()
+                if not exists:
+                    conn.execute(row[0])
+                conn.execute(f'INSERT OR REPLACE INTO main."{table}" SELECT * FROM old."{table}"')
+
+    def add(self, tariff: Dict):
+        self.add_many([tariff])
+
+    def add_many(self, tariffs: Iterable[Dict]):
+        """写入记录，格式与 TariffDB.add_tariffs_batch 相同，攒够 batch_size 条提交一次"""
+        for t in tariffs:
+            self._pending.append((
+                t['code'], t['description'], t['rate'], t.get('url'),
+                t.get('north_ireland_rate'), t.get('north_ireland_url')
+            ))
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        conn = self._conn
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(INSERT_SQL, self._pending)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.written += len(self._pending)
+        self._pending = []
+
+    def finish(self) -> int:
+        """写入剩余记录，重建索引、收集统计信息并替换目标文件
+
+        Returns:
+            写入的记录数
+        """
+        conn = self._conn
+        try:
+            self._flush()
+            for sql in self._indexes:
+                conn.execute(sql)
+            # 旧数据库上与主键重复的索引不再保留
+            drop_indexes(conn, [index['name'] for index in audit_indexes(conn)])
+            conn.execute("ANALYZE")
+            problems = [row[0] for row in conn.execute("PRAGMA quick_check").fetchall()]
+            if problems != ['ok']:
+                raise sqlite3.DatabaseError(f"新数据库检查失败: {problems[:5]}")
+        except Exception:
+            self.abort()
+            raise
+
+        # 共享实例仍连着旧文件：替换期间暂停取用连接并关闭已有连接（Windows 不能替换打开中的文件），
+        # 替换后再重新连接，避免有连接在替换前后打开旧文件。
+        # 保留的表在暂停写入后复制，导入期间通过共享实例写入旧文件的记录不会丢失
+        with TariffDB.replacing(self.db_path):
+            try:
+                self._copy_carry_over()
+            except Exception:
+                self.abort()
+                raise
+            conn.close()
+            self._conn = None
+            os.replace(self.tmp_path, self.db_path)
+        logger.info(
+            f"全量导入完成，共 {self.written} 条记录，耗时 {time.perf_counter() - self._start:.1f} 秒"
+        )
+        return self.written
+
+    def abort(self):
+        """放弃导入，删除临时文件，目标文件保持不变"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        self._pending = []
+        self._remove_tmp()
+
+    def _remove_tmp(self):
+        for path in (self.tmp_path, f"{self.tmp_path}-journal"):
+            if os.path.exists(path):
+                os.remove(path)
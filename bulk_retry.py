@@ -0,0 +1,106 @@
+"""批量重试失败的编码
+
+原来的重试逐个编码调用 update_uk_tariffs([code]) 和 update_ni_tariffs([code])，
+每次都新建会话并串行等待。BulkRetry 在同一个会话中并发重试全部编码，
+临时错误按指数退避重试，最后返回每个编码的结果，由调用方一次性更新失败列表。
+"""
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from tools.web_scraper import fetch_with_backoff
+
+logger = logging.getLogger(__name__)
+
+# 单个编码的重试结果
+STATUS_SUCCESS = "success"
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"
+
+
+class BulkRetry:
+    """并发重试一组编码
+
+    Args:
+        parse: 解析商品页面的函数，失败时返回 None
+        targets: [(名称, 基础URL, 保存函数)]，保存函数的调用方式为 save(code, data)
+        headers: 请求头
+        max_concurrent: 同时进行的请求数
+        max_attempts: 每个URL的最大尝试次数
+        backoff: 第一次重试前的等待秒数，之后每次翻倍
+        timeout: 单个请求的超时秒数
+        should_stop: 返回 True 时不再开始新的编码
+    """
+
+    def __init__(self, parse: Callable[[str], Optional[Dict]],
+                 targets: List[Tuple[str, str, Callable]], headers: Optional[Dict] = None,
+                 max_concurrent: int = 8, max_attempts: int = 3, backoff: float = 1.0,
+                 timeout: float = 30, should_stop: Optional[Callable[[], bool]] = None):
+        self.parse = parse
+        self.targets = targets
+        self.headers = headers or {}
+        self.max_concurrent = max_concurrent
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.timeout = timeout
+        self.should_stop = should_stop
+
+    async def run(self, codes: List[str],
+                  on_outcome: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+        """重试全部编码
+
+        Args:
+            codes: 要重试的编码
+            on_outcome: 每完成一个编码调用一次，可用于显示进度
+
+        Returns:
+            与 codes 顺序相同的结果列表，每项包含 code、status 和 error
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        connector = aiohttp.TCPConnector(limit=self.max_concurrent)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            async def retry_one(code: str) -> Dict:
+                async with semaphore:
+                    outcome = await self._retry_code(session, code)
+                if on_outcome:
+                    on_outcome(outcome)
+                return outcome
+
+            return await asyncio.gather(*(retry_one(code) for code in codes))
+
+    async def _retry_code(self, session: aiohttp.ClientSession, code: str) -> Dict:
+        """依次抓取并保存一个编码的各个数据源"""
+        if self.should_stop and self.should_stop():
+            return {'code': code, 'status': STATUS_SKIPPED, 'error': None}
+
+        errors = []
+        for name, base_url, save in self.targets:
+            content, error = await fetch_with_backoff(
+                session, f"{base_url}{code}", self.headers, self.max_attempts, self.backoff
+            )
+            try:
+                if content is None:
+                    raise Exception(f"获取数据失败: {error}")
+                data = self.parse(content)
+                if not data:
+                    raise Exception("解析页面失败")
+                save(code, data)
+            except Exception as e:
+                logger.error(f"重试{name}商品 {code} 失败: {str(e)}")
+                errors.append(f"{name}: {str(e)}")
+
+        if errors:
+            return {'code': code, 'status': STATUS_FAILED, 'error': "; ".join(errors)}
+        return {'code': code, 'status': STATUS_SUCCESS, 'error': None}
+
+
+def summarize(outcomes: List[Dict]) -> Dict[str, int]:
+    """统计各状态的编码数"""
+    counts = {STATUS_SUCCESS: 0, STATUS_FAILED: 0, STATUS_SKIPPED: 0}
+    for outcome in outcomes:
+        counts[outcome['status']] += 1
+    return counts
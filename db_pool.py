@@ -0,0 +1,204 @@
+"""SQLite 连接池
+
+TariffDB 原来为每个线程在 threading.local 中打开一个连接且从不关闭，
+每次搜索都在新线程中执行时，每次都要重新建立连接、读取表结构，并泄漏一个句柄。
+ConnectionPool 维护有上限的可复用读连接和唯一的写连接：
+读连接按需创建，用完归还；写操作通过同一个连接串行执行，避免多个连接争抢写锁。
+"""
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """等待空闲连接超时"""
+
+
+class ConnectionPool:
+    """有上限的 SQLite 读连接池和单个写连接
+
+    Args:
+        db_path: 数据库路径
+        size: 读连接数上限
+        timeout: 等待空闲读连接、以及 SQLite 等待锁的秒数
+        connect: 创建连接的函数，调用方式为 connect(db_path, timeout)
+    """
+
+    def __init__(self, db_path: str, size: int = 4, timeout: float = 10.0,
+                 connect: Optional[Callable[[str, float], sqlite3.Connection]] = None):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._connect_func = connect
+        self._idle: List[sqlite3.Connection] = []
+        self._created = 0
+        self._cond = threading.Condition()
+        self._writer = None
+        self._write_lock = threading.RLock()
+        self._closed = False
+        # 替换数据库文件期间暂停取用读连接，见 replacing
+        self._paused = False
+        # reset 后加一，旧一代的连接在归还时关闭
+        self._generation = 0
+        self._conn_generation: Dict[int, int] = {}
+
+        # 统计信息
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        # 连接会被不同线程先后使用，但同一时间只属于一个线程
+        generation = self._generation
+        if self._connect_func:
+            conn = self._connect_func(self.db_path, self.timeout)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        self._conn_generation[id(conn)] = generation
+        return conn
+
+    def checkout(self, timeout: Optional[float] = None) -> sqlite3.Connection:
+        """取出一个读连接，没有空闲连接且已达上限时等待"""
+        timeout = self.timeout if timeout is None else timeout
+        with self._cond:
+            if self._closed:
+                raise sqlite3.ProgrammingError("连接池已关闭")
+            if self._paused or (not self._idle and self._created >= self.size):
+                self._waits += 1
+                start = time.perf_counter()
+                ready = self._cond.wait_for(
+                    lambda: self._closed or (not self._paused and (self._idle or self._created < self.size)),
+                    timeout
+                )
+                self._wait_time += time.perf_counter() - start
+                if not ready:
+                    raise PoolTimeout(f"等待数据库连接超时 ({timeout}s)")
+                if self._closed:
+                    raise sqlite3.ProgrammingError("连接池已关闭")
+
+            self._checkouts += 1
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+            if self._idle:
+                return self._idle.pop()
+            # 预留名额后在锁外建立连接
+            self._created += 1
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def checkin(self, conn: sqlite3.Connection):
+        """归还读连接"""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            self._in_use -= 1
+            if self._closed or self._conn_generation.get(id(conn)) != self._generation:
+                self._created -= 1
+                self._conn_generation.pop(id(conn), None)
+                conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """with pool.reader() as conn: 使用一个读连接，结束后自动归还"""
+        conn = self.checkout()
+        try:
+            yield conn
+        finally:
+            self.checkin(conn)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """with pool.writer() as conn: 独占写连接，事务需由调用方提交（可再用 with conn:）"""
+        with self._write_lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("连接池已关闭")
+            if self._writer is None:
+                self._writer = self._connect()
+            self._writes += 1
+            yield self._writer
+
+    def stats(self) -> Dict:
+        """连接池统计信息"""
+        with self._cond:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'peak_in_use': self._peak_in_use,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time': self._wait_time,
+                'writes': self._writes,
+            }
+
+    def reset(self):
+        """关闭现有连接，之后取用时重新连接，数据库文件被替换后调用
+
+        使用中的读连接在归还时关闭。
+        """
+        with self._write_lock:
+            with self._cond:
+                self._generation += 1
+                idle, self._idle = self._idle, []
+                self._created -= len(idle)
+            for conn in idle:
+                self._conn_generation.pop(id(conn), None)
+                conn.close()
+            if self._writer is not None:
+                self._conn_generation.pop(id(self._writer), None)
+                self._writer.close()
+                self._writer = None
+
+    @contextmanager
+    def replacing(self) -> Iterator[None]:
+        """with pool.replacing(): 在其中替换数据库文件
+
+        期间持有写锁并暂停取用读连接，先等待使用中的读连接归还（最多 timeout 秒），
+        再关闭所有连接；退出后重新取用的连接都打开替换后的文件。
+        替换前打开的连接在 POSIX 上会继续读写旧文件，写入随旧文件丢失，因此不能在替换期间取用连接。
+        """
+        with self._write_lock:
+            with self._cond:
+                self._paused = True
+                if not self._cond.wait_for(lambda: self._in_use == 0, self.timeout):
+                    logger.warning(f"替换数据库时仍有 {self._in_use} 个读连接未归还")
+            try:
+                self.reset()
+                yield
+            finally:
+                with self._cond:
+                    self._paused = False
+                    self._cond.notify_all()
+
+    def close(self):
+        """关闭所有空闲连接和写连接，使用中的读连接在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            conn.close()
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
@@ -0,0 +1,145 @@
+"""更新失败列表
+
+失败项原来只保存在 Treeview 中，添加和删除时要遍历全部条目比较编码，
+几千个编码失败时插入和重试都是平方复杂度。FailedItemStore 以编码为键保存失败项，
+并同步写入 scrape_errors 表；FailedItemsView 通过编码到条目ID的映射更新表格，
+增删单项和整体刷新都是线性的。
+"""
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class FailedItemStore:
+    """以编码为键的失败项集合，修改同时写入数据库
+
+    Args:
+        db: 提供 get_scrape_errors、add_scrape_errors、clear_scrape_errors 的数据库对象
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._items: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> List[Dict]:
+        """从数据库重新读取全部失败项"""
+        items = {}
+        for row in self.db.get_scrape_errors():
+            items[row['code']] = {
+                'code': row['code'],
+                'error_message': row['error_message'],
+                # 两个版本的数据库时间列名称不同
+                'timestamp': row.get('timestamp', row.get('last_attempt')),
+            }
+        with self._lock:
+            self._items = items
+        return self.items()
+
+    def add(self, code: str, error_message: str) -> Dict:
+        """添加或更新失败项"""
+        return self.add_many([(code, error_message)])[0]
+
+    def add_many(self, errors: Iterable[Tuple[str, str]]) -> List[Dict]:
+        """批量添加或更新失败项，一次写入数据库"""
+        errors = list(errors)
+        if not errors:
+            return []
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.db.add_scrape_errors(errors, timestamp)
+
+        added = []
+        with self._lock:
+            for code, error_message in errors:
+                item = {'code': code, 'error_message': error_message, 'timestamp': timestamp}
+                self._items[code] = item
+                added.append(item)
+        return added
+
+    def remove(self, code: str) -> bool:
+        return bool(self.remove_many([code]))
+
+    def remove_many(self, codes: Iterable[str]) -> List[str]:
+        """批量删除失败项，返回实际删除的编码"""
+        with self._lock:
+            removed = [code for code in dict.fromkeys(codes) if self._items.pop(code, None)]
+        if removed:
+            self.db.clear_scrape_errors(removed)
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._items = {}
+        self.db.clear_scrape_errors()
+
+    def get(self, code: str) -> Optional[Dict]:
+        return self._items.get(code)
+
+    def codes(self) -> List[str]:
+        with self._lock:
+            return list(self._items)
+
+    def items(self) -> List[Dict]:
+        with self._lock:
+            return list(self._items.values())
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+
+class FailedItemsView:
+    """把失败项显示在 Treeview 中，需在主线程中调用
+
+    表格的三列为编码、失败原因、时间。条目的 values 会被 Tk 转换类型，
+    以 0 开头的编码读回时会丢失前导零，所以编码从映射中读取而不是从 values 中读取。
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self._rows: Dict[str, str] = {}
+        self._codes: Dict[str, str] = {}
+
+    def refresh(self, items: Iterable[Dict]):
+        """用全部失败项重建表格"""
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self._rows = {}
+        self._codes = {}
+        self.upsert(items)
+
+    def upsert(self, items: Iterable[Dict]):
+        """添加或更新失败项"""
+        for item in items:
+            code = item['code']
+            values = (code, item['error_message'], item['timestamp'] or '')
+            row = self._rows.get(code)
+            if row is None:
+                row = self.tree.insert('', 'end', values=values)
+                self._rows[code] = row
+                self._codes[row] = code
+            else:
+                self.tree.item(row, values=values)
+
+    def remove(self, codes: Iterable[str]):
+        rows = []
+        for code in codes:
+            row = self._rows.pop(code, None)
+            if row is not None:
+                del self._codes[row]
+                rows.append(row)
+        if rows:
+            self.tree.delete(*rows)
+
+    def selected_codes(self) -> List[str]:
+        return [self._codes[row] for row in self.tree.selection() if row in self._codes]
+
+    def codes(self) -> List[str]:
+        return list(self._rows)
+
+    @property
+    def row_count(self) -> int:
+        return len(self._rows)
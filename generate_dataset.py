@@ -0,0 +1,234 @@
+"""合成大规模关税数据集
+
+按真实编码的层级结构（章2位 → 品目4位 → 子目6位 → 8位 → 10位商品编码）
+生成指定数量的商品记录，税率按真实数据库中的分布抽取，写入 TariffDB 文件，
+用于在 10万～500万 行规模下分析查询、批量处理和数据库层的性能。
+
+用法:
+    python generate_dataset.py --rows 1000000 --output tariffs_1m.db
+    python generate_dataset.py --rows 100000 --output tariffs_xi.db --schedule xi --ni-ratio 0
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from typing import Dict, Iterator, List, Optional
+
+from bulk_load import BulkLoader
+
+logger = logging.getLogger(__name__)
+
+UK_BASE_URL = "https://www.trade-tariff.service.gov.uk/commodities/"
+NI_BASE_URL = "https://www.trade-tariff.service.gov.uk/xi/commodities/"
+
+# 第77章为保留章，不使用
+CHAPTERS = [f"{i:02d}" for i in range(1, 98) if i != 77]
+
+# 每一层级（品目、子目、8位、10位）各占2位，最多99个子节点
+LEVEL_WIDTH = 99
+LEVELS_BELOW_CHAPTER = 4
+
+# 税率及权重，参考现有数据库中最常见的税率分布
+RATES = [
+    ('0.00%', 38), ('6.00%', 16), ('4.00%', 8), ('2.00%', 8), ('8.00%', 6),
+    ('12.00%', 5), ('10.00%', 2), ('14.00%', 2), ('16.00%', 2), ('20.00%', 1.5),
+    ('18.00%', 1), ('6.50%', 0.4), ('25.00%', 0.3),
+    ('£10.00 / 100 litre (hl)', 0.7), ('£121.00 / 1,000 kg', 0.6),
+    ('£12.00 / 100 litre (hl)', 0.5), ('30.00% + £17.00 / 100 kg', 0.3),
+    ('20.00% + £19.00 / 100 kg', 0.3), ('10.00% + £77.00 / 100 kg', 0.3),
+    ('£1.40 / percentage ABV (% vol) per 100 litre (hl)', 0.3), ('', 0.6),
+]
+
+MATERIALS = [
+    'cotton', 'wool', 'steel', 'aluminium', 'copper', 'plastic', 'rubber', 'glass',
+    'wood', 'paper', 'leather', 'ceramic', 'synthetic fibre', 'silk', 'zinc', 'nickel',
+]
+PRODUCTS = [
+    'tubes', 'sheets', 'bars', 'wire', 'fabrics', 'yarn', 'containers', 'parts',
+    'machinery', 'instruments', 'apparatus', 'articles', 'fittings', 'tools',
+    'garments', 'footwear', 'furniture', 'vehicles', 'preparations', 'powders',
+]
+QUALIFIERS = [
+    'Other', 'Fresh or chilled', 'Frozen', 'Dried', 'Unwrought', 'Of a width exceeding 600 mm',
+    'Not further worked', 'Coated or plated', 'For industrial use', 'For retail sale',
+    'Weighing not more than 10 kg', 'Containing by weight 85% or more', 'Knitted or crocheted',
+    'Of a kind used in motor vehicles', 'Electrically operated', 'In powder form',
+]
+
+
+def _allocate(total: int, depth: int, max_children: int, child_capacity: int,
+              rng: random.Random) -> List[int]:
+    """把 total 条记录随机分配给若干子节点
+
+    depth 为当前节点以下的剩余层数，每个子节点至少1条、最多 child_capacity 条。
+    """
+    min_children = -(-total // child_capacity)
+    max_children = min(max_children, total)
+    if min_children > max_children:
+        raise ValueError(f"无法容纳 {total} 条记录")
+
+    # 各层分支数大致均衡（total 的 depth 次方根），再随机扰动
+    fanout = total ** (1 / depth)
+    count = int(round(fanout * rng.uniform(0.5, 1.5)))
+    count = max(min_children, min(max_children, count))
+
+    parts = [1] * count
+    remaining = total - count
+    if remaining:
+        weights = [rng.random() + 0.05 for _ in range(count)]
+        weight_sum = sum(weights)
+        for i, weight in enumerate(weights):
+            share = min(int(remaining * weight / weight_sum), child_capacity - parts[i])
+            parts[i] += share
+        leftover = total - sum(parts)
+        i = 0
+        while leftover:
+            if parts[i] < child_capacity:
+                extra = min(leftover, child_capacity - parts[i])
+                parts[i] += extra
+                leftover -= extra
+            i = (i + 1) % count
+    return parts
+
+
+def _child_digits(count: int, first_level: bool, rng: random.Random) -> List[str]:
+    """为子节点选取两位编号，保持有序"""
+    low = 1 if first_level else 0
+    values = sorted(rng.sample(range(low, 100), count))
+    return [f"{value:02d}" for value in values]
+
+
+def _generate_codes(prefix: str, total: int, depth: int, rng: random.Random) -> Iterator[str]:
+    """递归生成某个节点下的编码"""
+    if depth == 0:
+        yield prefix
+        return
+
+    capacity = LEVEL_WIDTH ** (depth - 1)
+    parts = _allocate(total, depth, LEVEL_WIDTH, capacity, rng)
+    first_level = depth == LEVELS_BELOW_CHAPTER
+    for digits, part in zip(_child_digits(len(parts), first_level, rng), parts):
+        yield from _generate_codes(prefix + digits, part, depth - 1, rng)
+
+
+def generate_codes(rows: int, seed: int = 42) -> Iterator[str]:
+    """按层级结构生成有序且不重复的10位商品编码"""
+    rng = random.Random(seed)
+    chapter_capacity = LEVEL_WIDTH ** LEVELS_BELOW_CHAPTER
+    if rows > chapter_capacity * len(CHAPTERS):
+        raise ValueError(f"行数过大: {rows}")
+
+    # 按章平均分配后再随机扰动，避免记录集中在前几章
+    weights = [rng.uniform(0.5, 1.5) for _ in CHAPTERS]
+    weight_sum = sum(weights)
+    quotas = [min(chapter_capacity, int(rows * w / weight_sum)) for w in weights]
+    i = 0
+    while sum(quotas) < rows:
+        if quotas[i] < chapter_capacity:
+            quotas[i] += 1
+        i = (i + 1) % len(quotas)
+
+    for chapter, quota in zip(CHAPTERS, quotas):
+        if quota:
+            yield from _generate_codes(chapter, quota, LEVELS_BELOW_CHAPTER, rng)
+
+
+def _description(code: str, rng: random.Random) -> str:
+    """生成商品描述"""
+    return (
+        f"{rng.choice(QUALIFIERS)} {rng.choice(MATERIALS)} {rng.choice(PRODUCTS)} "
+        f"(heading {code[:4]})"
+    )
+
+
+def generate_tariffs(rows: int, seed: int = 42, schedule: str = "uk",
+                     ni_ratio: float = 0.5) -> Iterator[Dict]:
+    """生成关税记录
+
+    Args:
+        rows: 记录数
+        seed: 随机种子，相同参数生成相同数据
+        schedule: 主表使用的税则，uk 或 xi（北爱尔兰）
+        ni_ratio: 同时带有北爱尔兰税率的记录比例
+    """
+    rng = random.Random(seed + 1)
+    rate_values = [rate for rate, _ in RATES]
+    rate_weights = [weight for _, weight in RATES]
+    base_url = NI_BASE_URL if schedule == "xi" else UK_BASE_URL
+
+    for code in generate_codes(rows, seed):
+        rate = rng.choices(rate_values, rate_weights)[0]
+        tariff = {
+            'code': code,
+            'description': _description(code, rng),
+            'rate': rate,
+            'url': f"{base_url}{code}",
+        }
+        if rng.random() < ni_ratio:
+            # 北爱尔兰税率多数与英国一致
+            ni_rate = rate if rng.random() < 0.8 else rng.choices(rate_values, rate_weights)[0]
+            tariff['north_ireland_rate'] = ni_rate
+            tariff['north_ireland_url'] = f"{NI_BASE_URL}{code}"
+        yield tariff
+
+
+def write_dataset(db_path: str, rows: int, seed: int = 42, schedule: str = "uk",
+                  ni_ratio: float = 0.5, chunk_size: int = 50000,
+                  progress_callback=None) -> int:
+    """生成数据并通过 BulkLoader 分批写入新数据库，内存占用与总行数无关
+
+    Returns:
+        写入的记录数
+    """
+    written = 0
+    chunk = []
+    with BulkLoader(db_path, batch_size=chunk_size) as loader:
+        for tariff in generate_tariffs(rows, seed, schedule, ni_ratio):
+            chunk.append(tariff)
+            if len(chunk) >= chunk_size:
+                loader.add_many(chunk)
+                written += len(chunk)
+                chunk = []
+                if progress_callback:
+                    progress_callback(written / rows)
+        if chunk:
+            loader.add_many(chunk)
+            written += len(chunk)
+            if progress_callback:
+                progress_callback(written / rows)
+    return written
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="生成合成关税数据集")
+    parser.add_argument('--rows', type=int, default=100000, help="生成的记录数")
+    parser.add_argument('--output', required=True, help="输出数据库文件")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--schedule', choices=['uk', 'xi'], default='uk', help="主表税则")
+    parser.add_argument('--ni-ratio', type=float, default=0.5, help="带北爱尔兰税率的记录比例")
+    parser.add_argument('--chunk-size', type=int, default=50000, help="每个事务写入的记录数")
+    parser.add_argument('--force', action='store_true', help="覆盖已存在的输出文件")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    if os.path.exists(args.output):
+        if not args.force:
+            logger.error(f"输出文件已存在: {args.output}，使用 --force 覆盖")
+            return 1
+        os.remove(args.output)
+
+    start = time.perf_counter()
+    written = write_dataset(
+        args.output, args.rows, args.seed, args.schedule, args.ni_ratio, args.chunk_size,
+        progress_callback=lambda p: logger.info(f"生成进度: {p*100:.1f}%"),
+    )
+    elapsed = time.perf_counter() - start
+    logger.info(f"已生成 {written} 条记录到 {args.output}，耗时 {elapsed:.1f} 秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
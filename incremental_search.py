@@ -0,0 +1,178 @@
+"""输入即搜索
+
+所有查询由同一个后台线程执行，新查询到达时正在执行的旧查询会被中止，
+排队中的旧查询直接丢弃。查询在上一次查询的基础上追加字符时，
+在上一次的前缀候选集中继续过滤，而不是重新扫描整个索引。
+常用查询可以通过 warm 预先计算，结果固定在缓存中直到数据更新。
+"""
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from tariff_api import TariffAPI, SearchCancelled
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalSearch:
+    """单线程、可取消的增量搜索
+
+    Args:
+        api: 查询接口
+        on_result: 回调 on_result(query, results, generation)，在工作线程中调用，
+            界面需要自行切换到主线程，并用 is_current(generation) 丢弃过期结果
+        on_error: 回调 on_error(query, error, generation)
+        limit: 返回结果数量
+        threshold: 模糊匹配阈值
+    """
+
+    def __init__(self, api: TariffAPI, on_result: Callable, on_error: Optional[Callable] = None,
+                 limit: int = 10, threshold: float = 0.2):
+        self.api = api
+        self.on_result = on_result
+        self.on_error = on_error
+        self.limit = limit
+        self.threshold = threshold
+
+        self._condition = threading.Condition()
+        self._generation = 0
+        self._pending = None
+        self._closed = False
+        self._stale_candidates = False
+
+        # 上一次前缀查询的候选集，只在工作线程中访问
+        self._last_prefix = None
+        self._last_candidates = None
+
+        # 预先计算的常用查询结果: (规范化查询, 是否模糊) -> 结果
+        self._pinned: Dict[Tuple[str, bool], List[Dict]] = {}
+        # 每次数据更新加一，计算期间数据已更新的预热结果不再使用
+        self._data_version = 0
+
+        self._thread = threading.Thread(target=self._run, name="incremental-search", daemon=True)
+        self._thread.start()
+
+    def submit(self, query: str, fuzzy: bool = True) -> int:
+        """提交查询，取代尚未完成的查询
+
+        Returns:
+            本次查询的序号
+        """
+        with self._condition:
+            self._generation += 1
+            self._pending = (query, fuzzy, self._generation)
+            self._condition.notify()
+            return self._generation
+
+    def cancel(self):
+        """取消正在执行和排队的查询"""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+
+    def is_current(self, generation: int) -> bool:
+        """结果是否来自最新的查询"""
+        return generation == self._generation
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._generation += 1
+            self._condition.notify()
+        self._thread.join(timeout=1)
+
+    def invalidate(self):
+        """数据更新后清除候选集缓存和预先计算的结果"""
+        with self._condition:
+            self._stale_candidates = True
+            self._pinned = {}
+            self._data_version += 1
+
+    def warm(self, queries: Iterable[Tuple[str, bool]]) -> int:
+        """预先计算查询结果并固定在缓存中，在后台线程中调用
+
+        Args:
+            queries: (查询, 是否模糊) 列表
+
+        Returns:
+            缓存的查询数
+        """
+        version = self._data_version
+        pinned = {}
+        for query, fuzzy in queries:
+            norm_query = self.api._normalize_code(query)
+            if not norm_query or (norm_query, fuzzy) in pinned:
+                continue
+            pinned[(norm_query, fuzzy)] = self._compute(
+                norm_query, fuzzy, lambda: False, self.api.prefix_candidates
+            )
+        with self._condition:
+            if version != self._data_version:
+                return 0
+            self._pinned = pinned
+        return len(pinned)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                query, fuzzy, generation = self._pending
+                self._pending = None
+                if self._stale_candidates:
+                    self._last_prefix = None
+                    self._last_candidates = None
+                    self._stale_candidates = False
+
+            try:
+                results = self._search(query, fuzzy, lambda: generation != self._generation)
+            except SearchCancelled:
+                continue
+            except Exception as e:
+                logger.error(f"搜索失败: {str(e)}")
+                if self.on_error and self.is_current(generation):
+                    self.on_error(query, e, generation)
+                continue
+
+            if self.is_current(generation):
+                self.on_result(query, results, generation)
+
+    def _search(self, query: str, fuzzy: bool, should_stop: Callable) -> List[Dict]:
+        """执行一次查询"""
+        norm_query = self.api._normalize_code(query)
+        if not norm_query:
+            return []
+
+        pinned = self._pinned.get((norm_query, fuzzy))
+        if pinned is not None:
+            return list(pinned)
+        return self._compute(norm_query, fuzzy, should_stop, self._prefix_candidates)
+
+    def _compute(self, norm_query: str, fuzzy: bool, should_stop: Callable,
+                 prefix_candidates: Callable[[str], List[Dict]]) -> List[Dict]:
+        """计算查询结果，prefix_candidates 用于获取前缀候选集"""
+        exact = self.api.exact_search(norm_query)
+        if exact or not fuzzy:
+            return [exact] if exact else []
+
+        candidates = prefix_candidates(norm_query)
+        if len(candidates) >= self.limit:
+            # 前缀匹配的记录已足够；编码等长时它们的相似度高于其他记录，只需在候选集中排序
+            return self.api.rank_by_similarity(
+                norm_query, self.limit, self.threshold, candidates, should_stop
+            )
+        return self.api.rank_by_similarity(
+            norm_query, self.limit, self.threshold, should_stop=should_stop
+        )
+
+    def _prefix_candidates(self, prefix: str) -> List[Dict]:
+        """获取前缀候选集，查询是上一次查询的延续时复用上一次的结果"""
+        if self._last_candidates is not None and prefix.startswith(self._last_prefix):
+            candidates = [t for t in self._last_candidates if t['code'].startswith(prefix)]
+        else:
+            candidates = self.api.prefix_candidates(prefix)
+        self._last_prefix = prefix
+        self._last_candidates = candidates
+        return candidates
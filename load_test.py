@@ -0,0 +1,120 @@
+"""关税查询服务压力测试
+
+使用保持连接的 aiohttp 客户端并发请求 tariff_server.py，
+输出吞吐量和延迟分位数。
+
+用法:
+    python load_test.py --db tariffs.db --mode exact --requests 20000 --concurrency 100
+    python load_test.py --db tariffs.db --mode batch --batch-size 500
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from benchmark import make_typo, sample_codes, summarize_latencies
+
+logger = logging.getLogger(__name__)
+
+MODES = ('exact', 'search', 'batch', 'hierarchy', 'mixed')
+
+
+def build_requests(codes: List[str], mode: str, count: int, batch_size: int,
+                   seed: int = 42) -> List[tuple]:
+    """生成 (方法, 路径, 请求体) 列表"""
+    rng = random.Random(seed)
+    requests = []
+    for i in range(count):
+        current = mode
+        if mode == 'mixed':
+            current = rng.choices(['exact', 'search', 'hierarchy'], [8, 1, 1])[0]
+
+        code = codes[i % len(codes)]
+        if current == 'exact':
+            requests.append(('GET', f"/tariffs/{code}", None))
+        elif current == 'search':
+            query = make_typo(code, rng) if rng.random() < 0.5 else code[:rng.choice([4, 6, 8])]
+            requests.append(('GET', f"/search?q={query}&limit=5", None))
+        elif current == 'hierarchy':
+            requests.append(('GET', f"/hierarchy/{code[:rng.choice([2, 4, 6])]}", None))
+        else:
+            batch = [rng.choice(codes) for _ in range(batch_size)]
+            requests.append(('POST', "/batch", {'codes': batch, 'fuzzy': False}))
+    return requests
+
+
+async def run_load(base_url: str, requests: List[tuple], concurrency: int) -> Dict:
+    """按指定并发数发送请求"""
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for item in requests:
+        queue.put_nowait(item)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(base_url, connector=connector) as session:
+
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                method, path, body = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    async with session.request(method, path, json=body) as response:
+                        await response.read()
+                        if response.status >= 500:
+                            errors += 1
+                except aiohttp.ClientError as e:
+                    logger.warning(f"请求失败: {str(e)}")
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    result = summarize_latencies(latencies)
+    result['errors'] = errors
+    result['elapsed_s'] = elapsed
+    # 并发场景下吞吐量按总耗时计算
+    result['throughput'] = len(latencies) / elapsed if elapsed > 0 else 0.0
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="关税查询服务压力测试")
+    parser.add_argument('--url', default="http://127.0.0.1:8765", help="服务地址")
+    parser.add_argument('--db', default="tariffs.db", help="用于抽取测试编码的数据库")
+    parser.add_argument('--mode', choices=MODES, default='exact')
+    parser.add_argument('--requests', type=int, default=10000, help="请求总数")
+    parser.add_argument('--concurrency', type=int, default=50, help="并发连接数")
+    parser.add_argument('--batch-size', type=int, default=100, help="batch 模式每个请求的编码数")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true', help="以JSON格式输出结果")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+
+    codes = sample_codes(args.db, min(args.requests, 5000), args.seed)
+    requests = build_requests(codes, args.mode, args.requests, args.batch_size, args.seed)
+    result = asyncio.run(run_load(args.url, requests, args.concurrency))
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(
+            f"{args.mode}: {result['count']} 个请求，{result['errors']} 个错误，"
+            f"耗时 {result['elapsed_s']:.2f} 秒，吞吐 {result['throughput']:.0f} 请求/秒\n"
+            f"p50 {result['p50_ms']:.2f}ms  p90 {result['p90_ms']:.2f}ms  p99 {result['p99_ms']:.2f}ms"
+        )
+    return 1 if result['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
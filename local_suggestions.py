@@ -0,0 +1,128 @@
+"""本地搜索建议
+
+官网搜索建议需要联网，但所有商品编码本地都有。LocalSuggestionProvider 在内存索引中
+按前缀二分查找候选记录，用 TariffAPI 的相似度排序（文字查询按描述的匹配程度排序），生成与
+WebSearchAPI.get_suggestions 相同格式的品目(Heading)、子目(Subheading)和商品(Commodity)建议。
+"""
+import logging
+import re
+from typing import Dict, List, Tuple
+
+from Levenshtein import ratio
+
+from tariff_api import TariffAPI
+
+logger = logging.getLogger(__name__)
+
+# 官网子目链接的编号为10位编码加产品线后缀，普通子目的后缀为80
+SUBHEADING_SUFFIX = "80"
+
+
+class LocalSuggestionProvider:
+    """从本地关税索引生成搜索建议
+
+    Args:
+        api: 提供内存索引的查询接口
+        limit: 商品建议的最大数量
+        group_limit: 品目和子目建议各自的最大数量
+        min_prefix: 没有前缀匹配时逐位缩短查询，最短保留的位数
+    """
+
+    def __init__(self, api: TariffAPI, limit: int = 20, group_limit: int = 5, min_prefix: int = 4):
+        self.api = api
+        self.limit = limit
+        self.group_limit = group_limit
+        self.min_prefix = min_prefix
+
+    def get_suggestions(self, query: str) -> Tuple[bool, List[Dict] | str]:
+        """获取搜索建议，返回值与 WebSearchAPI.get_suggestions 相同"""
+        try:
+            if any(c.isalpha() for c in query):
+                results = self._description_suggestions(query.strip().lower())
+            else:
+                results = self._code_suggestions(self.api._normalize_code(query))
+        except Exception as e:
+            logger.error(f"获取本地搜索建议失败: {str(e)}")
+            return False, f"本地查询失败: {str(e)}"
+
+        if not results:
+            return False, "未找到搜索建议"
+        return True, results
+
+    def _code_suggestions(self, norm_query: str) -> List[Dict]:
+        """按编码前缀查找候选，再按相似度排序"""
+        if not norm_query:
+            return []
+
+        # 没有以完整查询开头的编码时逐位缩短，给出最接近的编码
+        prefix = norm_query[:10]
+        candidates = self.api.prefix_candidates(prefix)
+        while not candidates and len(prefix) > self.min_prefix:
+            prefix = prefix[:-1]
+            candidates = self.api.prefix_candidates(prefix)
+
+        similarity = self.api._calculate_similarity
+        scored = sorted(
+            ((similarity(norm_query, t['code']), t) for t in candidates),
+            key=lambda item: (-item[0], item[1]['code'])
+        )
+
+        results = []
+        for item_type, length in (("Heading", 4), ("Subheading", 6)):
+            if len(norm_query) > length:
+                # 查询已经比这一层长，只给出查询所在的那一个节点
+                groups = [norm_query[:length]] if any(t['code'].startswith(norm_query[:length]) for _, t in scored) else []
+            else:
+                groups = list(dict.fromkeys(t['code'][:length] for _, t in scored))
+            for code in groups[:self.group_limit]:
+                results.append(self._suggestion(item_type, code))
+
+        for score, tariff in scored[:self.limit]:
+            results.append(self._suggestion("Commodity", tariff['code'], tariff, score))
+        return results
+
+    def _description_suggestions(self, query: str) -> List[Dict]:
+        """按商品描述查找描述包含查询全部词的记录，按匹配程度排序"""
+        words = query.split()
+        scored = []
+        for tariff in self.api.load_index():
+            description = (tariff.get('description') or '').lower()
+            if description and all(word in description for word in words):
+                scored.append((self._description_score(query, words, description), tariff))
+
+        scored.sort(key=lambda item: (-item[0], item[1]['code']))
+        return [
+            self._suggestion("Commodity", tariff['code'], tariff, score)
+            for score, tariff in scored[:self.limit]
+        ]
+
+    @staticmethod
+    def _description_score(query: str, words: List[str], description: str) -> float:
+        """描述与查询的匹配程度(0-1)
+
+        整词匹配的比例权重0.5，整个查询连续出现0.2，第一个词出现得越靠前越高0.15，
+        描述与查询的编辑距离相似度0.15（描述越接近查询本身越高）
+        """
+        tokens = set(re.findall(r'\w+', description))
+        whole_words = sum(1 for word in words if word in tokens) / len(words)
+        phrase = 1.0 if query in description else 0.0
+        position = 1 - description.index(words[0]) / len(description)
+        return whole_words * 0.5 + phrase * 0.2 + position * 0.15 + ratio(query, description) * 0.15
+
+    def _suggestion(self, item_type: str, code: str, tariff: Dict = None, score: float = None) -> Dict:
+        """生成与官网 search_suggestions.json 相同字段的建议"""
+        item_id = code
+        if item_type == "Subheading":
+            item_id = f"{code.ljust(10, '0')}-{SUBHEADING_SUFFIX}"
+        suggestion = {
+            'id': item_id,
+            'text': code,
+            'formatted_suggestion_type': item_type,
+            'resource_id': code,
+            'source': 'local',
+        }
+        if tariff is not None:
+            suggestion['description'] = tariff.get('description') or ''
+        if score is not None:
+            suggestion['score'] = round(score, 4)
+        return suggestion
@@ -0,0 +1,114 @@
+"""有界日志缓冲
+
+更新和批量处理的日志原来逐行 insert 到 tk.Text，长时间运行后控件里有几万行，
+插入和滚动越来越慢，内存也只增不减。LogBuffer 只在内存中保留最近的若干行，
+可选地把全部日志写入滚动的日志文件；TextLogView 把日志批量写入 Text 控件，
+并删除超出上限的旧行。
+"""
+import logging
+import threading
+import tkinter as tk
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_LINES = 2000
+
+
+class LogBuffer:
+    """线程安全的环形日志缓冲，超出容量时丢弃最旧的行
+
+    Args:
+        max_lines: 内存中保留的行数
+        spill_path: 日志文件路径，设置后每一行都会写入文件，不受 max_lines 限制
+        max_bytes: 单个日志文件的大小上限
+        backup_count: 保留的历史日志文件数
+    """
+
+    def __init__(self, max_lines: int = DEFAULT_MAX_LINES, spill_path: Optional[str] = None,
+                 max_bytes: int = 5 * 1024 * 1024, backup_count: int = 3):
+        self.max_lines = max_lines
+        self._lines = deque(maxlen=max_lines)
+        self._lock = threading.Lock()
+        self.total = 0
+        self._handler = None
+        if spill_path:
+            self._handler = RotatingFileHandler(
+                spill_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+            )
+            self._handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+
+    def append(self, message: str):
+        with self._lock:
+            self._lines.append(message)
+            self.total += 1
+        if self._handler:
+            self._handler.handle(logging.makeLogRecord({'msg': message, 'levelno': logging.INFO}))
+
+    @property
+    def dropped(self) -> int:
+        """已从内存中丢弃的行数"""
+        return self.total - len(self._lines)
+
+    def lines(self) -> List[str]:
+        """当前保留的行"""
+        with self._lock:
+            return list(self._lines)
+
+    def clear(self):
+        with self._lock:
+            self._lines.clear()
+            self.total = 0
+
+    def close(self):
+        if self._handler:
+            self._handler.close()
+            self._handler = None
+
+    def __len__(self):
+        return len(self._lines)
+
+
+class TextLogView:
+    """把日志批量写入 Text 控件，控件中的行数不超过缓冲的容量
+
+    add 可以在任意线程中调用；日志先进入缓冲，再通过分发器合并成一次插入。
+    用户向上滚动查看时不自动滚到底部。
+
+    Args:
+        text: 显示日志的 Text 控件
+        schedule: 批量执行函数，如 UIDispatcher.log，调用方式为 schedule(sink, message)
+        buffer: 日志缓冲，默认新建
+    """
+
+    def __init__(self, text: tk.Text, schedule: Callable, buffer: Optional[LogBuffer] = None):
+        self.text = text
+        self.schedule = schedule
+        self.buffer = buffer or LogBuffer()
+
+    def add(self, message: str):
+        self.buffer.append(message)
+        self.schedule(self._render, message)
+
+    def clear(self):
+        self.buffer.clear()
+        self.text.delete('1.0', tk.END)
+
+    def _render(self, messages: List[str]):
+        """在主线程中写入一批日志"""
+        max_lines = self.buffer.max_lines
+        if len(messages) > max_lines:
+            # 一批就超过上限时只写入最后的部分，被跳过的行仍保留在日志文件中
+            messages = messages[-max_lines:]
+
+        at_bottom = self.text.yview()[1] >= 1.0
+        self.text.insert(tk.END, "".join(f"{message}\n" for message in messages))
+
+        # Text 末尾总有一个空行，实际行数为 end 的行号减一
+        excess = int(self.text.index('end-1c').split('.')[0]) - 1 - max_lines
+        if excess > 0:
+            self.text.delete('1.0', f'{excess + 1}.0')
+        if at_bottom:
+            self.text.see(tk.END)
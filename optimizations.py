@@ -1,46 +1,361 @@
-import sqlite3
-from typing import List, Dict
+"""数据库维护
+
+大批量更新之后统计信息过期，替换和删除留下空闲页，查询计划和文件大小都会变差。
+这里提供 ANALYZE / PRAGMA optimize、索引审计、清理无用税率、VACUUM 压缩和完整性检查；
+run_maintenance 依次执行这些步骤并记录到 maintenance_log 表，
+maintain_after_update 在更新结束后按写入量和距上次维护的时间决定是否执行。
+cache_common_searches 按 query_log 表中的使用次数预先计算常用查询。
+
+用法:
+    python optimizations.py                          # 对 tariffs.db 执行维护
+    python optimizations.py --vacuum --full-check
+    python optimizations.py --audit                  # 只列出冗余索引
+    python optimizations.py --backup tariffs_backup.db
+"""
+import argparse
+import json
 import logging
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "tariffs.db"
+# 空闲页占比超过该值时压缩数据库
+VACUUM_FREE_RATIO = 0.2
+# 更新写入超过这么多行后执行维护
+MIN_CHANGES = 1000
+# 有写入且距上次维护超过该时间时也执行维护
+MAINTENANCE_INTERVAL = timedelta(days=7)
+# 启动时预先计算的常用查询数
+TOP_QUERIES = 50
+
+
+def analyze(conn: sqlite3.Connection):
+    """重新收集统计信息，让查询规划器按当前数据选择索引"""
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+
+
+def list_indexes(conn: sqlite3.Connection, table: str) -> List[Dict]:
+    """列出表上的索引，origin 为 c 的是 CREATE INDEX 创建的，pk/u 是主键和唯一约束自动创建的"""
+    indexes = []
+    for row in conn.execute(f"PRAGMA index_list('{table}')").fetchall():
+        name, unique, origin = row[1], bool(row[2]), row[3]
+        columns = [info[2] for info in conn.execute(f"PRAGMA index_info('{name}')").fetchall()]
+        indexes.append({'name': name, 'unique': unique, 'origin': origin, 'columns': columns})
+    return indexes
+
+
+def audit_indexes(conn: sqlite3.Connection) -> List[Dict]:
+    """找出冗余索引
+
+    一个手动创建的索引的列是另一个索引的前缀时，查询都可以改用另一个索引，
+    它只会让每次写入多维护一棵B树。例如 tariffs(code) 上的 idx_code 与主键自动索引完全相同。
+
+    Returns:
+        冗余索引列表，每项包含 table、name、columns 和 covered_by
+    """
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    ).fetchall()]
+
+    redundant = []
+    for table in tables:
+        # 自动索引排在前面，两个索引相同时保留自动索引
+        indexes = sorted(list_indexes(conn, table), key=lambda idx: (idx['origin'] == 'c', idx['name']))
+        removed = set()
+        for index in indexes:
+            if index['origin'] != 'c':
+                continue
+            columns = index['columns']
+            for other in indexes:
+                if other is index or other['name'] in removed:
+                    continue
+                if other['columns'][:len(columns)] != columns:
+                    continue
+                # 唯一索引只能由列完全相同的唯一索引代替
+                if index['unique'] and not (other['unique'] and other['columns'] == columns):
+                    continue
+                removed.add(index['name'])
+                redundant.append({
+                    'table': table,
+                    'name': index['name'],
+                    'columns': columns,
+                    'covered_by': other['name'],
+                })
+                break
+    return redundant
+
+
+def drop_indexes(conn: sqlite3.Connection, names: List[str]):
+    for name in names:
+        conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+def prune_rates(conn: sqlite3.Connection) -> int:
+    """删除紧凑存储中已经没有记录引用的税率，返回删除的数量"""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rates'").fetchone() is None:
+        return 0
+    cursor = conn.execute("""
+        DELETE FROM rates
+        WHERE id NOT IN (SELECT rate_id FROM tariff_rows WHERE rate_id IS NOT NULL)
+          AND id NOT IN (SELECT north_ireland_rate_id FROM tariff_rows WHERE north_ireland_rate_id IS NOT NULL)
+    """)
+    return cursor.rowcount
+
+
+def integrity_check(conn: sqlite3.Connection, full: bool = False) -> List[str]:
+    """检查数据库完整性，返回发现的问题，没有问题时返回空列表
+
+    Args:
+        full: 使用 integrity_check（同时校验索引内容），否则使用较快的 quick_check
+    """
+    pragma = "integrity_check" if full else "quick_check"
+    problems = [row[0] for row in conn.execute(f"PRAGMA {pragma}").fetchall()]
+    return [] if problems == ['ok'] else problems
+
+
+def page_usage(conn: sqlite3.Connection) -> Dict:
+    """数据库页数和空闲页数"""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {
+        'page_size': page_size,
+        'page_count': page_count,
+        'free_pages': free_pages,
+        'free_ratio': free_pages / page_count if page_count else 0.0,
+    }
+
+
+def vacuum(conn: sqlite3.Connection):
+    """原地重建数据库，回收空闲页"""
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("VACUUM")
+
+
+def vacuum_into(conn: sqlite3.Connection, dest_path: str):
+    """把数据库压缩复制到新文件，可用作备份，目标文件不能已存在"""
+    if os.path.exists(dest_path):
+        raise FileExistsError(f"目标文件已存在: {dest_path}")
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("VACUUM INTO ?", (dest_path,))
+
+
+def _ensure_log_table(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS maintenance_log (
+            run_at TEXT,
+            duration REAL,
+            details TEXT
+        )
+    """)
+
+
+def last_maintenance(conn: sqlite3.Connection) -> Optional[datetime]:
+    """上次维护的时间，从未维护时返回 None"""
+    _ensure_log_table(conn)
+    row = conn.execute("SELECT MAX(run_at) FROM maintenance_log").fetchone()
+    return datetime.fromisoformat(row[0]) if row and row[0] else None
 
-logger = logging.basicConfig(level=logging.INFO)
 
-def optimize_database(db_path: str = "tariff.db"):
-    """优化数据库性能"""
+def run_maintenance(db, vacuum_mode: str = "auto", drop_redundant: bool = True,
+                    full_check: bool = False) -> Dict:
+    """执行一次完整维护
+
+    维护期间持有写连接，其他写操作等待维护结束。
+
+    Args:
+        db: TariffDB 实例
+        vacuum_mode: auto 为空闲页超过 VACUUM_FREE_RATIO 时压缩，always/never 为总是/从不压缩
+        drop_redundant: 是否删除冗余索引
+        full_check: 是否执行完整的 integrity_check
+
+    Returns:
+        维护结果，包含 redundant_indexes、dropped_indexes、integrity、vacuumed 和 freed_bytes 等
+    """
+    start = time.perf_counter()
+    with db.pool.writer() as conn:
+        if conn.in_transaction:
+            conn.commit()
+
+        redundant = audit_indexes(conn)
+        dropped = []
+        if drop_redundant and redundant:
+            with conn:
+                dropped = [index['name'] for index in redundant]
+                drop_indexes(conn, dropped)
+            logger.info(f"已删除冗余索引: {', '.join(dropped)}")
+
+        with conn:
+            pruned_rates = prune_rates(conn)
+
+        analyze(conn)
+        problems = integrity_check(conn, full_check)
+        if problems:
+            logger.error(f"数据库完整性检查发现问题: {problems[:10]}")
+
+        usage = page_usage(conn)
+        vacuumed = False
+        freed_bytes = 0
+        if not problems and (vacuum_mode == "always" or
+                             (vacuum_mode == "auto" and usage['free_ratio'] >= VACUUM_FREE_RATIO)):
+            vacuum(conn)
+            after = page_usage(conn)
+            vacuumed = True
+            freed_bytes = (usage['page_count'] - after['page_count']) * usage['page_size']
+            usage = after
+
+        result = {
+            'redundant_indexes': redundant,
+            'dropped_indexes': dropped,
+            'pruned_rates': pruned_rates,
+            'integrity': problems,
+            'vacuumed': vacuumed,
+            'freed_bytes': freed_bytes,
+            'page_usage': usage,
+            'duration': time.perf_counter() - start,
+        }
+        with conn:
+            _ensure_log_table(conn)
+            conn.execute(
+                "INSERT INTO maintenance_log (run_at, duration, details) VALUES (?, ?, ?)",
+                (datetime.now().isoformat(timespec='seconds'), result['duration'],
+                 json.dumps(result, ensure_ascii=False))
+            )
+
+    logger.info(f"数据库维护完成，耗时 {result['duration']:.2f}s，回收 {freed_bytes // 1024} KB")
+    return result
+
+
+def maintain_after_update(db, min_changes: int = MIN_CHANGES,
+                          interval: timedelta = MAINTENANCE_INTERVAL,
+                          log: Optional[Callable[[str], None]] = None) -> Optional[Dict]:
+    """更新结束后按需维护，在后台线程中调用
+
+    本次进程写入的行数达到 min_changes，或有写入且距上次维护超过 interval 时执行。
+
+    Returns:
+        执行了维护时返回维护结果，否则返回 None
+    """
+    changes = db.total_changes() - db.changes_at_maintenance
+    if changes <= 0:
+        return None
+    if changes < min_changes:
+        with db.pool.writer() as conn, conn:
+            last_run = last_maintenance(conn)
+        if last_run is not None and datetime.now() - last_run < interval:
+            return None
+
+    if log:
+        log(f"数据已写入 {changes} 行，开始维护数据库...")
+    try:
+        result = run_maintenance(db)
+    except sqlite3.Error as e:
+        logger.error(f"数据库维护失败: {str(e)}")
+        if log:
+            log(f"数据库维护失败: {str(e)}")
+        return None
+
+    db.changes_at_maintenance = db.total_changes()
+    if log:
+        log(format_result(result))
+    return result
+
+
+def format_result(result: Dict) -> str:
+    parts = [f"数据库维护完成，耗时 {result['duration']:.2f}s"]
+    if result['dropped_indexes']:
+        parts.append(f"删除冗余索引 {', '.join(result['dropped_indexes'])}")
+    if result['vacuumed']:
+        parts.append(f"压缩回收 {result['freed_bytes'] // 1024} KB")
+    if result['integrity']:
+        parts.append(f"完整性检查发现 {len(result['integrity'])} 个问题")
+    return "，".join(parts)
+
+
+def analyze_search_patterns(db_path: str = DEFAULT_DB_PATH) -> Dict[str, int]:
+    """按章（编码前两位）统计记录数"""
     conn = sqlite3.connect(db_path)
     try:
-        # 添加索引
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_phonetic ON tariff_codes(phonetic_code)")
-        # 优化数据库
-        conn.execute("VACUUM")
-        conn.commit()
-        logger.info("数据库优化完成")
-    except Exception as e:
-        logger.error(f"数据库优化失败: {str(e)}")
+        patterns = dict(conn.execute(
+            "SELECT substr(code, 1, 2) AS chapter, COUNT(*) FROM tariffs GROUP BY chapter"
+        ).fetchall())
     finally:
         conn.close()
 
-def analyze_search_patterns(db_path: str = "tariff.db"):
-    """分析搜索模式，生成优化建议"""
-    conn = sqlite3.connect(db_path)
-    try:
-        cursor = conn.execute("SELECT code FROM tariff_codes")
-        codes = cursor.fetchall()
+    logger.info("编码模式分析:")
+    for chapter, count in sorted(patterns.items(), key=lambda x: x[1], reverse=True):
+        logger.info(f"第 {chapter} 章: {count} 条记录")
+    return patterns
+
+
+def cache_common_searches(searcher, query_log, limit: int = TOP_QUERIES) -> int:
+    """预先计算最常用的查询并固定在搜索缓存中，启动预热和数据更新后在后台线程中调用
+
+    Args:
+        searcher: IncrementalSearch 实例
+        query_log: QueryLog 实例
+        limit: 预先计算的查询数
 
-        # 分析编码模式
-        patterns = {}
-        for (code,) in codes:
-            prefix = code.split('.')[0]
-            patterns[prefix] = patterns.get(prefix, 0) + 1
+    Returns:
+        缓存的查询数
+    """
+    start = time.perf_counter()
+    count = searcher.warm(query_log.top(limit))
+    logger.info(f"已预先计算 {count} 个常用查询，耗时 {(time.perf_counter() - start)*1000:.0f} ms")
+    return count
 
-        # 输出分析结果
-        logger.info("编码模式分析:")
-        for prefix, count in sorted(patterns.items(), key=lambda x: x[1], reverse=True):
-            logger.info(f"前缀 {prefix}: {count} 条记录")
 
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="关税数据库维护")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="数据库文件")
+    parser.add_argument('--audit', action='store_true', help="只列出冗余索引，不做修改")
+    parser.add_argument('--vacuum', action='store_true', help="无论空闲页多少都压缩")
+    parser.add_argument('--no-vacuum', action='store_true', help="不压缩")
+    parser.add_argument('--keep-indexes', action='store_true', help="不删除冗余索引")
+    parser.add_argument('--full-check', action='store_true', help="执行完整的 integrity_check")
+    parser.add_argument('--backup', help="用 VACUUM INTO 把压缩后的数据库复制到该文件")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    if not os.path.exists(args.db):
+        logger.error(f"数据库不存在: {args.db}")
+        return 1
+
+    from tariff_db import TariffDB
+    db = TariffDB.get(args.db)
+    try:
+        if args.audit:
+            with db.pool.reader() as conn:
+                redundant = audit_indexes(conn)
+            for index in redundant:
+                print(f"{index['table']}.{index['name']}({', '.join(index['columns'])}) "
+                      f"与 {index['covered_by']} 重复")
+            if not redundant:
+                print("没有冗余索引")
+            return 0
+
+        if args.backup:
+            with db.pool.writer() as conn:
+                vacuum_into(conn, args.backup)
+            print(f"已备份到: {args.backup}")
+
+        vacuum_mode = "always" if args.vacuum else "never" if args.no_vacuum else "auto"
+        result = run_maintenance(db, vacuum_mode, not args.keep_indexes, args.full_check)
+        print(format_result(result))
+        return 1 if result['integrity'] else 0
     finally:
-        conn.close()
+        db.close()
+
 
-def cache_common_searches(db_path: str = "tariff.db"):
-    """缓存常用查询结果"""
-    # 这里可以实现缓存机制
-    pass
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""搜索词使用记录
+
+记录用户确认过的搜索（按回车、点击搜索、打开结果），按规范化后的查询和是否模糊匹配汇总次数，
+保存在数据库的 query_log 表中。启动时 optimizations.cache_common_searches 取出最常用的查询，
+预先算好结果并固定在搜索缓存里，启动后的头几次搜索不必等待冷数据。
+"""
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 累计这么多条未写入的记录后在后台写入数据库
+FLUSH_EVERY = 20
+
+
+def normalize_query(query: str) -> str:
+    """与 TariffAPI._normalize_code 相同，只保留数字"""
+    return ''.join(filter(str.isdigit, str(query)))
+
+
+class QueryLog:
+    """搜索词使用次数，先在内存中累计，批量写入数据库
+
+    Args:
+        db: TariffDB 实例
+        flush_every: 累计多少条记录后写入
+    """
+
+    def __init__(self, db, flush_every: int = FLUSH_EVERY):
+        self.db = db
+        self.flush_every = flush_every
+        self._pending: Counter = Counter()
+        self._lock = threading.Lock()
+        self._create_table()
+
+    def _create_table(self):
+        with self.db.pool.writer() as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS query_log (
+                    query TEXT,
+                    fuzzy INTEGER,
+                    hits INTEGER,
+                    last_used TEXT,
+                    PRIMARY KEY (query, fuzzy)
+                )
+            """)
+
+    def record(self, query: str, fuzzy: bool):
+        """记录一次搜索，可在主线程中调用，不访问数据库"""
+        norm_query = normalize_query(query)
+        if not norm_query:
+            return
+        with self._lock:
+            self._pending[(norm_query, bool(fuzzy))] += 1
+            full = sum(self._pending.values()) >= self.flush_every
+        if full:
+            threading.Thread(target=self.flush, daemon=True).start()
+
+    def flush(self):
+        """把内存中的记录写入数据库"""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return
+        now = datetime.now().isoformat(timespec='seconds')
+        try:
+            with self.db.pool.writer() as conn, conn:
+                conn.executemany(
+                    """
+                    INSERT INTO query_log (query, fuzzy, hits, last_used) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(query, fuzzy) DO UPDATE SET
+                        hits = hits + excluded.hits,
+                        last_used = excluded.last_used
+                    """,
+                    [(query, int(fuzzy), hits, now) for (query, fuzzy), hits in pending.items()]
+                )
+        except Exception as e:
+            logger.error(f"保存搜索记录失败: {str(e)}")
+
+    def top(self, limit: int = 50) -> List[Tuple[str, bool]]:
+        """使用次数最多的查询，次数相同时最近使用的在前"""
+        with self.db.pool.reader() as conn:
+            rows = conn.execute(
+                "SELECT query, fuzzy FROM query_log ORDER BY hits DESC, last_used DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [(query, bool(fuzzy)) for query, fuzzy in rows]
+
+    def close(self):
+        self.flush()
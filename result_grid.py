@@ -0,0 +1,246 @@
+"""虚拟化结果表格
+
+ttk.Treeview 为每一行创建一个条目，几千行时插入和清空都会卡住界面。
+VirtualTreeview 只为可见的行创建条目，滚动时复用这些条目并替换内容，
+数据按页从迭代器（如数据库游标）中读取，滚动到末尾时再读取下一页。
+清空只涉及可见的几十个条目，与结果总数无关。
+"""
+import itertools
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+
+class PagedRows:
+    """按页从数据源读取记录并缓存，与界面无关
+
+    Args:
+        page_size: 每次从数据源读取的记录数
+    """
+
+    def __init__(self, page_size: int = 200):
+        self.page_size = page_size
+        self.rows = []
+        self.total = None
+        self._source = iter(())
+        self.exhausted = True
+
+    def set_source(self, source: Iterable, total: Optional[int] = None):
+        """设置新的数据源，列表直接使用，迭代器按需读取
+
+        Args:
+            source: 记录列表或迭代器
+            total: 已知的记录总数，用于显示滚动条，未知时按已读取的数量估算
+        """
+        if isinstance(source, list):
+            self.rows = source
+            self._source = iter(())
+            self.exhausted = True
+            self.total = len(source)
+        else:
+            self.rows = []
+            self._source = iter(source)
+            self.exhausted = False
+            self.total = total
+        self.ensure(self.page_size)
+
+    def ensure(self, count: int) -> int:
+        """确保至少已读取 count 条记录（数据源足够时），返回已读取的数量"""
+        while not self.exhausted and len(self.rows) < count:
+            page = list(itertools.islice(self._source, self.page_size))
+            self.rows.extend(page)
+            if len(page) < self.page_size:
+                self.exhausted = True
+        if self.exhausted:
+            self.total = len(self.rows)
+        return len(self.rows)
+
+    def estimated_total(self) -> int:
+        """用于滚动条的总行数"""
+        if self.total is not None:
+            return self.total
+        # 还有未读取的数据时多算一页，滚动条不会到底
+        return len(self.rows) + self.page_size
+
+    def clamp_top(self, top: int, visible: int) -> int:
+        """把首行位置限制在有效范围内，需要时读取更多数据"""
+        self.ensure(top + visible)
+        return max(0, min(top, len(self.rows) - visible))
+
+    def window(self, top: int, visible: int) -> List:
+        return self.rows[top:top + visible]
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class VirtualTreeview(ttk.Frame):
+    """只渲染可见行的表格
+
+    tree 属性是内部的 ttk.Treeview，可以照常绑定事件、读取选中条目的 values；
+    get_record 可获取选中条目对应的原始记录。
+
+    Args:
+        master: 父控件
+        columns: 列名
+        column_widths: 列宽
+        formatter: 把记录转换为各列显示值的函数，默认记录本身就是值序列
+        page_size: 每次从数据源读取的记录数
+    """
+
+    DEFAULT_ROW_HEIGHT = 20
+
+    def __init__(self, master, columns: Sequence[str], column_widths: Optional[Dict] = None,
+                 formatter: Optional[Callable] = None, page_size: int = 200, height: int = 10):
+        super().__init__(master)
+        self.formatter = formatter or (lambda record: record)
+        self.data = PagedRows(page_size)
+        self.top = 0
+        self.visible_rows = height
+        self.selected_index = None
+        self._items = []
+        self._header_height = None
+        self._row_height = None
+
+        self.tree = ttk.Treeview(self, columns=columns, show='headings', height=height)
+        for col in columns:
+            self.tree.heading(col, text=col)
+            if column_widths and col in column_widths:
+                self.tree.column(col, width=column_widths[col])
+
+        # 滚动条映射的是全部结果，而不是 Treeview 中的条目
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.tree.bind('<Configure>', self._on_configure)
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+        self.tree.bind('<MouseWheel>', self._on_mousewheel)
+        self.tree.bind('<Button-4>', self._on_mousewheel)
+        self.tree.bind('<Button-5>', self._on_mousewheel)
+        self.tree.bind('<Up>', lambda e: self._move_selection(-1))
+        self.tree.bind('<Down>', lambda e: self._move_selection(1))
+        self.tree.bind('<Prior>', lambda e: self._move_selection(-self.visible_rows))
+        self.tree.bind('<Next>', lambda e: self._move_selection(self.visible_rows))
+
+    def set_rows(self, source: Iterable, total: Optional[int] = None):
+        """显示新的结果集，source 可以是列表或按需读取的迭代器"""
+        self.data.set_source(source, total)
+        self.top = 0
+        self.selected_index = None
+        self._render()
+
+    def clear(self):
+        """清空结果，只需删除可见的条目"""
+        self.set_rows([])
+
+    @property
+    def row_count(self) -> int:
+        """已读取的记录数"""
+        return len(self.data)
+
+    def get_record(self, item: str):
+        """获取可见条目对应的原始记录"""
+        if item not in self._items:
+            return None
+        return self.data.rows[self.top + self._items.index(item)]
+
+    def selected_record(self):
+        if self.selected_index is None or self.selected_index >= len(self.data):
+            return None
+        return self.data.rows[self.selected_index]
+
+    def scroll_to(self, top: int):
+        """滚动到指定首行"""
+        self.top = self.data.clamp_top(top, self.visible_rows)
+        self._render()
+
+    def _render(self):
+        """用当前窗口内的记录更新可见条目"""
+        records = self.data.window(self.top, self.visible_rows)
+        for slot, record in enumerate(records):
+            values = self.formatter(record)
+            if slot < len(self._items):
+                self.tree.item(self._items[slot], values=values)
+            else:
+                self._items.append(self.tree.insert('', 'end', values=values))
+        while len(self._items) > len(records):
+            self.tree.delete(self._items.pop())
+
+        # 选中状态跟随记录而不是条目
+        selected = self.selected_index
+        self.tree.selection_remove(self.tree.selection())
+        if selected is not None and self.top <= selected < self.top + len(records):
+            item = self._items[selected - self.top]
+            self.tree.selection_set(item)
+            self.tree.focus(item)
+
+        total = self.data.estimated_total()
+        if total:
+            self.scrollbar.set(self.top / total, (self.top + len(records)) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+        if self._header_height is None and self._items:
+            self._measure()
+
+    def _measure(self):
+        """根据第一行的位置测量表头和行高，重新计算可见行数"""
+        bbox = self.tree.bbox(self._items[0])
+        if bbox:
+            self._header_height = bbox[1]
+            self._row_height = bbox[3]
+            self._resize(self.tree.winfo_height())
+
+    def _on_configure(self, event):
+        self._resize(event.height)
+
+    def _resize(self, height: int):
+        header = self._header_height if self._header_height is not None else self.DEFAULT_ROW_HEIGHT + 4
+        row_height = self._row_height or self.DEFAULT_ROW_HEIGHT
+        rows = max(1, (height - header) // row_height)
+        if rows != self.visible_rows:
+            self.visible_rows = rows
+            self.scroll_to(self.top)
+
+    def _on_scrollbar(self, *args):
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * self.data.estimated_total()))
+        elif args[0] == 'scroll':
+            step = self.visible_rows if args[2] == 'pages' else 1
+            self.scroll_to(self.top + int(args[1]) * step)
+
+    def _on_mousewheel(self, event):
+        if event.num == 4:
+            delta = -3
+        elif event.num == 5:
+            delta = 3
+        else:
+            delta = -3 if event.delta > 0 else 3
+        self.scroll_to(self.top + delta)
+        return 'break'
+
+    def _on_select(self, event=None):
+        selection = self.tree.selection()
+        if selection and selection[0] in self._items:
+            self.selected_index = self.top + self._items.index(selection[0])
+
+    def _move_selection(self, delta: int):
+        """键盘移动选中行，到达可见区域边缘时滚动"""
+        if self.selected_index is None:
+            index = self.top
+        else:
+            index = self.selected_index + delta
+        available = self.data.ensure(index + 1)
+        if not available:
+            return 'break'
+        index = max(0, min(index, available - 1))
+
+        self.selected_index = index
+        if index < self.top:
+            self.scroll_to(index)
+        elif index >= self.top + self.visible_rows:
+            self.scroll_to(index - self.visible_rows + 1)
+        else:
+            self._render()
+        return 'break'
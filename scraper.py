@@ -1,10 +1,12 @@
+import argparse
 import asyncio
-from typing import List, Dict, Set
+from typing import Callable, List, Dict, Optional, Set
 from tools.web_scraper import scrape_urls
 from bs4 import BeautifulSoup
 import re
 import logging
 from tariff_db import TariffDB
+from bulk_load import BulkLoader
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,7 +21,7 @@ class TariffScraper:
         }
         self.timeout = 30  # 请求超时时间
         self.max_retries = 3  # 最大重试次数
-        self.db = TariffDB()
+        self.db = TariffDB.get()
         self.existing_codes = self.db.get_existing_codes()  # 获取已存在的编码
         logger.info(f"已存在 {len(self.existing_codes)} 条记录")
 
@@ -215,20 +217,31 @@ class TariffScraper:
             logger.error(f"初始化失败：{str(e)}")
             return False
 
-    async def scrape_tariffs(self) -> List[Dict]:
-        """抓取关税数据"""
+    def _check_pages(self, urls: List[str], contents: List[str], strict: bool):
+        """严格模式下有页面抓取失败时中止抓取，避免用不完整的结果替换数据库"""
+        missing = [url for url, content in zip(urls, contents) if not content]
+        if missing and strict:
+            raise RuntimeError(f"{len(missing)} 个页面抓取失败，例如 {missing[0]}")
+
+    async def scrape_tariffs(self, save: Optional[Callable[[List[Dict]], None]] = None,
+                             strict: bool = False) -> List[Dict]:
+        """抓取关税数据
+
+        Args:
+            save: 保存每批商品记录的函数，默认为 save_to_db
+            strict: 出错或有页面抓取失败时抛出异常，而不是记录日志后返回
+        """
+        save = save or self.save_to_db
         try:
             # 1. 获取section列表
             logger.info(f"开始抓取主页面: {self.browse_url}")
             content = await self.scrape_with_retry([self.browse_url])
             if not content or not content[0]:
-                logger.error("无法访问主页面")
-                return []
+                raise RuntimeError("无法访问主页面")
 
             section_urls = self.parse_section_links(content[0])
             if not section_urls:
-                logger.error("未找到任何section链接")
-                return []
+                raise RuntimeError("未找到任何section链接")
 
             # 2. 分批处理section
             batch_size = 10  # 每批处理5个section
@@ -237,6 +250,7 @@ class TariffScraper:
                 logger.info(f"正在处理第 {i//batch_size + 1} 批section，共 {len(batch_urls)} 个")
 
                 section_contents = await self.scrape_with_retry(batch_urls)
+                self._check_pages(batch_urls, section_contents, strict)
                 chapter_urls = []
                 for content in section_contents:
                     if content:
@@ -249,6 +263,7 @@ class TariffScraper:
                     logger.info(f"正在处理第 {j//batch_size + 1} 批chapter，共 {len(chapter_batch)} 个")
 
                     chapter_contents = await self.scrape_with_retry(chapter_batch)
+                    self._check_pages(chapter_batch, chapter_contents, strict)
                     heading_urls = []
                     for content in chapter_contents:
                         if content:
@@ -261,6 +276,7 @@ class TariffScraper:
                         logger.info(f"正在处理第 {k//batch_size + 1} 批heading，共 {len(heading_batch)} 个")
 
                         heading_contents = await self.scrape_with_retry(heading_batch)
+                        self._check_pages(heading_batch, heading_contents, strict)
                         commodity_urls = []
                         for content in heading_contents:
                             if content:
@@ -273,6 +289,7 @@ class TariffScraper:
                             logger.info(f"正在处理第 {m//batch_size + 1} 批commodity，共 {len(commodity_batch)} 个")
 
                             commodity_contents = await self.scrape_with_retry(commodity_batch)
+                            self._check_pages(commodity_batch, commodity_contents, strict)
                             batch_tariffs = []
 
                             for n, content in enumerate(commodity_contents):
@@ -283,7 +300,7 @@ class TariffScraper:
 
                             # 直接保存这一批数据
                             if batch_tariffs:
-                                self.save_to_db(batch_tariffs)
+                                save(batch_tariffs)
                                 logger.info(f"已保存 {len(batch_tariffs)} 条commodity记录")
 
             total_count = self.get_db_count()
@@ -292,46 +309,73 @@ class TariffScraper:
 
         except Exception as e:
             logger.error(f"抓取过程出错: {str(e)}")
+            if strict:
+                raise
             return []
 
     def save_to_db(self, tariffs: List[Dict]):
-        """保存到数据库"""
-        saved_count = 0
+        """保存新的商品记录，一批记录在一个事务中写入"""
+        new_tariffs = {}
         for tariff in tariffs:
-            try:
-                if not tariff or 'code' not in tariff:
-                    continue
+            if not tariff or 'code' not in tariff or tariff['code'] in self.existing_codes:
+                continue
+            new_tariffs[tariff['code']] = {
+                'code': tariff['code'],
+                'description': tariff['description'],
+                'rate': tariff['rate'],
+                'url': tariff.get('url') or f"{self.base_url}/commodities/{tariff['code']}",
+            }
+        if not new_tariffs:
+            return
+
+        codes = list(new_tariffs)
+        try:
+            self.db.add_tariffs_batch(list(new_tariffs.values()))
+        except Exception as e:
+            logger.error(f"保存记录失败: {str(e)}")
+            self.db.add_scrape_errors([(code, f"保存失败: {str(e)}") for code in codes])
+            return
 
-                if tariff['code'] in self.existing_codes:
-                    continue
+        self.existing_codes.update(codes)  # 更新已存在编码集合
+        # 保存成功，清除可能存在的错误记录
+        self.db.clear_scrape_errors(codes)
+        logger.info(f"成功保存 {len(codes)} 条记录")
 
-                self.db.add_tariff(
-                    code=tariff['code'],
-                    description=tariff['description'],
-                    rate=tariff['rate'],
-                    url=tariff.get('url')
-                )
-                self.existing_codes.add(tariff['code'])  # 更新已存在编码集合
-                saved_count += 1
+    async def rebuild_database(self) -> int:
+        """完整抓取并通过 BulkLoader 重建数据库，完成后替换原文件
 
-                # 如果保存成功，清除可能存在的错误记录
-                self.db.clear_scrape_error(tariff['code'])
+        重建时不跳过已存在的编码，新库中要有全部记录；
+        抓取出错时 BulkLoader 放弃导入，原数据库保持不变。
 
-            except Exception as e:
-                logger.error(f"保存记录失败: {str(e)}")
-                if tariff.get('code'):
-                    self.db.add_scrape_error(tariff['code'], f"保存失败: {str(e)}")
-                continue
-        logger.info(f"成功保存 {saved_count} 条记录")
+        Returns:
+            写入的记录数
+        """
+        def save(tariffs: List[Dict]):
+            loader.add_many(tariff for tariff in tariffs if tariff and 'code' in tariff)
+
+        self.existing_codes = set()
+        try:
+            with BulkLoader(self.db.db_path) as loader:
+                await self.scrape_tariffs(save=save, strict=True)
+        finally:
+            self.existing_codes = self.db.get_existing_codes()
+        return loader.written
 
     def get_db_count(self) -> int:
         """获取数据库中的记录总数"""
-        from tariff_db import TariffDB
-        db = TariffDB()
-        return db.get_record_count()
+        return self.db.get_record_count()
+
+async def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="抓取英国关税数据")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="完整抓取并重建数据库，抓取失败时保留原数据库")
+    args = parser.parse_args(argv)
 
-async def main():
     scraper = TariffScraper()
+    if args.rebuild:
+        written = await scraper.rebuild_database()
+        logger.info(f"数据库重建完成，共 {written} 条记录")
+        return
     tariffs = await scraper.scrape_tariffs()
     scraper.save_to_db(tariffs)
 
@@ -4,6 +4,10 @@ setup(
     name="tariff-query",
     version="1.0.0",
     packages=find_packages(include=['src', 'src.*']),
+    py_modules=['batch_cli', 'batch_processor', 'batch_io', 'tariff_api', 'tariff_db', 'db_pool',
+                'sql_profile', 'tariff_server', 'tariff_snapshot',
+                # src/gui 中使用的共享控件
+                'result_grid', 'ui_dispatcher', 'log_buffer', 'failed_items'],
     install_requires=[
         'aiohttp>=3.8.5',
         'beautifulsoup4>=4.12.2',
@@ -17,6 +21,8 @@ setup(
     entry_points={
         'console_scripts': [
             'tariff-query=src.main:main',
+            'tariff-batch=batch_cli:main',
+            'tariff-server=tariff_server:main',
         ],
     },
 )
\ No newline at end of file
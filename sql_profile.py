@@ -0,0 +1,291 @@
+"""SQL 语句耗时分析
+
+TariffDB 的连接都由 TracingConnection 创建。开启分析后，每条语句的执行次数、
+总耗时、p99 耗时和返回行数按语句汇总；超过阈值的慢语句记录一次 EXPLAIN QUERY PLAN，
+计划中出现全表扫描（SCAN）的语句在报告中标出。未开启时只多一次属性判断。
+
+用法:
+    python sql_profile.py                              # 在 tariffs copy.db 上运行查询并输出报告
+    python sql_profile.py --db tariffs.db --queries 50 --slow-ms 5
+    python sql_profile.py --json > sql_profile.json
+
+在主界面中按 Ctrl+Shift+P 开启分析，再按一次查看报告。
+"""
+import argparse
+import json
+import logging
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLOW_MS = 10.0
+# 每条语句保留最近这么多次耗时用于计算分位数
+MAX_SAMPLES = 1000
+
+
+def normalize_sql(sql: str) -> str:
+    """合并空白，使同一条语句的不同排版汇总到一起"""
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+class SQLProfiler:
+    """按语句汇总耗时，线程安全
+
+    Args:
+        slow_ms: 超过该耗时(毫秒)的语句记录查询计划
+        max_samples: 每条语句保留的耗时样本数
+    """
+
+    def __init__(self, slow_ms: float = DEFAULT_SLOW_MS, max_samples: int = MAX_SAMPLES):
+        self.slow_ms = slow_ms
+        self.max_samples = max_samples
+        self.enabled = False
+        self._stats: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def enable(self, slow_ms: Optional[float] = None):
+        if slow_ms is not None:
+            self.slow_ms = slow_ms
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def record(self, sql: str, elapsed: float, rows: int) -> bool:
+        """记录一次执行，返回是否需要为这条语句获取查询计划"""
+        key = normalize_sql(sql)
+        with self._lock:
+            stat = self._stats.get(key)
+            if stat is None:
+                stat = self._stats[key] = {
+                    'count': 0,
+                    'total': 0.0,
+                    'max': 0.0,
+                    'rows': 0,
+                    'samples': deque(maxlen=self.max_samples),
+                    'slow': 0,
+                    'plan': None,
+                }
+            stat['count'] += 1
+            stat['total'] += elapsed
+            stat['max'] = max(stat['max'], elapsed)
+            stat['rows'] += max(rows, 0)
+            stat['samples'].append(elapsed)
+            if elapsed * 1000 < self.slow_ms:
+                return False
+            stat['slow'] += 1
+            return stat['plan'] is None
+
+    def set_plan(self, sql: str, plan: List[str]):
+        with self._lock:
+            stat = self._stats.get(normalize_sql(sql))
+            if stat is not None:
+                stat['plan'] = plan
+
+    def report(self, sort: str = 'total_ms', limit: Optional[int] = None) -> List[Dict]:
+        """按指定字段降序返回每条语句的统计"""
+        with self._lock:
+            items = [(sql, dict(stat, samples=list(stat['samples']))) for sql, stat in self._stats.items()]
+
+        rows = []
+        for sql, stat in items:
+            samples = sorted(stat['samples'])
+            p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))] if samples else 0.0
+            plan = stat['plan'] or []
+            rows.append({
+                'sql': sql,
+                'count': stat['count'],
+                'total_ms': stat['total'] * 1000,
+                'avg_ms': stat['total'] * 1000 / stat['count'],
+                'p99_ms': p99 * 1000,
+                'max_ms': stat['max'] * 1000,
+                'rows': stat['rows'],
+                'slow': stat['slow'],
+                'plan': plan,
+                'full_scan': any(step.startswith('SCAN') for step in plan),
+            })
+        rows.sort(key=lambda row: row[sort], reverse=True)
+        return rows[:limit] if limit else rows
+
+
+def format_report(rows: List[Dict], sql_width: int = 70) -> str:
+    """格式化为文本表格，慢语句下方列出查询计划"""
+    if not rows:
+        return "没有记录到SQL语句"
+    lines = [f"{'次数':>7} {'总耗时ms':>10} {'平均ms':>8} {'p99ms':>8} {'行数':>9}  语句"]
+    for row in rows:
+        sql = row['sql'] if len(row['sql']) <= sql_width else row['sql'][:sql_width - 3] + '...'
+        flag = ' [全表扫描]' if row['full_scan'] else ''
+        lines.append(
+            f"{row['count']:>7} {row['total_ms']:>10.1f} {row['avg_ms']:>8.2f} "
+            f"{row['p99_ms']:>8.2f} {row['rows']:>9}  {sql}{flag}"
+        )
+        for step in row['plan']:
+            lines.append(f"{'':>46}  └ {step}")
+    return "\n".join(lines)
+
+
+# 进程内共享的分析器，所有 TracingConnection 默认记录到这里
+PROFILER = SQLProfiler()
+
+
+class _FetchedCursor:
+    """开启分析时查询结果已全部取出，用它代替游标返回给调用方"""
+
+    def __init__(self, cursor: sqlite3.Cursor, rows: List[tuple]):
+        self._cursor = cursor
+        self._rows = rows
+        self._pos = 0
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def fetchone(self):
+        if self._pos >= len(self._rows):
+            return None
+        row = self._rows[self._pos]
+        self._pos += 1
+        return row
+
+    def fetchmany(self, size: Optional[int] = None):
+        size = size or self._cursor.arraysize
+        rows = self._rows[self._pos:self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._cursor.close()
+
+
+class TracingConnection(sqlite3.Connection):
+    """记录 execute 和 executemany 耗时的连接
+
+    sqlite3.connect(path, factory=TracingConnection) 创建。
+    查询语句在计时范围内取出全部结果，耗时包含逐行读取的时间。
+    """
+
+    profiler: SQLProfiler = PROFILER
+
+    def execute(self, sql: str, parameters=()):
+        profiler = self.profiler
+        if not profiler.enabled:
+            return super().execute(sql, parameters)
+
+        start = time.perf_counter()
+        cursor = super().execute(sql, parameters)
+        if cursor.description is not None:
+            rows = cursor.fetchall()
+            result, count = _FetchedCursor(cursor, rows), len(rows)
+        else:
+            result, count = cursor, cursor.rowcount
+        if profiler.record(sql, time.perf_counter() - start, count):
+            self._capture_plan(sql, parameters)
+        return result
+
+    def executemany(self, sql: str, seq_of_parameters):
+        profiler = self.profiler
+        if not profiler.enabled:
+            return super().executemany(sql, seq_of_parameters)
+
+        seq_of_parameters = list(seq_of_parameters)
+        start = time.perf_counter()
+        cursor = super().executemany(sql, seq_of_parameters)
+        if profiler.record(sql, time.perf_counter() - start, cursor.rowcount) and seq_of_parameters:
+            self._capture_plan(sql, seq_of_parameters[0])
+        return cursor
+
+    def _capture_plan(self, sql: str, parameters):
+        try:
+            plan = sqlite3.Connection.execute(self, f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+        except sqlite3.Error as e:
+            logger.debug(f"获取查询计划失败: {str(e)}")
+            return
+        self.profiler.set_plan(sql, [row[-1] for row in plan])
+
+
+def connect(db_path: str, timeout: float = 5.0, **kwargs) -> sqlite3.Connection:
+    """创建带耗时记录的连接，参数与 sqlite3.connect 相同"""
+    return sqlite3.connect(db_path, timeout=timeout, factory=TracingConnection, **kwargs)
+
+
+def run_workload(db_path: str, queries: int, seed: int) -> None:
+    """用真实编码执行精确查询和模糊查询"""
+    from tariff_api import TariffAPI
+
+    api = TariffAPI(db_path)
+    codes = api.get_all_codes()
+    if not codes:
+        raise ValueError(f"数据库中没有编码: {db_path}")
+    rng = random.Random(seed)
+    sample = [rng.choice(codes) for _ in range(queries)]
+
+    for code in sample:
+        api.search_tariff(code)
+    for code in sample:
+        api.search_tariff(code[:6], fuzzy=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="SQL 语句耗时分析")
+    parser.add_argument('--db', default="tariffs copy.db", help="数据库文件")
+    parser.add_argument('--queries', type=int, default=20, help="每类查询的次数")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--slow-ms', type=float, default=DEFAULT_SLOW_MS, help="记录查询计划的耗时阈值(毫秒)")
+    parser.add_argument('--sort', default='total_ms',
+                        choices=['total_ms', 'count', 'p99_ms', 'avg_ms', 'rows'])
+    parser.add_argument('--top', type=int, default=20, help="显示的语句数")
+    parser.add_argument('--json', action='store_true', help="以JSON格式输出")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+
+    # 作为脚本运行时本模块是 __main__，TariffDB 记录到的是 sql_profile 模块中的分析器
+    from sql_profile import PROFILER as profiler
+
+    profiler.enable(args.slow_ms)
+    run_workload(args.db, args.queries, args.seed)
+    rows = profiler.report(args.sort, args.top)
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print(format_report(rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,43 @@
+import os
 import sqlite3
 import logging
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, Tuple
 import threading
 from datetime import datetime
 
+import sql_profile
+
 logger = logging.getLogger(__name__)
 
 class TariffDB:
+    # 进程内按数据库路径共享的实例，见 TariffDB.get
+    _registry: Dict[str, "TariffDB"] = {}
+    _registry_lock = threading.Lock()
+    # fork 时从父进程继承的实例，见 _reset_registry_after_fork
+    _inherited: List["TariffDB"] = []
+
     def __init__(self, db_path: str = "tariffs.db"):
         self.db_path = db_path
         self._local = threading.local()
         self._create_tables()
 
+    @classmethod
+    def get(cls, db_path: str = "tariffs.db") -> "TariffDB":
+        """获取该路径在进程内共享的实例，建表语句只在首次获取时执行一次"""
+        key = os.path.abspath(db_path)
+        with cls._registry_lock:
+            db = cls._registry.get(key)
+            if db is None:
+                db = cls(db_path)
+                cls._registry[key] = db
+            return db
+
     @property
     def conn(self):
         """获取当前线程的数据库连接"""
         if not hasattr(self._local, 'conn'):
-            self._local.conn = sqlite3.connect(self.db_path)
+            # 开启 sql_profile.PROFILER 后记录每条语句的耗时
+            self._local.conn = sql_profile.connect(self.db_path)
         return self._local.conn
 
     def _create_tables(self):
@@ -44,10 +65,7 @@ class TariffDB:
                         last_attempt TIMESTAMP
                     )
                 """)
-
-                # 创建索引
-                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_code ON tariffs(code)")
-                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_error_code ON scrape_errors(code)")
+                # code 是主键，已有自动索引，不再单独建索引
 
         except Exception as e:
             logger.error(f"创建数据表失败: {str(e)}")
@@ -101,6 +119,24 @@ class TariffDB:
         except Exception as e:
             logger.error(f"添加错误记录失败: {str(e)}")
 
+    def add_scrape_errors(self, errors: List[Tuple[str, str]], timestamp: Optional[str] = None):
+        """批量添加抓取错误记录
+
+        Args:
+            errors: (编码, 错误信息) 列表
+            timestamp: 记录时间，默认为当前时间
+        """
+        last_attempt = timestamp or datetime.now()
+        try:
+            with self.conn:
+                self.conn.executemany("""
+                    INSERT OR REPLACE INTO scrape_errors
+                    (code, error_message, last_attempt)
+                    VALUES (?, ?, ?)
+                """, [(code, message, last_attempt) for code, message in errors])
+        except Exception as e:
+            logger.error(f"添加错误记录失败: {str(e)}")
+
     def get_scrape_errors(self) -> List[Dict]:
         """获取所有抓取错误记录"""
         try:
@@ -130,6 +166,19 @@ class TariffDB:
         except Exception as e:
             logger.error(f"清除错误记录失败: {str(e)}")
 
+    def clear_scrape_errors(self, codes: Optional[List[str]] = None):
+        """批量清除抓取错误记录，codes 为 None 时清除全部"""
+        try:
+            with self.conn:
+                if codes is None:
+                    self.conn.execute("DELETE FROM scrape_errors")
+                else:
+                    self.conn.executemany(
+                        "DELETE FROM scrape_errors WHERE code = ?", [(code,) for code in codes]
+                    )
+        except Exception as e:
+            logger.error(f"清除错误记录失败: {str(e)}")
+
     def close(self):
         """关闭数据库连接"""
         if hasattr(self._local, 'conn'):
@@ -168,4 +217,71 @@ class TariffDB:
                 ]
         except Exception as e:
             logger.error(f"搜索关税信息失败: {str(e)}")
-            return []
\ No newline at end of file
+            return []
+
+    def count_search_tariffs(self, code: str, fuzzy: bool = False) -> int:
+        """统计搜索结果数量"""
+        try:
+            if fuzzy:
+                cursor = self.conn.execute(
+                    "SELECT COUNT(*) FROM tariffs WHERE code LIKE ? OR description LIKE ?",
+                    (f"%{code}%", f"%{code}%")
+                )
+            else:
+                cursor = self.conn.execute("SELECT COUNT(*) FROM tariffs WHERE code = ?", (code,))
+            return cursor.fetchone()[0]
+        except Exception as e:
+            logger.error(f"统计搜索结果失败: {str(e)}")
+            return 0
+
+    def iter_search_tariffs(self, code: str, fuzzy: bool = False,
+                            page_size: int = 200) -> Iterator[Dict]:
+        """按编码顺序分页读取搜索结果
+
+        每一页是一次独立的查询，从上一页最后的编码之后继续，
+        结果只在需要时读取，也不会在两页之间一直占用数据库读锁。
+        """
+        last_code = ''
+        while True:
+            try:
+                if fuzzy:
+                    rows = self.conn.execute("""
+                        SELECT code, description, rate, north_ireland_rate
+                        FROM tariffs
+                        WHERE (code LIKE ? OR description LIKE ?)
+                        AND code > ?
+                        ORDER BY code
+                        LIMIT ?
+                    """, (f"%{code}%", f"%{code}%", last_code, page_size)).fetchall()
+                else:
+                    rows = self.conn.execute("""
+                        SELECT code, description, rate, north_ireland_rate
+                        FROM tariffs
+                        WHERE code = ?
+                    """, (code,)).fetchall()
+            except Exception as e:
+                logger.error(f"搜索关税信息失败: {str(e)}")
+                return
+
+            for row in rows:
+                yield {
+                    'code': row[0],
+                    'description': row[1],
+                    'rate': row[2],
+                    'north_ireland_rate': row[3]
+                }
+
+            if not fuzzy or len(rows) < page_size:
+                return
+            last_code = rows[-1][0]
+
+
+def _reset_registry_after_fork():
+    """fork 出的子进程不能使用父进程的 SQLite 连接，换用新的注册表和锁，继承来的实例不在子进程中关闭"""
+    TariffDB._inherited.extend(TariffDB._registry.values())
+    TariffDB._registry = {}
+    TariffDB._registry_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_registry_after_fork)
@@ -14,7 +14,7 @@ class BaseScraper:
         }
         self.timeout = 30
         self.max_retries = 3
-        self.db = TariffDB()
+        self.db = TariffDB.get()
         self.progress_callback = None
         self.log_callback = None
         self.should_stop = None
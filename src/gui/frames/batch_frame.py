@@ -3,9 +3,10 @@ from tkinter import ttk, filedialog
 import logging
 from typing import Dict, List
 from ...core.db.tariff_db import TariffDB
-import queue
 import threading
 from datetime import datetime
+from ui_dispatcher import UIDispatcher
+from log_buffer import TextLogView
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +15,7 @@ class BatchFrame(ttk.Frame):
         super().__init__(master)
         self.setup_ui()
         self.setup_queue()
-        self.db = TariffDB()
+        self.db = TariffDB.get()
 
     def setup_ui(self):
         """设置UI界面"""
@@ -108,21 +109,9 @@ class BatchFrame(ttk.Frame):
         self.history_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
     def setup_queue(self):
-        """设置消息队列"""
-        self.queue = queue.Queue()
-        self.after(100, self.process_queue)
-
-    def process_queue(self):
-        """处理消息队列"""
-        try:
-            while True:
-                func, args, kwargs = self.queue.get_nowait()
-                func(*args, **kwargs)
-                self.queue.task_done()
-        except queue.Empty:
-            pass
-        finally:
-            self.after(100, self.process_queue)
+        """设置界面更新分发器，后台线程通过它在主线程中更新界面"""
+        self.dispatcher = UIDispatcher.for_widget(self)
+        self.log_view = TextLogView(self.log_text, self.dispatcher.log)
 
     def browse_file(self):
         """浏览文件"""
@@ -147,7 +136,7 @@ class BatchFrame(ttk.Frame):
         self.browse_btn.configure(state='disabled')
         self.status_var.set("正在处理...")
         self.progress_var.set(0)
-        self.log_text.delete(1.0, tk.END)
+        self.log_view.clear()
 
         # 在后台线程中处理
         thread = threading.Thread(
@@ -162,6 +151,5 @@ class BatchFrame(ttk.Frame):
         pass
 
     def add_log(self, message: str):
-        """添加日志"""
-        self.log_text.insert(tk.END, f"{message}\n")
-        self.log_text.see(tk.END)
\ No newline at end of file
+        """添加日志，可以在任意线程中调用，同一批日志一次写入"""
+        self.log_view.add(message)
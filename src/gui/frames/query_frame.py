@@ -2,6 +2,7 @@ import tkinter as tk
 from tkinter import ttk
 import logging
 from ...core.db.tariff_db import TariffDB
+from result_grid import VirtualTreeview
 import webbrowser
 import tkinter.messagebox as messagebox
 
@@ -10,7 +11,7 @@ logger = logging.getLogger(__name__)
 class QueryFrame(ttk.Frame):
     def __init__(self, master):
         super().__init__(master)
-        self.db = TariffDB()
+        self.db = TariffDB.get()
         self.setup_ui()
 
     def setup_ui(self):
@@ -56,38 +57,27 @@ class QueryFrame(ttk.Frame):
         result_frame = ttk.LabelFrame(self, text="查询结果")
         result_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
-        # 结果列表
+        # 结果列表，只渲染可见的行，滚动时按页读取
         columns = ('编码', '描述', '英国税率', '北爱税率')
-        self.result_tree = ttk.Treeview(
-            result_frame,
-            columns=columns,
-            show='headings',
-            height=10
-        )
-
-        # 设置列
         column_widths = {
             '编码': 100,
             '描述': 300,
             '英国税率': 100,
             '北爱税率': 100
         }
-
-        for col in columns:
-            self.result_tree.heading(col, text=col)
-            self.result_tree.column(col, width=column_widths[col])
-
-        # 添加滚动条
-        scrollbar = ttk.Scrollbar(
+        self.result_grid = VirtualTreeview(
             result_frame,
-            orient=tk.VERTICAL,
-            command=self.result_tree.yview
+            columns=columns,
+            column_widths=column_widths,
+            formatter=lambda result: (
+                result['code'],
+                result['description'],
+                result['rate'],
+                result['north_ireland_rate']
+            )
         )
-        self.result_tree.configure(yscrollcommand=scrollbar.set)
-
-        # 布局
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.result_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.result_grid.pack(fill=tk.BOTH, expand=True)
+        self.result_tree = self.result_grid.tree
 
         # 状态栏
         self.status_var = tk.StringVar(value="就绪")
@@ -110,31 +100,21 @@ class QueryFrame(ttk.Frame):
             messagebox.showwarning("警告", "请输入商品编码")
             return
 
-        # 清空结果列表
-        for item in self.result_tree.get_children():
-            self.result_tree.delete(item)
-
         try:
-            # 从数据库查询
-            results = self.db.search_tariffs(
-                code,
-                fuzzy=(self.search_mode.get() == "fuzzy")
+            fuzzy = self.search_mode.get() == "fuzzy"
+            total = self.db.count_search_tariffs(code, fuzzy=fuzzy)
+
+            # 替换数据源即可清空旧结果，新结果在滚动时才从数据库读取
+            self.result_grid.set_rows(
+                self.db.iter_search_tariffs(code, fuzzy=fuzzy),
+                total=total
             )
 
-            if not results:
+            if not total:
                 self.status_var.set("未找到匹配的商品")
                 return
 
-            # 显示结果
-            for result in results:
-                self.result_tree.insert('', 'end', values=(
-                    result['code'],
-                    result['description'],
-                    result['rate'],
-                    result['north_ireland_rate']
-                ))
-
-            self.status_var.set(f"找到 {len(results)} 条结果")
+            self.status_var.set(f"找到 {total} 条结果")
 
         except Exception as e:
             logger.error(f"查询失败: {str(e)}")
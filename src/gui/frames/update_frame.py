@@ -1,14 +1,16 @@
 import tkinter as tk
 from tkinter import ttk
 import logging
-import queue
 import threading
 import asyncio
 from src.core.scraper.uk_scraper import UKScraper
 from src.core.scraper.ni_scraper import NIScraper
+from src.core.db.tariff_db import TariffDB
 import tkinter.messagebox as messagebox
 from typing import List
-from datetime import datetime
+from ui_dispatcher import UIDispatcher
+from log_buffer import TextLogView
+from failed_items import FailedItemStore, FailedItemsView
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +21,7 @@ class UpdateFrame(ttk.Frame):
         self.setup_queue()
         self.is_updating = False
         self.last_update = None  # 保存上次更新状态
+        self.setup_failed_items()
 
     def setup_ui(self):
         """设置UI界面"""
@@ -166,26 +169,19 @@ class UpdateFrame(ttk.Frame):
         self.failed_tree.bind('<<TreeviewSelect>>', self.on_failed_select)
 
     def setup_queue(self):
-        """设置消息队列"""
-        self.queue = queue.Queue()
-        self.after(100, self.process_queue)
+        """设置界面更新分发器，后台线程通过它在主线程中更新界面"""
+        self.dispatcher = UIDispatcher.for_widget(self)
+        self.log_view = TextLogView(self.log_text, self.dispatcher.log)
 
-    def process_queue(self):
-        """处理消息队列"""
-        try:
-            while True:
-                func, args, kwargs = self.queue.get_nowait()
-                func(*args, **kwargs)
-                self.queue.task_done()
-        except queue.Empty:
-            pass
-        finally:
-            self.after(100, self.process_queue)
+    def setup_failed_items(self):
+        """加载上次保存的失败项"""
+        self.failed_store = FailedItemStore(TariffDB.get())
+        self.failed_view = FailedItemsView(self.failed_tree)
+        self._refresh_failed_items(self.failed_store.load())
 
     def add_log(self, message: str):
-        """添加日志"""
-        self.log_text.insert(tk.END, f"{message}\n")
-        self.log_text.see(tk.END)
+        """添加日志，可以在任意线程中调用，同一批日志一次写入"""
+        self.log_view.add(message)
 
     def start_update(self):
         """开始更新数据"""
@@ -214,7 +210,7 @@ class UpdateFrame(ttk.Frame):
         self.status_var.set("正在更新数据...")
         self.progress_var.set(0)
         if not self.last_update:
-            self.log_text.delete(1.0, tk.END)
+            self.log_view.clear()
 
         self.is_updating = True
 
@@ -245,11 +241,7 @@ class UpdateFrame(ttk.Frame):
 
             # 设置回调函数
             def update_progress(progress, current_code=None):
-                self.queue.put((
-                    self._update_progress,
-                    (progress, current_code),
-                    {}
-                ))
+                self.dispatcher.latest((self, 'progress'), self._update_progress, progress, current_code)
 
             scraper.set_progress_callback(update_progress)
             scraper.set_log_callback(self.add_log)
@@ -268,21 +260,20 @@ class UpdateFrame(ttk.Frame):
 
             loop.close()
 
+            # 抓取器直接写入 scrape_errors，更新结束后整体重新加载
+            self.dispatcher.call(self._refresh_failed_items, self.failed_store.load())
+
             if success:
-                self.queue.put((self._update_complete, (), {}))
+                self.dispatcher.call(self._update_complete)
             else:
                 raise Exception("更新失败")
 
         except Exception as e:
             logger.error(f"更新数据失败: {str(e)}")
-            self.queue.put((
-                self.status_var.set,
-                (f"更新失败: {str(e)}",),
-                {}
-            ))
+            self.dispatcher.call(self.status_var.set, f"更新失败: {str(e)}")
         finally:
             self.is_updating = False
-            self.queue.put((self._reset_update_ui, (), {}))
+            self.dispatcher.call(self._reset_update_ui)
 
     def _update_progress(self, progress: float, current_code: str = None):
         """更新进度"""
@@ -306,6 +297,7 @@ class UpdateFrame(ttk.Frame):
         """重置更新UI状态"""
         self.update_btn.configure(state='normal')
         self.stop_btn.configure(state='disabled')
+        self._update_failed_buttons()
 
     def on_failed_select(self, event):
         """失败项选择事件处理"""
@@ -316,29 +308,32 @@ class UpdateFrame(ttk.Frame):
 
     def add_failed_item(self, code: str, error: str):
         """添加失败项"""
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # 检查是否已存在
-        for item in self.failed_tree.get_children():
-            if self.failed_tree.item(item)['values'][0] == code:
-                # 更新现有项
-                self.failed_tree.item(item, values=(code, error, current_time))
-                break
-        else:
-            # 添加新项
-            self.failed_tree.insert('', 'end', values=(code, error, current_time))
-
-        # 启用相关按钮
-        self.retry_all_btn.configure(state='normal')
-        self.clear_failed_btn.configure(state='normal')
+        item = self.failed_store.add(code, error)
+        self.failed_view.upsert([item])
+        self._update_failed_buttons()
 
     def clear_failed_list(self):
         """清空失败列表"""
-        for item in self.failed_tree.get_children():
-            self.failed_tree.delete(item)
-        self.retry_all_btn.configure(state='disabled')
-        self.retry_selected_btn.configure(state='disabled')
-        self.clear_failed_btn.configure(state='disabled')
+        self.failed_store.clear()
+        self.failed_view.refresh([])
+        self._update_failed_buttons()
+
+    def _refresh_failed_items(self, items):
+        """用全部失败项重建失败列表"""
+        self.failed_view.refresh(items)
+        self._update_failed_buttons()
+
+    def _remove_failed_items(self, codes: List[str]):
+        self.failed_view.remove(codes)
+        self._update_failed_buttons()
+
+    def _update_failed_buttons(self):
+        """根据失败列表是否为空启用或禁用相关按钮"""
+        state = 'normal' if self.failed_view.row_count and not self.is_updating else 'disabled'
+        self.retry_all_btn.configure(state=state)
+        self.clear_failed_btn.configure(state=state)
+        if not self.failed_view.selected_codes() or self.is_updating:
+            self.retry_selected_btn.configure(state='disabled')
 
     async def retry_codes(self, codes: List[str]):
         """重试指定编码"""
@@ -368,45 +363,34 @@ class UpdateFrame(ttk.Frame):
 
             if success:
                 # 从失败列表中移除
-                for item in self.failed_tree.get_children():
-                    if self.failed_tree.item(item)['values'][0] == code:
-                        self.failed_tree.delete(item)
-                        break
+                self.failed_store.remove(code)
+                self.dispatcher.call(self._remove_failed_items, [code])
             else:
                 self.add_log(f"重试商品 {code} 失败")
 
-        # 检查是否还有失败项
-        if not self.failed_tree.get_children():
-            self.retry_all_btn.configure(state='disabled')
-            self.clear_failed_btn.configure(state='disabled')
-
     def retry_selected(self):
         """重试选中的失败项"""
         selected_items = self.failed_tree.selection()
         if not selected_items:
             return
 
-        codes = [
-            self.failed_tree.item(item)['values'][0]
-            for item in selected_items
-        ]
-
-        # 在后台线程中执行重试
-        thread = threading.Thread(
-            target=self._retry_in_thread,
-            args=(codes,),
-            daemon=True
-        )
-        thread.start()
+        self._start_retry(self.failed_view.selected_codes())
 
     def retry_all(self):
         """重试所有失败项"""
-        codes = [
-            self.failed_tree.item(item)['values'][0]
-            for item in self.failed_tree.get_children()
-        ]
+        self._start_retry(self.failed_store.codes())
+
+    def _start_retry(self, codes: List[str]):
+        """禁用相关按钮并在后台线程中执行重试"""
+        if not codes or self.is_updating:
+            return
+        self.is_updating = True
+        self.update_btn.configure(state='disabled')
+        self.stop_btn.configure(state='normal')
+        self.retry_selected_btn.configure(state='disabled')
+        self.retry_all_btn.configure(state='disabled')
+        self.clear_failed_btn.configure(state='disabled')
 
-        # 在后台线程中执行重试
         thread = threading.Thread(
             target=self._retry_in_thread,
             args=(codes,),
@@ -416,12 +400,6 @@ class UpdateFrame(ttk.Frame):
 
     def _retry_in_thread(self, codes: List[str]):
         """在后台线程中执行重试"""
-        self.is_updating = True
-        self.update_btn.configure(state='disabled')
-        self.stop_btn.configure(state='normal')
-        self.retry_selected_btn.configure(state='disabled')
-        self.retry_all_btn.configure(state='disabled')
-
         try:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
@@ -429,4 +407,4 @@ class UpdateFrame(ttk.Frame):
             loop.close()
         finally:
             self.is_updating = False
-            self.queue.put((self._reset_update_ui, (), {}))
\ No newline at end of file
+            self.dispatcher.call(self._reset_update_ui)
\ No newline at end of file
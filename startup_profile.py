@@ -0,0 +1,117 @@
+"""启动导入耗时分析
+
+在子进程中以 `python -X importtime` 导入指定模块（默认 tariff_gui），
+汇总每个模块的自身耗时和累计耗时，找出拖慢启动的依赖。
+
+用法:
+    python startup_profile.py                     # 分析 tariff_gui
+    python startup_profile.py --module batch_gui --top 30
+    python startup_profile.py --json > startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+
+def parse_importtime(output: str) -> List[Dict]:
+    """解析 -X importtime 的输出
+
+    Returns:
+        模块列表，每项包含 module、self_ms、cumulative_ms 和 depth（嵌套层级）
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            modules.append({
+                'module': name.strip(),
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+                'depth': (len(name) - len(name.lstrip())) // 2,
+            })
+        except ValueError:
+            continue
+    return modules
+
+
+def profile_imports(module: str = "tariff_gui", runs: int = 1) -> Dict:
+    """在新进程中导入模块并统计耗时，多次运行时每个模块取最小值"""
+    best = {}
+    total = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"导入 {module} 失败:\n{result.stderr[-2000:]}")
+
+        direct = []
+        pending = []
+        for item in parse_importtime(result.stderr):
+            # 输出按后序排列，子模块在父模块之前
+            if item['depth'] == 1:
+                pending.append(item['module'])
+            elif item['depth'] == 0:
+                if item['module'] == module:
+                    direct = pending
+                pending = []
+
+            current = best.get(item['module'])
+            if current is None or item['cumulative_ms'] < current['cumulative_ms']:
+                best[item['module']] = item
+        if module in best:
+            total = best[module]['cumulative_ms'] if total is None else min(total, best[module]['cumulative_ms'])
+
+    return {
+        'module': module,
+        'total_ms': total or 0.0,
+        'direct': direct,
+        'modules': list(best.values()),
+    }
+
+
+def format_report(report: Dict, top: int = 20) -> str:
+    """按累计耗时列出顶层依赖，按自身耗时列出最慢的模块"""
+    modules = report['modules']
+    lines = [f"导入 {report['module']} 共耗时 {report['total_ms']:.1f} ms", ""]
+
+    # 被分析模块的直接依赖反映可以延迟导入的部分
+    by_name = {m['module']: m for m in modules}
+    direct = [by_name[name] for name in report['direct'] if name in by_name]
+    lines.append(f"{'直接依赖':<40}{'累计(ms)':>12}")
+    for m in sorted(direct, key=lambda m: m['cumulative_ms'], reverse=True)[:top]:
+        lines.append(f"{m['module']:<40}{m['cumulative_ms']:>12.1f}")
+
+    lines.append("")
+    lines.append(f"{'模块':<40}{'自身(ms)':>12}{'累计(ms)':>12}")
+    for m in sorted(modules, key=lambda m: m['self_ms'], reverse=True)[:top]:
+        lines.append(f"{m['module']:<40}{m['self_ms']:>12.1f}{m['cumulative_ms']:>12.1f}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="启动导入耗时分析")
+    parser.add_argument('--module', default="tariff_gui", help="要分析的模块")
+    parser.add_argument('--runs', type=int, default=3, help="运行次数，取最小值")
+    parser.add_argument('--top', type=int, default=20, help="显示的模块数")
+    parser.add_argument('--json', action='store_true', help="以JSON格式输出")
+    args = parser.parse_args(argv)
+
+    report = profile_imports(args.module, args.runs)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(format_report(report, args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
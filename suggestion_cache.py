@@ -0,0 +1,148 @@
+"""官网搜索建议缓存
+
+每次输入停顿和每次点击搜索都会请求 /search_suggestions.json，即使同一个查询刚刚请求过。
+SuggestionCache 以规范化后的查询为键，在内存和磁盘上缓存响应，过期后重新请求。
+编码查询的响应没有被截断且只包含编码建议时，它就包含了所有以该编码开头的建议，
+更长的编码可以直接从中过滤，不必再请求。
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = "search_suggestions_cache.json"
+
+
+def normalize_query(query: str) -> str:
+    """规范化查询：去掉首尾空白，合并空白，转小写；纯编码查询去掉点和空格"""
+    query = re.sub(r'\s+', ' ', query.strip().lower())
+    compact = re.sub(r'[\s.]', '', query)
+    return compact if compact.isdigit() else query
+
+
+class SuggestionCache:
+    """带过期时间的搜索建议缓存，线程安全
+
+    Args:
+        path: 磁盘缓存文件，为 None 时只缓存在内存中
+        ttl: 缓存有效秒数
+        max_entries: 最多缓存的查询数，超出时淘汰最久未使用的
+        result_limit: 官网单次返回的建议数上限，结果少于该数量时认为响应是完整的
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 24 * 3600,
+                 max_entries: int = 500, result_limit: int = 10):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.result_limit = result_limit
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self._load()
+
+    def get(self, query: str) -> Optional[List[Dict]]:
+        """查找缓存的建议列表，未命中时返回 None
+
+        没有完全相同的查询时，尝试用更短的编码前缀的完整响应过滤。
+        响应中有化学品等非编码建议时无法判断它们是否匹配更长的编码，不用于过滤
+        """
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            entry = self._fresh_entry(key, now)
+            if entry is not None:
+                self.hits += 1
+                return list(entry['results'])
+
+            if key.isdigit():
+                for length in range(len(key) - 1, 0, -1):
+                    entry = self._fresh_entry(key[:length], now)
+                    if entry is not None and entry['complete'] and self._codes_only(entry['results']):
+                        self.hits += 1
+                        return [r for r in entry['results'] if self._code_of(r).startswith(key)]
+
+            self.misses += 1
+            return None
+
+    def put(self, query: str, results: List[Dict]):
+        """缓存一次成功的响应，results 为空表示没有建议"""
+        key = normalize_query(query)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = {
+                'time': time.time(),
+                'results': list(results),
+                'complete': len(results) < self.result_limit,
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if self.path:
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _fresh_entry(self, key: str, now: float) -> Optional[Dict]:
+        """取出未过期的条目并标记为最近使用（调用方持有锁）"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry['time'] > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    @staticmethod
+    def _code_of(result: Dict) -> str:
+        """建议对应的编码，官网结果中编码在 text 或 id 字段"""
+        return normalize_query(str(result.get('text') or result.get('id') or ''))
+
+    @classmethod
+    def _codes_only(cls, results: List[Dict]) -> bool:
+        return all(cls._code_of(result).isdigit() for result in results)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            now = time.time()
+            entries = sorted(
+                ((key, entry) for key, entry in data.items() if now - entry['time'] <= self.ttl),
+                key=lambda item: item[1]['time']
+            )
+            self._entries = OrderedDict(entries[-self.max_entries:])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"读取搜索建议缓存失败: {str(e)}")
+
+    def _save(self):
+        """先写入临时文件再替换，避免中途退出时留下损坏的缓存"""
+        tmp_path = f"{self.path}.tmp"
+        with self._save_lock:
+            # 在写入锁内取快照，并发保存时后写入的总是较新的内容
+            with self._lock:
+                entries = dict(self._entries)
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"保存搜索建议缓存失败: {str(e)}")
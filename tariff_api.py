@@ -1,14 +1,57 @@
+import bisect
 import logging
 import re
+import threading
 from typing import List, Dict, Union, Optional
 from tariff_db import TariffDB
+from tariff_snapshot import TariffSnapshot
 from Levenshtein import ratio
 
 logger = logging.getLogger(__name__)
 
+# 模糊匹配时每处理这么多条记录检查一次是否取消
+CANCEL_CHECK_INTERVAL = 1024
+
+
+class SearchCancelled(Exception):
+    """搜索被更新的查询取代"""
+
+
 class TariffAPI:
-    def __init__(self):
-        self.db = TariffDB()
+    def __init__(self, db_path: str = "tariffs.db", snapshot_path: Optional[str] = None):
+        self.db = TariffDB.get(db_path)
+        # 提供快照时精确查询直接在 mmap 快照上二分查找
+        self.snapshot_path = snapshot_path
+        self.snapshot = TariffSnapshot(snapshot_path) if snapshot_path else None
+        self._index = None
+        self._codes = None
+        self._index_lock = threading.Lock()
+
+    def load_index(self, force: bool = False) -> List[Dict]:
+        """加载内存索引
+
+        所有记录只从数据库读取一次，按编码排序后由所有线程共享（只读）。
+
+        Args:
+            force: 是否强制重新加载
+        """
+        index = self._index
+        if index is not None and not force:
+            return index
+
+        with self._index_lock:
+            if self._index is None or force:
+                index = sorted(self.db.get_all_tariffs(), key=lambda t: t['code'])
+                self._codes = [t['code'] for t in index]
+                self._index = index
+                logger.info(f"已加载搜索索引，共 {len(self._index)} 条记录")
+            return self._index
+
+    def invalidate_index(self):
+        """数据更新后清除内存索引，下次查询时重新加载"""
+        with self._index_lock:
+            self._index = None
+            self._codes = None
 
     def _normalize_code(self, code: str) -> str:
         """标准化商品编码，只保留数字"""
@@ -55,7 +98,10 @@ class TariffAPI:
         try:
             # 标准化输入编码
             norm_code = self._normalize_code(code)
-            result = self.db.get_tariff(norm_code)
+            if self.snapshot:
+                result = self.snapshot.get_tariff(norm_code)
+            else:
+                result = self.db.get_tariff(norm_code)
             if result:
                 result['similarity'] = 1.0  # 精确匹配设置相似度为1
             return result
@@ -90,12 +136,13 @@ class TariffAPI:
             logger.error(f"获取记录数失败: {str(e)}")
             raise
 
-    def fuzzy_search(self, query: str, limit: int = 10) -> List[Dict]:
+    def fuzzy_search(self, query: str, limit: int = 10, threshold: float = 0.2) -> List[Dict]:
         """模糊搜索关税信息
 
         Args:
             query: 搜索关键词
             limit: 返回结果数量限制
+            threshold: 相似度阈值，低于该值的记录不返回
 
         Returns:
             匹配的关税信息列表，按相似度排序，每个结果包含similarity字段
@@ -113,32 +160,101 @@ class TariffAPI:
             if exact_result:
                 return [exact_result]
 
-            # 获取所有记录
-            all_tariffs = self.db.get_all_tariffs()
-
-            # 计算每条记录的相似度
-            scored_results = []
-            for tariff in all_tariffs:
-                # 计算相似度
-                similarity = self._calculate_similarity(norm_query, tariff['code'])
-
-                if similarity > 0.2:  # 降低相似度阈值，因为前缀匹配更严格
-                    tariff['similarity'] = similarity  # 将相似度添加到结果中
-                    scored_results.append((similarity, tariff))
-
-            # 按相似度排序并限制返回数量
-            scored_results.sort(reverse=True, key=lambda x: x[0])
-            return [item[1] for item in scored_results[:limit]]
+            return self.rank_by_similarity(norm_query, limit, threshold)
 
         except Exception as e:
             logger.error(f"模糊搜索失败: {str(e)}")
             return []
 
+    def rank_by_similarity(self, norm_query: str, limit: int = 10,
+                           threshold: float = 0.2, candidates: Optional[List[Dict]] = None,
+                           should_stop=None) -> List[Dict]:
+        """在内存索引中按相似度排序，不做精确匹配
+
+        Args:
+            norm_query: 已标准化的编码
+            limit: 返回结果数量限制
+            threshold: 相似度阈值
+            candidates: 只在这些记录中排序，默认为整个索引
+            should_stop: 返回True时中止搜索并抛出SearchCancelled
+
+        Returns:
+            匹配的关税信息副本列表，每个结果包含similarity字段
+        """
+        # 使用共享的内存索引，避免每次查询都读取整张表
+        all_tariffs = self.load_index() if candidates is None else candidates
+
+        # 计算每条记录的相似度
+        scored_results = []
+        for i, tariff in enumerate(all_tariffs):
+            if should_stop and i % CANCEL_CHECK_INTERVAL == 0 and should_stop():
+                raise SearchCancelled(norm_query)
+
+            similarity = self._calculate_similarity(norm_query, tariff['code'])
+
+            if similarity > threshold:  # 默认阈值较低，因为前缀匹配更严格
+                scored_results.append((similarity, tariff))
+
+        # 按相似度排序并限制返回数量，返回副本以免修改共享索引
+        scored_results.sort(reverse=True, key=lambda x: x[0])
+        results = []
+        for similarity, tariff in scored_results[:limit]:
+            result = dict(tariff)
+            result['similarity'] = similarity  # 将相似度添加到结果中
+            results.append(result)
+        return results
+
+    def _sorted_index(self):
+        """获取有序索引及对应的编码列表"""
+        index = self.load_index()
+        with self._index_lock:
+            codes = self._codes if self._index is index else None
+        if codes is None:
+            # 索引刚被重新加载，按当前持有的索引重建编码列表
+            codes = [t['code'] for t in index]
+        return index, codes
+
+    def prefix_candidates(self, prefix: str) -> List[Dict]:
+        """获取编码以 prefix 开头的所有记录（索引中的原始记录，不可修改）"""
+        index, codes = self._sorted_index()
+        start = bisect.bisect_left(codes, prefix)
+        end = bisect.bisect_left(codes, prefix + ':', start)  # ':' 排在所有数字之后
+        return index[start:end]
+
+    def get_children(self, prefix: str = "") -> List[Dict]:
+        """获取编码层级中某个前缀的下一级节点
+
+        层级依次为章(2位)、品目(4位)、子目(6位)、8位和10位编码。
+
+        Args:
+            prefix: 编码前缀，为空时返回所有章
+
+        Returns:
+            下一级节点列表，每项包含code和该节点下的记录数count，
+            节点本身就是一条记录时包含tariff字段
+        """
+        prefix = self._normalize_code(prefix)
+        index, codes = self._sorted_index()
+        length = len(prefix) + 2 - len(prefix) % 2
+
+        # 编码有序，每个子节点只需两次二分查找，不必遍历前缀下的全部记录
+        children = []
+        i = bisect.bisect_left(codes, prefix)
+        end = bisect.bisect_left(codes, prefix + ':')  # ':' 排在所有数字之后
+        while i < end:
+            child = codes[i][:length]
+            j = bisect.bisect_left(codes, child + ':', i, end)
+            node = {'code': child, 'count': j - i}
+            if codes[i] == child:
+                node['tariff'] = dict(index[i])
+            children.append(node)
+            i = j
+        return children
+
     def get_all_codes(self) -> List[str]:
         """获取所有商品编码"""
         try:
-            tariffs = self.db.get_all_tariffs()
-            return [t['code'] for t in tariffs]
+            return [t['code'] for t in self.load_index()]
         except Exception as e:
             logger.error(f"获取编码列表失败: {str(e)}")
             return []
\ No newline at end of file
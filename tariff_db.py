@@ -1,58 +1,292 @@
+import os
 import sqlite3
 import logging
-from typing import List, Dict, Optional
 import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Dict, Optional, Tuple
+
+from db_pool import ConnectionPool
+import sql_profile
 
 logger = logging.getLogger(__name__)
 
+UK_COMMODITY_URL = "https://www.trade-tariff.service.gov.uk/commodities/"
+NI_COMMODITY_URL = "https://www.trade-tariff.service.gov.uk/xi/commodities/"
+
+# 数据库结构版本，保存在 PRAGMA user_version 中；2 为紧凑存储，3 修改了 tariffs 视图的写入触发器
+SCHEMA_VERSION = 3
+
+# 紧凑存储：税率字符串只有几百种，存入 rates 表后每行只保存编号；
+# 网址只在与默认地址（基础地址加编码）不同时保存，读取时再拼出来；
+# 北爱尔兰网址只在有北爱尔兰税率时省略，没有税率的行照原样保存写入的网址。
+# tariffs 是与旧表字段相同的视图，通过 INSTEAD OF 触发器写入，原有的查询和写入语句不用修改。
+COMPACT_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS rates (
+        id INTEGER PRIMARY KEY,
+        rate TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tariff_rows (
+        code TEXT PRIMARY KEY,
+        description TEXT,
+        rate_id INTEGER,
+        north_ireland_rate_id INTEGER,
+        url TEXT,
+        north_ireland_url TEXT,
+        updated_at TIMESTAMP
+    ) WITHOUT ROWID
+    """,
+    f"""
+    CREATE VIEW IF NOT EXISTS tariffs AS
+    SELECT t.code AS code,
+           t.description AS description,
+           r.rate AS rate,
+           COALESCE(t.url, '{UK_COMMODITY_URL}' || t.code) AS url,
+           nr.rate AS north_ireland_rate,
+           CASE WHEN t.north_ireland_rate_id IS NOT NULL OR t.north_ireland_url IS NOT NULL
+                THEN COALESCE(t.north_ireland_url, '{NI_COMMODITY_URL}' || t.code)
+           END AS north_ireland_url,
+           t.updated_at AS updated_at
+    FROM tariff_rows AS t
+    LEFT JOIN rates AS r ON r.id = t.rate_id
+    LEFT JOIN rates AS nr ON nr.id = t.north_ireland_rate_id
+    """,
+    # 新税率用 NOT EXISTS 插入而不是 INSERT OR IGNORE：
+    # 外层语句是 INSERT OR REPLACE 时触发器内的冲突处理也会变成 REPLACE，会改掉已有税率的编号。
+    # 写入 tariff_rows 用普通 INSERT，编码已存在时按外层语句的冲突处理（默认报 IntegrityError）
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tariffs_insert INSTEAD OF INSERT ON tariffs
+    BEGIN
+        INSERT INTO rates (rate) SELECT NEW.rate
+        WHERE NEW.rate IS NOT NULL AND NOT EXISTS (SELECT 1 FROM rates WHERE rate = NEW.rate);
+        INSERT INTO rates (rate) SELECT NEW.north_ireland_rate
+        WHERE NEW.north_ireland_rate IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM rates WHERE rate = NEW.north_ireland_rate);
+        INSERT INTO tariff_rows
+        (code, description, rate_id, north_ireland_rate_id, url, north_ireland_url, updated_at)
+        VALUES (
+            NEW.code, NEW.description,
+            (SELECT id FROM rates WHERE rate = NEW.rate),
+            (SELECT id FROM rates WHERE rate = NEW.north_ireland_rate),
+            NULLIF(NEW.url, '{UK_COMMODITY_URL}' || NEW.code),
+            CASE WHEN NEW.north_ireland_rate IS NOT NULL
+                 THEN NULLIF(NEW.north_ireland_url, '{NI_COMMODITY_URL}' || NEW.code)
+                 ELSE NEW.north_ireland_url
+            END,
+            NEW.updated_at
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tariffs_update INSTEAD OF UPDATE ON tariffs
+    BEGIN
+        INSERT INTO rates (rate) SELECT NEW.rate
+        WHERE NEW.rate IS NOT NULL AND NOT EXISTS (SELECT 1 FROM rates WHERE rate = NEW.rate);
+        INSERT INTO rates (rate) SELECT NEW.north_ireland_rate
+        WHERE NEW.north_ireland_rate IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM rates WHERE rate = NEW.north_ireland_rate);
+        UPDATE tariff_rows SET
+            code = NEW.code,
+            description = NEW.description,
+            rate_id = (SELECT id FROM rates WHERE rate = NEW.rate),
+            north_ireland_rate_id = (SELECT id FROM rates WHERE rate = NEW.north_ireland_rate),
+            url = NULLIF(NEW.url, '{UK_COMMODITY_URL}' || NEW.code),
+            north_ireland_url = CASE WHEN NEW.north_ireland_rate IS NOT NULL
+                                     THEN NULLIF(NEW.north_ireland_url, '{NI_COMMODITY_URL}' || NEW.code)
+                                     ELSE NEW.north_ireland_url
+                                END,
+            updated_at = NEW.updated_at
+        WHERE code = OLD.code;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tariffs_delete INSTEAD OF DELETE ON tariffs
+    BEGIN
+        DELETE FROM tariff_rows WHERE code = OLD.code;
+    END
+    """,
+]
+
 class TariffDB:
-    def __init__(self, db_path: str = "tariffs.db"):
+    # 进程内按数据库路径共享的实例，见 TariffDB.get
+    _registry: Dict[str, "TariffDB"] = {}
+    _registry_lock = threading.Lock()
+    # fork 时从父进程继承的实例，见 _reset_registry_after_fork
+    _inherited: List["TariffDB"] = []
+
+    def __init__(self, db_path: str = "tariffs.db", pool_size: int = 4):
+        """
+        Args:
+            db_path: 数据库路径
+            pool_size: 读连接数上限，读操作从连接池取用连接，写操作共用一个写连接
+        """
         self.db_path = db_path
-        self._local = threading.local()
+        # 连接由 sql_profile 创建，开启 sql_profile.PROFILER 后记录每条语句的耗时
+        self.pool = ConnectionPool(
+            db_path, pool_size,
+            connect=lambda path, timeout: sql_profile.connect(path, timeout, check_same_thread=False)
+        )
+        # 上次维护时写连接的累计修改行数，见 optimizations.maintain_after_update
+        self.changes_at_maintenance = 0
         self._create_tables()
 
-    @property
-    def conn(self) -> sqlite3.Connection:
-        """获取当前线程的数据库连接"""
-        if not hasattr(self._local, "conn"):
-            self._local.conn = sqlite3.connect(self.db_path)
-        return self._local.conn
+    @classmethod
+    def get(cls, db_path: str = "tariffs.db") -> "TariffDB":
+        """获取该路径在进程内共享的实例
+
+        同一个数据库只建一次表、只有一个连接池和写连接，
+        各模块不再各自创建 TariffDB 并重复执行建表语句、争抢写锁。
+        """
+        key = os.path.abspath(db_path)
+        with cls._registry_lock:
+            db = cls._registry.get(key)
+            if db is None:
+                db = cls(db_path)
+                cls._registry[key] = db
+            return db
+
+    @classmethod
+    @contextmanager
+    def replacing(cls, db_path: str) -> Iterator[None]:
+        """with TariffDB.replacing(path): 在其中替换数据库文件
+
+        该路径的共享实例在替换期间不取用连接，退出后重新连接到新文件。
+        """
+        with cls._registry_lock:
+            db = cls._registry.get(os.path.abspath(db_path))
+        if db is None:
+            yield
+            return
+        with db.pool.replacing():
+            yield
+            # 新的写连接从零开始累计修改行数
+            db.changes_at_maintenance = 0
+
+    @classmethod
+    def close_all(cls):
+        """关闭所有共享实例，程序退出时调用"""
+        with cls._registry_lock:
+            instances = list(cls._registry.values())
+            cls._registry.clear()
+        for db in instances:
+            db.pool.close()
+
+    def _query(self, sql: str, params=()) -> List[tuple]:
+        """在读连接上执行查询并返回全部行"""
+        with self.pool.reader() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def _query_one(self, sql: str, params=()) -> Optional[tuple]:
+        with self.pool.reader() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def total_changes(self) -> int:
+        """本实例打开以来写入、修改和删除的总行数"""
+        with self.pool.writer() as conn:
+            return conn.total_changes
+
+    def pool_stats(self) -> Dict:
+        """连接池统计信息"""
+        return self.pool.stats()
+
+    def close(self):
+        """关闭所有数据库连接，共享实例同时从注册表中移除"""
+        key = os.path.abspath(self.db_path)
+        with self._registry_lock:
+            if self._registry.get(key) is self:
+                del self._registry[key]
+        self.pool.close()
 
     def _create_tables(self):
-        """创建数据表"""
-        try:
-            with self.conn:
-                self.conn.execute("""
-                CREATE TABLE IF NOT EXISTS tariffs (
-                    code TEXT PRIMARY KEY,
-                    description TEXT,
-                    rate TEXT,
-                    url TEXT,
-                    north_ireland_rate TEXT,
-                    north_ireland_url TEXT
-                )
-                """)
-                # 添加错误记录表
-                self.conn.execute("""
-                CREATE TABLE IF NOT EXISTS scrape_errors (
-                    code TEXT PRIMARY KEY,
-                    error_message TEXT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-                """)
-                # 添加索引
-                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_code ON tariffs(code)")
+        """创建数据表，旧版数据库迁移到紧凑存储"""
+        try:
+            with self.pool.writer() as conn:
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                    return
+
+                # 立即取得写锁后重新读取版本：其他进程可能刚刚完成迁移，tariffs 已经变成视图
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    version = conn.execute("PRAGMA user_version").fetchone()[0]
+                    if version >= SCHEMA_VERSION:
+                        conn.execute("ROLLBACK")
+                        return
+                    legacy = conn.execute(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tariffs'"
+                    ).fetchone() is not None
+
+                    if legacy:
+                        conn.execute("ALTER TABLE tariffs RENAME TO tariffs_legacy")
+                    elif version >= 2:
+                        # 视图上的触发器随视图一起删除，再按当前定义重建
+                        conn.execute("DROP VIEW IF EXISTS tariffs")
+                    for sql in COMPACT_SCHEMA:
+                        conn.execute(sql)
+                    # 添加错误记录表
+                    conn.execute("""
+                    CREATE TABLE IF NOT EXISTS scrape_errors (
+                        code TEXT PRIMARY KEY,
+                        error_message TEXT,
+                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                    """)
+                    if legacy:
+                        count = self._migrate_legacy(conn)
+                    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+
+                if legacy:
+                    logger.info(f"已将 {count} 条记录迁移到紧凑存储")
+                    # 旧表删除后留下的空闲页归还给文件系统；迁移已经提交，其他连接占用数据库时下次维护再压缩
+                    try:
+                        conn.execute("VACUUM")
+                    except sqlite3.OperationalError as e:
+                        logger.warning(f"迁移后压缩数据库失败: {str(e)}")
         except Exception as e:
             logger.error(f"创建表失败: {str(e)}")
             raise
 
+    @staticmethod
+    def _migrate_legacy(conn: sqlite3.Connection) -> int:
+        """把旧版 tariffs 表的数据转换到 tariff_rows，返回迁移的记录数"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(tariffs_legacy)").fetchall()}
+        updated_at = "updated_at" if "updated_at" in columns else "NULL"
+        conn.execute("""
+            INSERT INTO rates (rate)
+            SELECT rate FROM tariffs_legacy WHERE rate IS NOT NULL
+            UNION
+            SELECT north_ireland_rate FROM tariffs_legacy WHERE north_ireland_rate IS NOT NULL
+        """)
+        conn.execute(f"""
+            INSERT OR REPLACE INTO tariff_rows
+            (code, description, rate_id, north_ireland_rate_id, url, north_ireland_url, updated_at)
+            SELECT code, description,
+                   (SELECT id FROM rates WHERE rate = l.rate),
+                   (SELECT id FROM rates WHERE rate = l.north_ireland_rate),
+                   NULLIF(url, '{UK_COMMODITY_URL}' || code),
+                   CASE WHEN north_ireland_rate IS NOT NULL
+                        THEN NULLIF(north_ireland_url, '{NI_COMMODITY_URL}' || code)
+                        ELSE north_ireland_url
+                   END,
+                   {updated_at}
+            FROM tariffs_legacy AS l
+        """)
+        count = conn.execute("SELECT COUNT(*) FROM tariff_rows").fetchone()[0]
+        conn.execute("DROP TABLE tariffs_legacy")
+        return count
+
     def add_tariff(self, code: str, description: str, rate: str, url: str = None):
         """添加关税记录"""
         if url is None:
-            url = f"https://www.trade-tariff.service.gov.uk/commodities/{code}"
+            url = f"{UK_COMMODITY_URL}{code}"
         try:
-            with self.conn:
-                self.conn.execute(
+            with self.pool.writer() as conn, conn:
+                conn.execute(
                     "INSERT OR REPLACE INTO tariffs (code, description, rate, url) VALUES (?, ?, ?, ?)",
                     (code, description, rate, url)
                 )
@@ -63,11 +297,10 @@ class TariffDB:
     def get_tariff(self, code: str) -> Optional[Dict]:
         """精确查询关税记录"""
         try:
-            cur = self.conn.execute(
+            row = self._query_one(
                 "SELECT code, description, rate, url, north_ireland_rate, north_ireland_url FROM tariffs WHERE code = ?",
                 (code,)
             )
-            row = cur.fetchone()
             if row:
                 return {
                     'code': row[0],
@@ -85,7 +318,7 @@ class TariffDB:
     def get_all_tariffs(self) -> List[Dict]:
         """获取所有关税记录"""
         try:
-            cur = self.conn.execute("SELECT code, description, rate, url, north_ireland_url, north_ireland_rate FROM tariffs")
+            rows = self._query("SELECT code, description, rate, url, north_ireland_url, north_ireland_rate FROM tariffs")
             return [
                 {
                     'code': row[0],
@@ -95,7 +328,7 @@ class TariffDB:
                     'north_ireland_url': row[4],
                     'north_ireland_rate': row[5]
                 }
-                for row in cur.fetchall()
+                for row in rows
             ]
         except Exception as e:
             logger.error(f"获取所有记录失败: {str(e)}")
@@ -104,8 +337,7 @@ class TariffDB:
     def get_record_count(self) -> int:
         """获取数据库中的记录数"""
         try:
-            cur = self.conn.execute("SELECT COUNT(*) FROM tariffs")
-            return cur.fetchone()[0]
+            return self._query_one("SELECT COUNT(*) FROM tariffs")[0]
         except Exception as e:
             logger.error(f"获取记录数失败: {str(e)}")
             raise
@@ -113,10 +345,20 @@ class TariffDB:
     def add_tariffs_batch(self, tariffs: List[Dict]):
         """批量添加关税记录"""
         try:
-            with self.conn:
-                self.conn.executemany(
-                    "INSERT OR REPLACE INTO tariffs (code, description, rate, url) VALUES (?, ?, ?, ?)",
-                    [(t['code'], t['description'], t['rate'], t.get('url')) for t in tariffs]
+            with self.pool.writer() as conn, conn:
+                conn.executemany(
+                    """
+                    INSERT OR REPLACE INTO tariffs
+                    (code, description, rate, url, north_ireland_rate, north_ireland_url)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (
+                            t['code'], t['description'], t['rate'], t.get('url'),
+                            t.get('north_ireland_rate'), t.get('north_ireland_url')
+                        )
+                        for t in tariffs
+                    ]
                 )
         except Exception as e:
             logger.error(f"批量添加记录失败: {str(e)}")
@@ -124,10 +366,8 @@ class TariffDB:
 
     def save_to_db(self, tariffs: List[Dict]):
         """保存到数据库"""
-        from tariff_db import TariffDB
-        db = TariffDB()
         try:
-            db.add_tariffs_batch(tariffs)
+            self.add_tariffs_batch(tariffs)
             logger.info(f"成功保存 {len(tariffs)} 条记录")
         except Exception as e:
             logger.error(f"保存记录失败: {str(e)}")
@@ -135,16 +375,14 @@ class TariffDB:
     def get_existing_codes(self) -> set:
         """获取已存在的所有商品编码"""
         try:
-            cur = self.conn.execute("SELECT code FROM tariffs")
-            return set(row[0] for row in cur.fetchall())
+            return set(row[0] for row in self._query("SELECT code FROM tariffs"))
         except Exception as e:
             logger.error(f"获取已存在编码失败: {str(e)}")
             return set()
     def get_existing_codes_north_ireland(self) -> set:
         """获取已存在的所有北爱尔兰商品编码"""
         try:
-            cur = self.conn.execute("SELECT code FROM tariffs WHERE north_ireland_rate IS NOT NULL")
-            return set(row[0] for row in cur.fetchall())
+            return set(row[0] for row in self._query("SELECT code FROM tariffs WHERE north_ireland_rate IS NOT NULL"))
         except Exception as e:
             logger.error(f"获取已存在北爱尔兰编码失败: {str(e)}")
             return set()
@@ -152,8 +390,8 @@ class TariffDB:
     def update_north_ireland_tariff(self, code: str, rate: str, url: str):
         """更新北爱尔兰关税信息"""
         try:
-            with self.conn:
-                self.conn.execute("""
+            with self.pool.writer() as conn, conn:
+                conn.execute("""
                     UPDATE tariffs
                     SET north_ireland_rate = ?, north_ireland_url = ?
                     WHERE code = ?
@@ -164,18 +402,35 @@ class TariffDB:
     def add_scrape_error(self, code: str, error_message: str):
         """记录抓取错误"""
         try:
-            with self.conn:
-                self.conn.execute(
+            with self.pool.writer() as conn, conn:
+                conn.execute(
                     "INSERT OR REPLACE INTO scrape_errors (code, error_message) VALUES (?, ?)",
                     (code, error_message)
                 )
         except Exception as e:
             logger.error(f"记录抓取错误失败: {str(e)}")
 
+    def add_scrape_errors(self, errors: List[Tuple[str, str]], timestamp: Optional[str] = None):
+        """批量记录抓取错误
+
+        Args:
+            errors: (编码, 错误信息) 列表
+            timestamp: 记录时间，默认为数据库当前时间
+        """
+        try:
+            with self.pool.writer() as conn, conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO scrape_errors (code, error_message, timestamp) "
+                    "VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP))",
+                    [(code, message, timestamp) for code, message in errors]
+                )
+        except Exception as e:
+            logger.error(f"记录抓取错误失败: {str(e)}")
+
     def get_scrape_errors(self) -> List[Dict]:
         """获取所有抓取错误记录"""
         try:
-            cur = self.conn.execute(
+            rows = self._query(
                 "SELECT code, error_message, timestamp FROM scrape_errors"
             )
             return [
@@ -184,7 +439,7 @@ class TariffDB:
                     'error_message': row[1],
                     'timestamp': row[2]
                 }
-                for row in cur.fetchall()
+                for row in rows
             ]
         except Exception as e:
             logger.error(f"获取抓取错误记录失败: {str(e)}")
@@ -193,17 +448,28 @@ class TariffDB:
     def clear_scrape_error(self, code: str):
         """清除指定编码的抓取错误记录"""
         try:
-            with self.conn:
-                self.conn.execute("DELETE FROM scrape_errors WHERE code = ?", (code,))
+            with self.pool.writer() as conn, conn:
+                conn.execute("DELETE FROM scrape_errors WHERE code = ?", (code,))
+        except Exception as e:
+            logger.error(f"清除抓取错误记录失败: {str(e)}")
+
+    def clear_scrape_errors(self, codes: Optional[List[str]] = None):
+        """批量清除抓取错误记录，codes 为 None 时清除全部"""
+        try:
+            with self.pool.writer() as conn, conn:
+                if codes is None:
+                    conn.execute("DELETE FROM scrape_errors")
+                else:
+                    conn.executemany(
+                        "DELETE FROM scrape_errors WHERE code = ?", [(code,) for code in codes]
+                    )
         except Exception as e:
             logger.error(f"清除抓取错误记录失败: {str(e)}")
 
     def get_all_codes(self) -> List[str]:
         """获取所有商品编码"""
         try:
-            with self.conn:
-                cursor = self.conn.execute("SELECT code FROM tariffs")
-                return [row[0] for row in cursor.fetchall()]
+            return [row[0] for row in self._query("SELECT code FROM tariffs")]
         except Exception as e:
             logger.error(f"获取商品编码失败: {str(e)}")
             return []
@@ -211,11 +477,28 @@ class TariffDB:
     def update_uk_tariff(self, code: str, description: str, rate: str, url: str):
         """更新英国关税信息"""
         try:
-            with self.conn:
-                self.conn.execute("""
+            with self.pool.writer() as conn, conn:
+                conn.execute("""
                     UPDATE tariffs
                     SET description = ?, rate = ?, url = ?
                     WHERE code = ?
                 """, (description, rate, url, code))
         except Exception as e:
-            logger.error(f"更新英国关税失败: {str(e)}")
\ No newline at end of file
+            logger.error(f"更新英国关税失败: {str(e)}")
+
+
+def _reset_registry_after_fork():
+    """fork 出的子进程使用新的注册表
+
+    Linux 上 multiprocessing 默认用 fork 创建进程，子进程会继承父进程的共享实例、
+    其中的 SQLite 连接和锁。SQLite 连接不能跨 fork 使用，fork 时被其他线程持有的锁
+    在子进程中永远不会释放。子进程换用新的注册表和锁，首次 get 时重新连接；
+    继承来的实例保留引用，不在子进程中关闭或回收父进程的连接。
+    """
+    TariffDB._inherited.extend(TariffDB._registry.values())
+    TariffDB._registry = {}
+    TariffDB._registry_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_registry_after_fork)
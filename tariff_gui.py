@@ -1,27 +1,42 @@
+import time
+_START_TIME = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk
+import importlib
 import logging
 from tariff_api import TariffAPI
-import queue
+from tariff_db import TariffDB
+from incremental_search import IncrementalSearch
+from result_grid import VirtualTreeview
 import threading
-from batch_gui import BatchProcessFrame
-import asyncio
 import tkinter.messagebox as messagebox
-from update_gui import UpdateFrame
+from ui_dispatcher import UIDispatcher
+from query_log import QueryLog
+from optimizations import cache_common_searches, maintain_after_update
+import sql_profile
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# 批量查询和数据更新标签页在首次切换时才创建: (属性名, 标签文字, 模块, 类名)
+LAZY_TABS = [
+    ('batch_frame', "批量查询", 'batch_gui', 'BatchProcessFrame'),
+    ('update_frame', "数据更新", 'update_gui', 'UpdateFrame'),
+]
+
+# 单个查询最多显示的模糊匹配结果数，表格只渲染可见行，结果多也不会卡顿
+RESULT_LIMIT = 500
+
 class TariffGUI:
     def __init__(self):
-        # 添加必要的导入
-        import asyncio
-
         self.root = tk.Tk()
         self.root.title("关税查询工具")
         self.setup_ui()
         self.setup_api()
         self.setup_queue()
+        # 窗口显示后再在后台加载索引和其他标签页的模块
+        self.root.after_idle(self.start_warmup)
 
     def setup_ui(self):
         """设置UI界面"""
@@ -57,13 +72,50 @@ class TariffGUI:
         self.notebook.add(self.single_frame, text="单个查询")
         self.setup_single_search()
 
-        # 批量查询标签页
-        self.batch_frame = BatchProcessFrame(self.notebook)
-        self.notebook.add(self.batch_frame, text="批量查询")
-
-        # 数据更新标签页
-        self.update_frame = UpdateFrame(self.notebook)
-        self.notebook.add(self.update_frame, text="数据更新")
+        # 其他标签页先放置空容器，切换到该页时再导入模块并创建
+        self.lazy_tabs = {}
+        for attr, text, module_name, class_name in LAZY_TABS:
+            setattr(self, attr, None)
+            container = ttk.Frame(self.notebook)
+            self.notebook.add(container, text=text)
+            self.lazy_tabs[str(container)] = (attr, container, module_name, class_name)
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        # Ctrl+Shift+P 开启SQL耗时分析，再按一次查看报告
+        self.root.bind('<Control-P>', self.toggle_sql_profile)
+
+    def on_tab_changed(self, event=None):
+        """切换标签页时创建尚未加载的页面"""
+        tab = self.notebook.select()
+        if tab in self.lazy_tabs:
+            self.load_tab(tab)
+
+    def load_tab(self, tab: str):
+        """导入模块并在容器中创建标签页内容"""
+        attr, container, module_name, class_name = self.lazy_tabs.pop(tab)
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        frame = getattr(module, class_name)(container)
+        frame.pack(fill=tk.BOTH, expand=True)
+        setattr(self, attr, frame)
+        logger.debug(f"已加载标签页 {module_name}，耗时 {(time.perf_counter() - start)*1000:.0f} ms")
+
+    def start_warmup(self):
+        """首次绘制后在后台预热，不阻塞界面"""
+        logger.info(f"窗口已显示，启动耗时 {(time.perf_counter() - _START_TIME)*1000:.0f} ms")
+        threading.Thread(target=self._warmup, daemon=True).start()
+
+    def _warmup(self):
+        """加载搜索索引，并预先导入其他标签页及数据更新用到的模块"""
+        start = time.perf_counter()
+        try:
+            self.api.load_index()
+            cache_common_searches(self.searcher, self.query_log)
+            for _, _, module_name, _ in LAZY_TABS:
+                importlib.import_module(module_name)
+            importlib.import_module('update_tariffs')
+            logger.info(f"后台预热完成，耗时 {(time.perf_counter() - start)*1000:.0f} ms")
+        except Exception as e:
+            logger.error(f"后台预热失败: {str(e)}")
 
     def setup_single_search(self):
         """设置单个查询界面"""
@@ -79,7 +131,9 @@ class TariffGUI:
             width=40
         )
         search_entry.pack(side=tk.LEFT, padx=5, pady=5)
-        search_entry.bind('<Return>', lambda e: self.search())
+        search_entry.bind('<Return>', lambda e: self.commit_search())
+        # 输入即搜索
+        self.search_var.trace_add('write', self.search)
 
         # 模糊匹配选项
         self.fuzzy_var = tk.BooleanVar(value=True)
@@ -95,7 +149,7 @@ class TariffGUI:
         self.search_btn = ttk.Button(
             search_frame,
             text="搜索",
-            command=self.search
+            command=self.commit_search
         )
         self.search_btn.pack(side=tk.LEFT, padx=5, pady=5)
 
@@ -103,16 +157,8 @@ class TariffGUI:
         result_frame = ttk.LabelFrame(self.single_frame, text="搜索结果")
         result_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
-        # 创建表格
+        # 创建表格，只渲染可见的行
         columns = ('编码', '税率', '网址', '北爱尔兰税率', '北爱尔兰网址', '相似度')
-        self.result_tree = ttk.Treeview(
-            result_frame,
-            columns=columns,
-            show='headings',
-            height=10
-        )
-
-        # 设置列
         column_widths = {
             '编码': 120,
             '税率': 100,
@@ -121,22 +167,14 @@ class TariffGUI:
             '北爱尔兰网址': 150,
             '相似度': 80
         }
-
-        for col in columns:
-            self.result_tree.heading(col, text=col)
-            self.result_tree.column(col, width=column_widths[col])
-
-        # 添加滚动条
-        scrollbar = ttk.Scrollbar(
+        self.result_grid = VirtualTreeview(
             result_frame,
-            orient=tk.VERTICAL,
-            command=self.result_tree.yview
+            columns=columns,
+            column_widths=column_widths,
+            formatter=self._format_result
         )
-        self.result_tree.configure(yscrollcommand=scrollbar.set)
-
-        # 布局
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.result_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.result_grid.pack(fill=tk.BOTH, expand=True)
+        self.result_tree = self.result_grid.tree
 
         # 绑定双击事件
         self.result_tree.bind('<Double-1>', self.on_result_double_click)
@@ -168,108 +206,70 @@ class TariffGUI:
     def setup_api(self):
         """设置API"""
         self.api = TariffAPI()
+        self.searcher = IncrementalSearch(
+            self.api,
+            on_result=self._on_search_result,
+            on_error=self._on_search_error,
+            limit=RESULT_LIMIT
+        )
+        # 记录确认过的搜索，启动时预先计算最常用的查询
+        self.query_log = QueryLog(self.api.db)
 
     def setup_queue(self):
-        """设置消息队列和更新任务"""
-        self.queue = queue.Queue()
-        self.root.after(100, self.process_queue)
-
-    def process_queue(self):
-        """处理消息队列"""
-        try:
-            while True:
-                func, args, kwargs = self.queue.get_nowait()
-                func(*args, **kwargs)
-                self.queue.task_done()
-        except queue.Empty:
-            pass
-        finally:
-            self.root.after(100, self.process_queue)
+        """设置界面更新分发器，后台线程通过它在主线程中更新界面"""
+        self.dispatcher = UIDispatcher.for_widget(self.root)
 
-    def search(self):
-        """执行搜索"""
+    def search(self, *args):
+        """提交搜索，输入框内容变化时也会调用，旧的搜索自动取消"""
         query = self.search_var.get().strip()
         if not query:
+            self.searcher.cancel()
+            self._update_results([])
+            self.status_var.set("就绪")
             return
 
-        # 禁用搜索按钮
-        self.search_btn.configure(state='disabled')
         self.status_var.set("搜索中...")
+        self.searcher.submit(query, self.fuzzy_var.get())
 
-        # 清空现有结果
-        for item in self.result_tree.get_children():
-            self.result_tree.delete(item)
+    def commit_search(self):
+        """按回车或点击搜索按钮：搜索并记录搜索词"""
+        self.search()
+        self.query_log.record(self.search_var.get(), self.fuzzy_var.get())
 
-        # 在后台线程中执行搜索
-        thread = threading.Thread(
-            target=self._search,
-            args=(query,),
-            daemon=True
-        )
-        thread.start()
+    def _on_search_result(self, query: str, results: list, generation: int):
+        """搜索线程返回结果，转到主线程显示"""
+        self.dispatcher.latest((self, 'search_results'), self._show_search_results, results, generation)
 
-    def _search(self, query: str):
-        """在后台线程中执行搜索"""
-        try:
-            if self.fuzzy_var.get():
-                results = self.api.fuzzy_search(query)
-                if results:
-                    # 在主线程中更新UI
-                    self.queue.put((self._update_results, (results,), {}))
-                else:
-                    self.queue.put((
-                        self.status_var.set,
-                        ("未找到匹配结果",),
-                        {}
-                    ))
-            else:
-                result = self.api.exact_search(query)
-                if result:
-                    # 在主线程中更新UI
-                    self.queue.put((self._update_results, ([result],), {}))
-                else:
-                    self.queue.put((
-                        self.status_var.set,
-                        ("未找到匹配结果",),
-                        {}
-                    ))
-        except Exception as e:
-            logger.error(f"搜索失败: {str(e)}")
-            self.queue.put((
-                self.status_var.set,
-                (f"搜索失败: {str(e)}",),
-                {}
-            ))
-        finally:
-            # 恢复搜索按钮
-            self.queue.put((
-                self.search_btn.configure,
-                (),
-                {'state': 'normal'}
-            ))
+    def _on_search_error(self, query: str, error: Exception, generation: int):
+        self.dispatcher.latest((self, 'search_results'), self._show_search_error, error, generation)
+
+    def _show_search_results(self, results: list, generation: int):
+        """显示搜索结果，已被新查询取代的结果直接丢弃"""
+        if not self.searcher.is_current(generation):
+            return
+        self._update_results(results)
+        if not results:
+            self.status_var.set("未找到匹配结果")
+
+    def _show_search_error(self, error: Exception, generation: int):
+        if self.searcher.is_current(generation):
+            self.status_var.set(f"搜索失败: {str(error)}")
+
+    def _format_result(self, result: dict) -> tuple:
+        """结果表格中一行的显示值"""
+        similarity = result.get('similarity', 1.0)
+        return (
+            result['code'],
+            result.get('rate', ''),
+            result.get('url', ''),
+            result.get('north_ireland_rate', ''),
+            result.get('north_ireland_url', ''),
+            f"{similarity*100:.1f}%"
+        )
 
     def _update_results(self, results: list):
         """更新搜索结果显示"""
-        # 清空现有结果
-        for item in self.result_tree.get_children():
-            self.result_tree.delete(item)
-
-        # 添加新结果
-        for result in results:
-            similarity = result.get('similarity', 1.0)
-            self.result_tree.insert(
-                '',
-                'end',
-                values=(
-                    result['code'],
-                    result.get('rate', ''),
-                    result.get('url', ''),
-                    result.get('north_ireland_rate', ''),
-                    result.get('north_ireland_url', ''),
-                    f"{similarity*100:.1f}%"
-                )
-            )
-
+        self.result_grid.set_rows(results)
         self.status_var.set(f"找到 {len(results)} 条结果")
 
     def on_result_double_click(self, event):
@@ -291,6 +291,7 @@ class TariffGUI:
 
         # 如果点击的是URL列且URL不为空，则打开浏览器
         if url and url.strip():
+            self.query_log.record(self.search_var.get(), self.fuzzy_var.get())
             import webbrowser
             webbrowser.open(url)
 
@@ -298,6 +299,7 @@ class TariffGUI:
         """处理模糊匹配状态改变"""
         is_fuzzy = self.fuzzy_var.get()
         logger.debug(f"模糊匹配状态改变: {is_fuzzy}")
+        self.search()
 
     def show_context_menu(self, event):
         """显示右键菜单"""
@@ -370,16 +372,13 @@ class TariffGUI:
     def _update_data(self):
         """在后台线程中执行数据更新"""
         try:
+            import asyncio
             from update_tariffs import TariffScraper
             scraper = TariffScraper()
 
             # 设置进度回调
             def update_progress(progress):
-                self.queue.put((
-                    self.update_progress_var.set,
-                    (progress * 100,),
-                    {}
-                ))
+                self.dispatcher.latest((self, 'progress'), self.update_progress_var.set, progress * 100)
             scraper.set_progress_callback(update_progress)
 
             # 创建异步事件循环
@@ -391,24 +390,31 @@ class TariffGUI:
             loop.close()
 
             if success:
+                # 大批量写入后按需更新统计信息、清理冗余索引和压缩
+                self.dispatcher.call(self.status_var.set, "正在维护数据库...")
+                maintain_after_update(scraper.db)
                 # 更新完成
-                self.queue.put((self._update_complete, (), {}))
+                self.dispatcher.call(self._update_complete)
             else:
                 raise Exception("更新失败")
 
         except Exception as e:
             logger.error(f"更新数据失败: {str(e)}")
-            self.queue.put((
-                self.status_var.set,
-                (f"更新失败: {str(e)}",),
-                {}
-            ))
+            self.dispatcher.call(self.status_var.set, f"更新失败: {str(e)}")
         finally:
             # 恢复按钮状态和隐藏进度条
-            self.queue.put((self._reset_update_ui, (), {}))
+            self.dispatcher.call(self._reset_update_ui)
 
     def _update_complete(self):
         """更新完成的处理"""
+        # 数据已变化，清除内存索引
+        self.api.invalidate_index()
+        self.searcher.invalidate()
+        if self.batch_frame is not None:
+            self.batch_frame.processor.api.invalidate_index()
+        threading.Thread(
+            target=cache_common_searches, args=(self.searcher, self.query_log), daemon=True
+        ).start()
         self.status_var.set("数据更新完成")
         messagebox.showinfo("成功", "数据更新完成")
 
@@ -418,9 +424,49 @@ class TariffGUI:
         self.update_progress.pack_forget()
         self.update_progress_var.set(0)
 
+    def toggle_sql_profile(self, event=None):
+        """第一次调用开启SQL耗时分析，之后显示各语句的耗时报告"""
+        profiler = sql_profile.PROFILER
+        if not profiler.enabled:
+            profiler.enable()
+            self.status_var.set("SQL耗时分析已开启，再按 Ctrl+Shift+P 查看报告")
+            return
+
+        window = tk.Toplevel(self.root)
+        window.title("SQL耗时分析")
+        text = tk.Text(window, wrap=tk.NONE, width=120, height=30, font=('Courier', 10))
+
+        def show_report():
+            text.configure(state=tk.NORMAL)
+            text.delete('1.0', tk.END)
+            text.insert('1.0', sql_profile.format_report(profiler.report(limit=50)))
+            text.configure(state=tk.DISABLED)
+
+        def reset():
+            profiler.reset()
+            show_report()
+
+        def stop():
+            profiler.disable()
+            profiler.reset()
+            self.status_var.set("SQL耗时分析已关闭")
+            window.destroy()
+
+        button_frame = ttk.Frame(window)
+        button_frame.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Button(button_frame, text="刷新", command=show_report).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="清空统计", command=reset).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="停止分析", command=stop).pack(side=tk.LEFT, padx=5)
+        text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        show_report()
+
     def run(self):
         """运行GUI"""
         self.root.mainloop()
+        self.dispatcher.close()
+        self.searcher.close()
+        self.query_log.close()
+        TariffDB.close_all()
 
 if __name__ == "__main__":
     gui = TariffGUI()
@@ -0,0 +1,306 @@
+"""关税查询 HTTP 服务
+
+在 TariffAPI 之上提供精确、模糊、批量和层级查询接口，供其他内部系统调用。
+精确查询使用固定大小的只读 SQLite 连接池，同一时间窗口内的多个精确查询
+合并为一条 IN 查询；模糊查询和层级查询使用共享的内存索引，在单独的计算线程中执行，
+不占用连接池线程，精确查询不必排在相似度计算之后。
+
+接口:
+    GET  /health                        服务状态和记录数
+    GET  /tariffs/{code}                精确查询
+    GET  /search?q=8517&limit=10        模糊查询
+    POST /batch                         批量查询，请求体 {"codes": [...], "fuzzy": true}
+    GET  /hierarchy[/{prefix}]          编码层级的下一级节点
+
+用法:
+    python tariff_server.py --db tariffs.db --port 8765
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from tariff_api import TariffAPI
+
+logger = logging.getLogger(__name__)
+
+TARIFF_COLUMNS = ('code', 'description', 'rate', 'url', 'north_ireland_rate', 'north_ireland_url')
+
+# SQLite 单条语句的参数个数有上限，IN 查询按块执行
+IN_CHUNK_SIZE = 500
+MAX_BATCH_CODES = 10000
+
+json_dumps = partial(json.dumps, ensure_ascii=False)
+
+
+def fetch_tariffs(conn: sqlite3.Connection, codes: List[str]) -> Dict[str, Dict]:
+    """用 IN 查询一次获取多条记录
+
+    Returns:
+        以编码为键的记录字典，未找到的编码不在其中
+    """
+    columns = ', '.join(TARIFF_COLUMNS)
+    found = {}
+    for i in range(0, len(codes), IN_CHUNK_SIZE):
+        chunk = codes[i:i + IN_CHUNK_SIZE]
+        placeholders = ', '.join('?' * len(chunk))
+        for row in conn.execute(
+            f"SELECT {columns} FROM tariffs WHERE code IN ({placeholders})", chunk
+        ):
+            found[row[0]] = dict(zip(TARIFF_COLUMNS, row))
+    return found
+
+
+class ReadOnlyConnectionPool:
+    """只读连接池
+
+    固定数量的工作线程，每个线程在启动时打开一个只读连接并一直持有，
+    查询函数在这些线程中执行，不会阻塞事件循环。
+    """
+
+    def __init__(self, db_path: str, size: int = 4):
+        self.uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+        self.size = size
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=size,
+            thread_name_prefix="tariff-reader",
+            initializer=self._connect,
+        )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        self._local.conn = conn
+        with self._lock:
+            self._connections.append(conn)
+
+    def _call(self, func, args):
+        return func(self._local.conn, *args)
+
+    def run(self, func, *args):
+        """在连接池线程中执行 func(conn, *args)"""
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.executor, self._call, func, args)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+
+
+class ExactLookupBatcher:
+    """合并同一时间窗口内的精确查询
+
+    并发请求先进入等待队列，窗口结束或队列满时用一条 IN 查询取回所有记录，
+    减少线程切换和 SQL 执行次数。
+    """
+
+    def __init__(self, pool: ReadOnlyConnectionPool, window: float = 0.002, max_size: int = 200):
+        self.pool = pool
+        self.window = window
+        self.max_size = max_size
+        self._pending = []
+        self._handle = None
+        self._tasks = set()
+
+    async def lookup(self, code: str) -> Optional[Dict]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((code, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._handle is None:
+            self._handle = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.ensure_future(self._run(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, pending):
+        codes = list({code for code, _ in pending})
+        try:
+            found = await self.pool.run(fetch_tariffs, codes)
+        except Exception as e:
+            logger.error(f"批量精确查询失败: {str(e)}")
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for code, future in pending:
+            if not future.done():
+                tariff = found.get(code)
+                future.set_result(dict(tariff) if tariff else None)
+
+
+class TariffService:
+    """HTTP 接口实现"""
+
+    def __init__(self, db_path: str = "tariffs.db", pool_size: int = 4, batch_window: float = 0.002,
+                 cpu_workers: int = 2):
+        self.api = TariffAPI(db_path)
+        self.pool = ReadOnlyConnectionPool(db_path, pool_size)
+        self.batcher = ExactLookupBatcher(self.pool, batch_window)
+        self.cpu_executor = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="tariff-cpu")
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/health', self.health)
+        app.router.add_get('/tariffs/{code}', self.get_tariff)
+        app.router.add_get('/search', self.search)
+        app.router.add_post('/batch', self.batch)
+        app.router.add_get('/hierarchy', self.hierarchy)
+        app.router.add_get('/hierarchy/{prefix}', self.hierarchy)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _on_startup(self, app):
+        # 启动时加载内存索引，避免第一个模糊查询等待
+        await self._run_cpu(self.api.load_index)
+
+    async def _on_cleanup(self, app):
+        self.pool.close()
+        self.cpu_executor.shutdown(wait=True)
+
+    def _run_cpu(self, func, *args):
+        """在计算线程中执行不需要数据库连接的计算"""
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.cpu_executor, partial(func, *args))
+
+    def _json(self, data, status: int = 200) -> web.Response:
+        return web.json_response(data, status=status, dumps=json_dumps)
+
+    def _error(self, message: str, status: int = 400) -> web.Response:
+        return self._json({'error': message}, status)
+
+    async def _search(self, code: str, limit: int, threshold: float) -> List[Dict]:
+        """先精确匹配，未命中时再按相似度排序"""
+        norm_code = self.api._normalize_code(code)
+        if not norm_code:
+            return []
+        tariff = await self.batcher.lookup(norm_code)
+        if tariff:
+            tariff['similarity'] = 1.0
+            return [tariff]
+        return await self._run_cpu(self.api.rank_by_similarity, norm_code, limit, threshold)
+
+    async def health(self, request: web.Request) -> web.Response:
+        count = await self.pool.run(
+            lambda conn: conn.execute("SELECT COUNT(*) FROM tariffs").fetchone()[0]
+        )
+        return self._json({'status': 'ok', 'records': count})
+
+    async def get_tariff(self, request: web.Request) -> web.Response:
+        code = self.api._normalize_code(request.match_info['code'])
+        tariff = await self.batcher.lookup(code) if code else None
+        if not tariff:
+            return self._error(f"未找到编码: {request.match_info['code']}", 404)
+        return self._json(tariff)
+
+    async def search(self, request: web.Request) -> web.Response:
+        query = request.query.get('q', '')
+        try:
+            limit = int(request.query.get('limit', 10))
+            threshold = float(request.query.get('threshold', 0.2))
+        except ValueError:
+            return self._error("limit 或 threshold 参数无效")
+
+        results = await self._search(query, limit, threshold)
+        return self._json({'query': query, 'results': results})
+
+    async def batch(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+            if not isinstance(body['codes'], list):
+                raise TypeError("codes 必须为列表")
+            codes = [str(code) for code in body['codes']]
+            fuzzy = bool(body.get('fuzzy', True))
+            limit = int(body.get('limit', 1))
+            threshold = float(body.get('threshold', 0.2))
+        except (ValueError, KeyError, TypeError):
+            return self._error("请求体必须为 {\"codes\": [...]}")
+
+        if len(codes) > MAX_BATCH_CODES:
+            return self._error(f"单次最多查询 {MAX_BATCH_CODES} 个编码")
+
+        norm_codes = [self.api._normalize_code(code) for code in codes]
+        found = await self.pool.run(fetch_tariffs, list({code for code in norm_codes if code}))
+
+        missing = [code for code in norm_codes if code and code not in found] if fuzzy else []
+        fuzzy_results = {}
+        if missing:
+            fuzzy_results = await self._run_cpu(self._rank_many, missing, limit, threshold)
+
+        results = []
+        for code, norm_code in zip(codes, norm_codes):
+            if norm_code in found:
+                matches = [dict(found[norm_code], similarity=1.0)]
+            else:
+                matches = fuzzy_results.get(norm_code, [])
+            results.append({'query': code, 'matches': matches})
+        return self._json({'results': results})
+
+    def _rank_many(self, codes: List[str], limit: int, threshold: float) -> Dict[str, List[Dict]]:
+        """在同一个线程中完成所有未命中编码的模糊匹配"""
+        return {
+            code: self.api.rank_by_similarity(code, limit, threshold)
+            for code in dict.fromkeys(codes)
+        }
+
+    async def hierarchy(self, request: web.Request) -> web.Response:
+        prefix = request.match_info.get('prefix', '')
+        children = await self._run_cpu(self.api.get_children, prefix)
+        return self._json({'prefix': prefix, 'children': children})
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="关税查询HTTP服务")
+    parser.add_argument('--db', default="tariffs.db", help="数据库文件")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--pool-size', type=int, default=4, help="只读连接数")
+    parser.add_argument('--cpu-workers', type=int, default=2, help="模糊查询计算线程数")
+    parser.add_argument('--batch-window', type=float, default=0.002,
+                        help="合并精确查询的时间窗口(秒)")
+    parser.add_argument('--keepalive', type=float, default=75.0, help="HTTP keep-alive 超时(秒)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    if not Path(args.db).exists():
+        logger.error(f"数据库不存在: {args.db}")
+        return 2
+
+    service = TariffService(args.db, args.pool_size, args.batch_window, args.cpu_workers)
+    web.run_app(
+        service.create_app(),
+        host=args.host,
+        port=args.port,
+        keepalive_timeout=args.keepalive,
+        access_log=None,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""只读二进制快照
+
+把 tariffs 表导出为不可变的二进制文件，进程通过 mmap 打开后直接二分查找，
+不需要解析或构建 Python 数据结构，多个进程共享同一份页缓存。
+
+文件布局（小端）:
+    头部     HEADER 结构: 魔数、版本、记录数、编码宽度、字段数、各区段偏移
+    编码区   count 个定长编码，按编码升序排列，不足宽度的用 \\0 填充
+    偏移区   count × 字段数 个 (偏移, 长度) uint32 对，指向字符串区
+    字符串区 UTF-8 字符串，相同的值（如税率）只存储一次
+
+用法:
+    python tariff_snapshot.py export --db tariffs.db --output tariffs.snap
+    python tariff_snapshot.py lookup --snapshot tariffs.snap 8517120000
+"""
+import argparse
+import bisect
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'TARSNAP\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sIIIIQQQ')
+SLOT = struct.Struct('<II')
+
+# 与 TariffDB.get_tariff 返回的字段一致，code 单独存放在编码区
+FIELDS = ('description', 'rate', 'url', 'north_ireland_rate', 'north_ireland_url')
+
+# 长度为该值表示 NULL
+NULL_LENGTH = 0xFFFFFFFF
+
+
+class SnapshotError(ValueError):
+    """快照文件格式错误"""
+
+
+def export_snapshot(db_path: str, snapshot_path: str) -> int:
+    """从数据库导出快照
+
+    先写入临时文件再替换，正在使用旧快照的进程不受影响。
+
+    Returns:
+        导出的记录数
+    """
+    conn = sqlite3.connect(db_path)
+    tmp_path = snapshot_path + ".tmp"
+    try:
+        count, width = conn.execute("SELECT COUNT(*), MAX(LENGTH(code)) FROM tariffs").fetchone()
+        width = width or 0
+
+        codes_offset = HEADER.size
+        blob = bytearray()
+        positions = {}
+        slots = bytearray()
+        with open(tmp_path, 'wb') as f:
+            # 编码直接流式写入，偏移区和字符串区写完编码后再追加
+            f.seek(codes_offset)
+            written = 0
+            cursor = conn.execute(f"SELECT code, {', '.join(FIELDS)} FROM tariffs ORDER BY code")
+            for row in cursor:
+                f.write(row[0].encode('ascii').ljust(width, b'\x00'))
+                written += 1
+                for value in row[1:]:
+                    if value is None:
+                        slots += SLOT.pack(0, NULL_LENGTH)
+                        continue
+                    data = value.encode('utf-8')
+                    offset = positions.get(data)
+                    if offset is None:
+                        offset = len(blob)
+                        positions[data] = offset
+                        blob += data
+                    slots += SLOT.pack(offset, len(data))
+            if written != count:
+                raise SnapshotError("导出过程中数据发生变化")
+
+            slots_offset = codes_offset + width * count
+            blob_offset = slots_offset + len(slots)
+            f.write(slots)
+            f.write(blob)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, count, width, len(FIELDS),
+                                codes_offset, slots_offset, blob_offset))
+        os.replace(tmp_path, snapshot_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        conn.close()
+
+    logger.info(f"已导出快照 {snapshot_path}，共 {count} 条记录，{blob_offset + len(blob)} 字节")
+    return count
+
+
+class _CodeArray:
+    """把编码区包装为序列，供 bisect 使用"""
+
+    def __init__(self, buffer, offset: int, width: int, count: int):
+        self.buffer = buffer
+        self.offset = offset
+        self.width = width
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index: int) -> bytes:
+        start = self.offset + index * self.width
+        return self.buffer[start:start + self.width]
+
+
+class TariffSnapshot:
+    """通过 mmap 读取快照，所有查询都直接在映射的内存上进行"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SnapshotError(f"快照文件为空: {path}")
+
+        if len(self._mmap) < HEADER.size:
+            self.close()
+            raise SnapshotError(f"快照文件不完整: {path}")
+
+        (magic, version, self.count, self.width, field_count,
+         codes_offset, self._slots_offset, self._blob_offset) = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION or field_count != len(FIELDS):
+            self.close()
+            raise SnapshotError(f"不支持的快照格式: {path}")
+
+        self._codes = _CodeArray(self._mmap, codes_offset, self.width, self.count)
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def _key(self, code: str) -> Optional[bytes]:
+        data = code.encode('ascii', 'ignore')
+        if len(data) > self.width:
+            return None
+        return data.ljust(self.width, b'\x00')
+
+    def _field(self, index: int, field: int) -> Optional[str]:
+        offset, length = SLOT.unpack_from(
+            self._mmap, self._slots_offset + (index * len(FIELDS) + field) * SLOT.size
+        )
+        if length == NULL_LENGTH:
+            return None
+        start = self._blob_offset + offset
+        return self._mmap[start:start + length].decode('utf-8')
+
+    def code_at(self, index: int) -> str:
+        return self._codes[index].rstrip(b'\x00').decode('ascii')
+
+    def record_at(self, index: int) -> Dict:
+        """按位置读取一条记录，格式与 TariffDB.get_tariff 一致"""
+        record = {'code': self.code_at(index)}
+        for field, name in enumerate(FIELDS):
+            record[name] = self._field(index, field)
+        return record
+
+    def find(self, code: str) -> int:
+        """二分查找编码位置，不存在时返回-1"""
+        key = self._key(code)
+        if key is None:
+            return -1
+        index = bisect.bisect_left(self._codes, key)
+        if index < self.count and self._codes[index] == key:
+            return index
+        return -1
+
+    def get_tariff(self, code: str) -> Optional[Dict]:
+        """精确查询"""
+        index = self.find(code)
+        return self.record_at(index) if index >= 0 else None
+
+    def get_rate(self, code: str) -> Optional[str]:
+        """只读取税率，不构建整条记录"""
+        index = self.find(code)
+        return self._field(index, FIELDS.index('rate')) if index >= 0 else None
+
+    def prefix_range(self, prefix: str) -> range:
+        """以 prefix 开头的编码所在的位置区间"""
+        data = prefix.encode('ascii', 'ignore')
+        start = bisect.bisect_left(self._codes, data)
+        # 编码只含数字，':' 排在所有数字之后
+        end = bisect.bisect_left(self._codes, data + b':', start)
+        return range(start, end)
+
+    def iter_prefix(self, prefix: str) -> Iterator[Dict]:
+        """按编码顺序遍历以 prefix 开头的记录"""
+        for index in self.prefix_range(prefix):
+            yield self.record_at(index)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="关税数据只读快照")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help="从数据库导出快照")
+    export_parser.add_argument('--db', default="tariffs.db", help="数据库文件")
+    export_parser.add_argument('--output', default="tariffs.snap", help="快照文件")
+
+    lookup_parser = subparsers.add_parser('lookup', help="在快照中查询编码")
+    lookup_parser.add_argument('--snapshot', default="tariffs.snap", help="快照文件")
+    lookup_parser.add_argument('codes', nargs='+')
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    if args.command == 'export':
+        if not os.path.exists(args.db):
+            logger.error(f"数据库不存在: {args.db}")
+            return 2
+        export_snapshot(args.db, args.output)
+        return 0
+
+    with TariffSnapshot(args.snapshot) as snapshot:
+        for code in args.codes:
+            tariff = snapshot.get_tariff(code)
+            print(f"{code}: {tariff['rate'] if tariff else '未找到'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from tariff_db import TariffDB
+from batch_cli import main
+
+
+class TestBatchCLI(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "tariffs.db")
+        TariffDB(self.db_path).add_tariffs_batch([
+            {'code': '8517120000', 'description': '', 'rate': '2.00%'},
+            {'code': '8517130000', 'description': '', 'rate': '0.00%'},
+        ])
+        self.input_path = os.path.join(self.tmp.name, "input.csv")
+        with open(self.input_path, 'w', encoding='utf-8') as f:
+            f.write("code\n8517120000\n8517\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _run(self, *args):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            code = main([self.input_path, '--db', self.db_path, '--interval', '0.05',
+                         '-o', os.path.join(self.tmp.name, "output"), *args])
+        return code, output.getvalue().splitlines()
+
+    def test_json_progress_and_top_k(self):
+        code, lines = self._run('--json', '--format', 'csv', '--top-k', '2')
+        self.assertEqual(code, 0)
+
+        events = [json.loads(line) for line in lines]
+        summary = events[-1]
+        self.assertEqual(summary['event'], 'summary')
+        self.assertEqual(summary['completed'], 1)
+
+        with open(summary['outputs'][0], encoding='utf-8-sig') as f:
+            rows = f.read().splitlines()
+        self.assertEqual(rows[0], 'code,rank,match_code,rate,ni_rate,相似度')
+        # 精确匹配只输出一行，模糊匹配输出两个候选
+        self.assertEqual(len(rows), 4)
+
+    def test_missing_input(self):
+        code = main([os.path.join(self.tmp.name, "missing.csv"), '--db', self.db_path])
+        self.assertEqual(code, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+import csv
+from openpyxl import Workbook, load_workbook
+from batch_io import (
+    iter_codes,
+    iter_code_chunks,
+    estimate_rows,
+    open_result_writer,
+    MissingCodeColumnError
+)
+
+
+class TestBatchInput(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write_excel(self, name, rows):
+        path = os.path.join(self.tmp.name, name)
+        workbook = Workbook()
+        sheet = workbook.active
+        for row in rows:
+            sheet.append(row)
+        workbook.save(path)
+        return path
+
+    def _write_csv(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_excel_codes(self):
+        path = self._write_excel("input.xlsx", [
+            ['name', 'code'],
+            ['a', '0101210000'],
+            ['b', 8517120000],
+            ['c', None],
+            ['d', ' 8471 '],
+        ])
+        self.assertEqual(list(iter_codes(path)), ['0101210000', '8517120000', '8471'])
+        self.assertEqual(estimate_rows(path), 4)
+
+    def test_csv_codes(self):
+        path = self._write_csv("input.csv", "code\n0101210000\n\n8517\n")
+        self.assertEqual(list(iter_codes(path)), ['0101210000', '8517'])
+
+    def test_chunks(self):
+        rows = [['code']] + [[f"{i:010d}"] for i in range(25)]
+        path = self._write_excel("input.xlsx", rows)
+        chunks = list(iter_code_chunks(path, chunk_size=10))
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+
+    def test_missing_code_column(self):
+        path = self._write_csv("input.csv", "name\nfoo\n")
+        with self.assertRaises(MissingCodeColumnError):
+            list(iter_codes(path))
+
+        path = self._write_excel("input.xlsx", [['name'], ['foo']])
+        with self.assertRaises(MissingCodeColumnError):
+            list(iter_codes(path))
+
+
+class TestResultWriter(unittest.TestCase):
+    rows = [
+        {'code': '0101210000', 'rate': '0.00%', 'ni_rate': None, '相似度': '100.0%'},
+        {'code': '8517', 'rate': '2.00%', 'ni_rate': '2.00%', '相似度': '45.1%'},
+    ]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_excel_writer(self):
+        path = os.path.join(self.tmp.name, "out.xlsx")
+        with open_result_writer(path, 'xlsx') as writer:
+            writer.write_rows(self.rows)
+        self.assertEqual(writer.rows_written, 2)
+
+        sheet = load_workbook(path).active
+        self.assertEqual([c.value for c in sheet[1]], ['code', 'rate', 'ni_rate', '相似度'])
+        self.assertEqual(sheet['A2'].value, '0101210000')
+        self.assertEqual(sheet['A2'].number_format, '@')
+        self.assertEqual(sheet['C3'].value, '2.00%')
+
+    def test_csv_writer(self):
+        path = os.path.join(self.tmp.name, "out.csv")
+        with open_result_writer(path, 'csv') as writer:
+            writer.write_rows(self.rows)
+
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ['code', 'rate', 'ni_rate', '相似度'])
+        self.assertEqual(rows[1], ['0101210000', '0.00%', '', '100.0%'])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            open_result_writer(os.path.join(self.tmp.name, "out.txt"), 'txt')
+
+
+if __name__ == '__main__':
+    unittest.main()
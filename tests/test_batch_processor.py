@@ -0,0 +1,121 @@
+import os
+import tempfile
+import time
+import unittest
+from tariff_db import TariffDB
+from tariff_api import TariffAPI
+import batch_processor
+from batch_processor import BatchProcessor, BatchJob
+from tariff_snapshot import export_snapshot
+
+
+class TestBatchProcessor(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmp.name, "tariffs.db")
+        TariffDB(db_path).add_tariffs_batch([
+            {'code': '0101210000', 'description': '', 'rate': '0.00%'},
+            {'code': '8517120000', 'description': '', 'rate': '2.00%',
+             'north_ireland_rate': '2.00%'},
+            {'code': '8471300000', 'description': '', 'rate': '1.50%'},
+        ])
+        self.processor = BatchProcessor(
+            output_dir=os.path.join(self.tmp.name, "output"),
+            api=TariffAPI(db_path),
+            max_workers=2
+        )
+
+    def tearDown(self):
+        self.processor.shutdown()
+        self.tmp.cleanup()
+
+    def _write_input(self, name, codes):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("code\n" + "\n".join(codes) + "\n")
+        return path
+
+    def _wait(self, job_ids, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            jobs = [self.processor.get_job(job_id) for job_id in job_ids]
+            if all(job['status'] in ('completed', 'error', 'cancelled') for job in jobs):
+                return jobs
+            time.sleep(0.02)
+        self.fail("任务未在规定时间内完成")
+
+    def test_process_file(self):
+        path = self._write_input("input.csv", ['8517120000', '8471'])
+        output_file = self.processor.process_file(path, 'csv')
+        self.assertTrue(os.path.exists(output_file))
+        with open(output_file, encoding='utf-8-sig') as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[1], '8517120000,2.00%,2.00%,100.0%')
+        self.assertEqual(len(lines), 3)
+
+    def test_job_queue(self):
+        job_ids = [
+            self.processor.submit_file(self._write_input(f"input{i}.csv", ['8517', '0101']), 'csv')
+            for i in range(3)
+        ]
+        jobs = self._wait(job_ids)
+        for job in jobs:
+            self.assertEqual(job['status'], 'completed')
+            self.assertEqual(job['processed'], 2)
+            self.assertTrue(os.path.exists(job['output_file']))
+        # 每个任务的输出文件互不覆盖
+        self.assertEqual(len({job['output_file'] for job in jobs}), 3)
+
+        history = self.processor.get_history_files()
+        self.assertEqual(len(history), 3)
+        self.assertTrue(all(item['status'] == 'completed' for item in history))
+
+    def test_worker_with_snapshot_loads_index_lazily(self):
+        db_path = os.path.join(self.tmp.name, "tariffs.db")
+        snapshot_path = os.path.join(self.tmp.name, "tariffs.snap")
+        export_snapshot(db_path, snapshot_path)
+        batch_processor._init_match_worker(db_path, 0.2, 1, snapshot_path)
+        api = batch_processor._worker_api
+
+        # 只有精确匹配时不加载内存索引
+        results = batch_processor._match_chunk_in_worker(['8517120000'])
+        self.assertEqual(results[0]['rate'], '2.00%')
+        self.assertIsNone(api._index)
+
+        results = batch_processor._match_chunk_in_worker(['85171'])
+        self.assertEqual(results[0]['rate'], '2.00%')
+        self.assertIsNotNone(api._index)
+        api.snapshot.close()
+
+    def test_same_file_name(self):
+        # 不同目录中的同名文件同时处理，输出文件不能重名
+        paths = []
+        for folder in ('a', 'b'):
+            os.makedirs(os.path.join(self.tmp.name, folder))
+            paths.append(self._write_input(os.path.join(folder, "input.csv"), ['8517']))
+        jobs = self._wait([self.processor.submit_file(path, 'csv') for path in paths])
+        self.assertEqual(len({job['output_file'] for job in jobs}), 2)
+
+        history = self.processor.get_history_files()
+        self.assertEqual(len(history), 2)
+        self.assertTrue(all(item['status'] == 'completed' for item in history))
+
+    def test_cancel_job(self):
+        job = BatchJob(self._write_input("input.csv", ['8517']))
+        job.cancel_event.set()
+        self.assertIsNone(self.processor._run_job(job))
+        self.assertEqual(job.status, 'cancelled')
+
+    def test_missing_code_column(self):
+        path = os.path.join(self.tmp.name, "bad.csv")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("name\nfoo\n")
+        job_id = self.processor.submit_file(path, 'csv')
+        job = self._wait([job_id])[0]
+        self.assertEqual(job['status'], 'error')
+        self.assertIsNone(job['output_file'])
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, "output")), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
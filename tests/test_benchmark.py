@@ -0,0 +1,48 @@
+import unittest
+import random
+from benchmark import summarize_latencies, compare_results, make_typo
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_summarize_latencies(self):
+        latencies = [0.001 * i for i in range(1, 101)]
+        result = summarize_latencies(latencies)
+        self.assertEqual(result['count'], 100)
+        self.assertAlmostEqual(result['p50_ms'], 50.0, delta=1.5)
+        self.assertAlmostEqual(result['p99_ms'], 99.0, delta=1.0)
+        self.assertAlmostEqual(result['max_ms'], 100.0)
+        self.assertGreater(result['throughput'], 0)
+
+        self.assertEqual(summarize_latencies([]), {})
+
+    def test_make_typo(self):
+        rng = random.Random(1)
+        code = "8517120000"
+        typo = make_typo(code, rng)
+        self.assertEqual(len(typo), len(code))
+        self.assertEqual(sum(a != b for a, b in zip(code, typo)), 1)
+
+    def test_compare_results(self):
+        baseline = {'results': {
+            'fuzzy_search_6': {'p99_ms': 10.0, 'throughput': 100.0, 'peak_rss_mb': 50.0},
+        }}
+
+        # 容差范围内不算回退
+        current = {'results': {
+            'fuzzy_search_6': {'p99_ms': 10.5, 'throughput': 95.0, 'peak_rss_mb': 50.0},
+        }}
+        self.assertEqual(compare_results(current, baseline, tolerance=0.1), [])
+
+        # 延迟变高、吞吐下降都应标记为回退
+        current = {'results': {
+            'fuzzy_search_6': {'p99_ms': 20.0, 'throughput': 50.0, 'peak_rss_mb': 50.0},
+            'new_scenario': {'p99_ms': 1.0},
+        }}
+        regressions = compare_results(current, baseline, tolerance=0.1)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(any('p99_ms' in r for r in regressions))
+        self.assertTrue(any('throughput' in r for r in regressions))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from bulk_load import BulkLoader
+from tariff_db import TariffDB
+
+
+def make_tariffs(start, count):
+    return [{'code': f"{i:010d}", 'description': '', 'rate': '2.00%'} for i in range(start, start + count)]
+
+
+class TestBulkLoader(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "tariffs.db")
+        self.db = TariffDB.get(self.db_path)
+        self.db.add_tariffs_batch(make_tariffs(0, 10))
+        self.db.add_scrape_error('0000000001', "超时")
+        with self.db.pool.writer() as conn, conn:
+            conn.execute("CREATE INDEX idx_code ON tariff_rows(code)")
+            conn.execute("CREATE INDEX idx_rate ON tariff_rows(rate_id)")
+
+    def tearDown(self):
+        TariffDB.close_all()
+        self.tmpdir.cleanup()
+
+    def index_names(self):
+        with self.db.pool.reader() as conn:
+            return {row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+            ).fetchall()}
+
+    def test_replaces_database(self):
+        # 加载期间打开的读连接在替换后不再使用
+        self.assertEqual(self.db.get_record_count(), 10)
+
+        with BulkLoader(self.db_path, batch_size=1000) as loader:
+            loader.add_many(make_tariffs(100, 2500))
+        self.assertEqual(loader.written, 2500)
+        self.assertFalse(os.path.exists(loader.tmp_path))
+
+        self.assertEqual(self.db.get_record_count(), 2500)
+        self.assertIsNone(self.db.get_tariff('0000000001'))
+        self.assertEqual([e['code'] for e in self.db.get_scrape_errors()], ['0000000001'])
+        self.assertEqual(self.index_names(), {'idx_rate'})
+        with self.db.pool.reader() as conn:
+            self.assertTrue(conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0])
+
+    def test_keeps_errors_written_during_load(self):
+        # 重建期间抓取程序通过共享实例记录的错误在替换后仍然存在
+        with BulkLoader(self.db_path) as loader:
+            loader.add_many(make_tariffs(100, 3))
+            self.db.add_scrape_error('0000000100', "未找到税率")
+        codes = {e['code'] for e in self.db.get_scrape_errors()}
+        self.assertEqual(codes, {'0000000001', '0000000100'})
+
+    def test_swap_blocks_new_connections(self):
+        # 替换期间取用的连接必须打开新文件
+        self.db.add_tariffs_batch(make_tariffs(10, 5))
+        self.db.changes_at_maintenance = self.db.total_changes()
+        counts = []
+        with TariffDB.replacing(self.db_path):
+            reader = threading.Thread(target=lambda: counts.append(self.db.get_record_count()))
+            reader.start()
+            time.sleep(0.05)
+            self.assertEqual(counts, [])
+            with BulkLoader(os.path.join(self.tmpdir.name, "new.db")) as loader:
+                loader.add_many(make_tariffs(100, 3))
+            os.replace(os.path.join(self.tmpdir.name, "new.db"), self.db_path)
+        reader.join()
+        self.assertEqual(counts, [3])
+        self.assertEqual(self.db.changes_at_maintenance, 0)
+        self.assertEqual(self.db.total_changes(), 0)
+
+    def test_failure_keeps_original(self):
+        with self.assertRaises(KeyError):
+            with BulkLoader(self.db_path, batch_size=1000) as loader:
+                loader.add_many(make_tariffs(100, 1500))
+                loader.add({'code': '9999999999'})
+        self.assertFalse(os.path.exists(loader.tmp_path))
+        self.assertEqual(self.db.get_record_count(), 10)
+
+    def test_new_file(self):
+        path = os.path.join(self.tmpdir.name, "new.db")
+        with BulkLoader(path) as loader:
+            loader.add_many(make_tariffs(0, 5))
+        conn = sqlite3.connect(path)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM tariffs").fetchone()[0], 5)
+        conn.close()
+
+
+COMMODITY_PAGE = """
+<a href="/commodities/{code}">{code}</a>
+<h1 class="commodity-description">商品 {code}</h1>
+<table class="govuk-table">
+<tr><th>Country</th><th>Duty rate</th></tr>
+<tr><td>All countries</td><td>2.00%</td></tr>
+</table>
+"""
+
+
+class TestRebuildDatabase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        from scraper import TariffScraper
+        self.scraper = TariffScraper()
+        self.scraper.db.add_tariffs_batch(make_tariffs(0, 5))
+        self.scraper.existing_codes = self.scraper.db.get_existing_codes()
+
+    def tearDown(self):
+        TariffDB.close_all()
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def fake_crawl(self, codes, fail=False):
+        async def scrape_tariffs(save=None, strict=False):
+            pages = [COMMODITY_PAGE.format(code=code) for code in codes]
+            batch = [self.scraper.parse_commodity_page(page) for page in pages]
+            # 没有编码的解析结果不能写入
+            save(batch + [{'description': '', 'rate': ''}])
+            if fail:
+                raise RuntimeError("抓取中断")
+            return []
+        self.scraper.scrape_tariffs = scrape_tariffs
+
+    def test_rebuild_keeps_existing_codes(self):
+        codes = [f"{i:010d}" for i in range(0, 6)]
+        self.fake_crawl(codes)
+        written = asyncio.run(self.scraper.rebuild_database())
+        self.assertEqual(written, 6)
+        self.assertEqual(self.scraper.db.get_record_count(), 6)
+        self.assertEqual(self.scraper.existing_codes, set(codes))
+
+    def test_failed_crawl_keeps_database(self):
+        self.fake_crawl([f"{i:010d}" for i in range(100, 103)], fail=True)
+        with self.assertRaises(RuntimeError):
+            asyncio.run(self.scraper.rebuild_database())
+        self.assertEqual(self.scraper.db.get_record_count(), 5)
+        self.assertEqual(len(self.scraper.existing_codes), 5)
+
+    def test_unreachable_site_keeps_database(self):
+        async def scrape_with_retry(urls):
+            return [""] * len(urls)
+        self.scraper.scrape_with_retry = scrape_with_retry
+        with self.assertRaises(RuntimeError):
+            asyncio.run(self.scraper.rebuild_database())
+        self.assertEqual(self.scraper.db.get_record_count(), 5)
+        # 增量抓取仍只记录错误
+        self.assertEqual(asyncio.run(self.scraper.scrape_tariffs()), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
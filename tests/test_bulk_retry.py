@@ -0,0 +1,63 @@
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase
+
+from bulk_retry import BulkRetry, STATUS_FAILED, STATUS_SKIPPED, STATUS_SUCCESS, summarize
+
+
+class TestBulkRetry(AioHTTPTestCase):
+    async def get_application(self):
+        self.requests = {}
+
+        async def page(request):
+            code = request.match_info['code']
+            self.requests[code] = self.requests.get(code, 0) + 1
+            if code == '0000000000':
+                return web.Response(status=404)
+            # 第一次请求返回临时错误，重试后成功
+            if code == '8517130000' and self.requests[code] == 1:
+                return web.Response(status=503)
+            if code == '9999999999':
+                return web.Response(text="no rate")
+            return web.Response(text=f"rate {code}")
+
+        app = web.Application()
+        app.router.add_get('/uk/{code}', page)
+        return app
+
+    def make_retry(self, saved, should_stop=None):
+        def parse(content):
+            return {'rate': content} if content.startswith('rate') else None
+
+        def save(code, data):
+            saved[code] = data['rate']
+
+        return BulkRetry(
+            parse, [("英国数据", str(self.server.make_url('/uk/')), save)],
+            max_concurrent=4, max_attempts=3, backoff=0, should_stop=should_stop
+        )
+
+    async def test_outcome_per_code(self):
+        saved = {}
+        seen = []
+        codes = ['0101210000', '8517130000', '0000000000', '9999999999']
+        outcomes = await self.make_retry(saved).run(codes, seen.append)
+
+        self.assertEqual([o['code'] for o in outcomes], codes)
+        self.assertEqual(
+            [o['status'] for o in outcomes],
+            [STATUS_SUCCESS, STATUS_SUCCESS, STATUS_FAILED, STATUS_FAILED]
+        )
+        self.assertIn("404", outcomes[2]['error'])
+        self.assertIn("解析页面失败", outcomes[3]['error'])
+        self.assertEqual(saved, {'0101210000': 'rate 0101210000', '8517130000': 'rate 8517130000'})
+        self.assertEqual(len(seen), 4)
+
+        # 临时错误会重试，404 不重试
+        self.assertEqual(self.requests['8517130000'], 2)
+        self.assertEqual(self.requests['0000000000'], 1)
+
+    async def test_stop_skips_remaining_codes(self):
+        outcomes = await self.make_retry({}, should_stop=lambda: True).run(['0101210000'])
+        self.assertEqual(outcomes[0]['status'], STATUS_SKIPPED)
+        self.assertEqual(summarize(outcomes)[STATUS_SKIPPED], 1)
+        self.assertEqual(self.requests, {})
@@ -0,0 +1,119 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from db_pool import ConnectionPool, PoolTimeout
+from tariff_db import TariffDB
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "tariffs.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_connections_are_reused(self):
+        pool = ConnectionPool(self.db_path, size=2)
+        for _ in range(10):
+            with pool.reader() as conn:
+                conn.execute("SELECT 1").fetchone()
+        stats = pool.stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['checkouts'], 10)
+        self.assertEqual(stats['in_use'], 0)
+        pool.close()
+
+    def test_bounded(self):
+        pool = ConnectionPool(self.db_path, size=2)
+        first = pool.checkout()
+        second = pool.checkout()
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(timeout=0.05)
+        self.assertEqual(pool.stats()['waits'], 1)
+
+        # 归还后等待中的线程可以取得连接
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(pool.checkout(timeout=2)))
+        waiter.start()
+        pool.checkin(first)
+        waiter.join()
+        self.assertIs(got[0], first)
+        pool.checkin(got[0])
+        pool.checkin(second)
+        self.assertEqual(pool.stats()['peak_in_use'], 2)
+        pool.close()
+
+    def test_tariff_db_across_threads(self):
+        db = TariffDB(self.db_path, pool_size=2)
+        db.add_tariffs_batch([{'code': '0101210000', 'description': '', 'rate': '0.00%'}])
+        errors = []
+
+        def search():
+            try:
+                for _ in range(50):
+                    self.assertEqual(db.get_tariff('0101210000')['rate'], '0.00%')
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=search) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(db.pool_stats()['created'], 2)
+        db.close()
+
+
+
+class TestTariffDBRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "tariffs.db")
+
+    def tearDown(self):
+        TariffDB.close_all()
+        self.tmpdir.cleanup()
+
+    def test_one_instance_per_path(self):
+        db = TariffDB.get(self.db_path)
+        relative = os.path.relpath(self.db_path)
+        self.assertIs(TariffDB.get(relative), db)
+        self.assertIsNot(TariffDB.get(os.path.join(self.tmpdir.name, "other.db")), db)
+
+    def test_closed_instance_is_replaced(self):
+        db = TariffDB.get(self.db_path)
+        db.add_tariffs_batch([{'code': '0101210000', 'description': '', 'rate': '0.00%'}])
+        db.close()
+        reopened = TariffDB.get(self.db_path)
+        self.assertIsNot(reopened, db)
+        self.assertEqual(reopened.get_record_count(), 1)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "需要 fork")
+    def test_forked_child_gets_own_instance(self):
+        db = TariffDB.get(self.db_path)
+        db.add_tariffs_batch([{'code': '0101210000', 'description': '', 'rate': '0.00%'}])
+        read_fd, write_fd = os.pipe()
+        # fork 时注册表锁被其他线程持有，子进程不能因此卡住
+        with TariffDB._registry_lock:
+            pid = os.fork()
+        if pid == 0:
+            try:
+                child = TariffDB.get(self.db_path)
+                ok = child is not db and child.get_record_count() == 1
+                os.write(write_fd, b'1' if ok else b'0')
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        _, status = os.waitpid(pid, 0)
+        result = os.read(read_fd, 1)
+        os.close(read_fd)
+        self.assertEqual(result, b'1')
+        self.assertIs(TariffDB.get(self.db_path), db)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+
+from failed_items import FailedItemStore, FailedItemsView
+from tariff_db import TariffDB
+
+
+class FakeTree:
+    """模拟 Treeview 中用到的方法"""
+
+    def __init__(self):
+        self.rows = {}
+        self.selected = ()
+        self._next = 0
+
+    def insert(self, parent, index, values):
+        self._next += 1
+        iid = f"I{self._next:03d}"
+        self.rows[iid] = values
+        return iid
+
+    def item(self, iid, values):
+        self.rows[iid] = values
+
+    def delete(self, *iids):
+        for iid in iids:
+            del self.rows[iid]
+
+    def get_children(self):
+        return tuple(self.rows)
+
+    def selection(self):
+        return self.selected
+
+
+class TestFailedItemStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = TariffDB(os.path.join(self.tmpdir.name, "tariffs.db"))
+        self.store = FailedItemStore(self.db)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_add_and_remove_are_persisted(self):
+        self.store.add_many([("0101210000", "超时"), ("0101290000", "解析失败")])
+        self.store.add("0101210000", "再次超时")
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(self.store.get("0101210000")['error_message'], "再次超时")
+
+        self.assertTrue(self.store.remove("0101290000"))
+        self.assertFalse(self.store.remove("0101290000"))
+
+        reloaded = FailedItemStore(self.db)
+        reloaded.load()
+        self.assertEqual(reloaded.codes(), ["0101210000"])
+        self.assertEqual(reloaded.get("0101210000")['error_message'], "再次超时")
+
+    def test_load_picks_up_errors_written_elsewhere(self):
+        self.db.add_scrape_error("0201100000", "英国数据: 获取数据失败")
+        items = self.store.load()
+        self.assertEqual([item['code'] for item in items], ["0201100000"])
+        self.assertIsNotNone(items[0]['timestamp'])
+
+    def test_clear(self):
+        self.store.add("0101210000", "超时")
+        self.store.clear()
+        self.assertEqual(len(self.store), 0)
+        self.assertEqual(self.db.get_scrape_errors(), [])
+
+
+class TestFailedItemsView(unittest.TestCase):
+    def test_upsert_remove_and_selection(self):
+        tree = FakeTree()
+        view = FailedItemsView(tree)
+        items = [{'code': f"01012{i:05d}", 'error_message': "超时", 'timestamp': None} for i in range(5)]
+        view.refresh(items)
+        self.assertEqual(len(tree.rows), 5)
+
+        # 已存在的编码原地更新，不新增条目
+        view.upsert([{'code': "0101200000", 'error_message': "解析失败", 'timestamp': "t"}])
+        self.assertEqual(len(tree.rows), 5)
+
+        view.remove(["0101200001", "0101200003", "missing"])
+        self.assertEqual(view.row_count, 3)
+        self.assertEqual(view.codes(), ["0101200000", "0101200002", "0101200004"])
+
+        # 选中条目通过映射还原为编码，保留前导零
+        tree.selected = tuple(tree.rows)[:2]
+        self.assertEqual(view.selected_codes(), ["0101200000", "0101200002"])
+
+        view.refresh([])
+        self.assertEqual(tree.rows, {})
+        self.assertEqual(view.row_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
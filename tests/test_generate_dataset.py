@@ -0,0 +1,39 @@
+import os
+import tempfile
+import unittest
+from generate_dataset import generate_codes, generate_tariffs, write_dataset, CHAPTERS
+from tariff_db import TariffDB
+
+
+class TestGenerateDataset(unittest.TestCase):
+    def test_generate_codes(self):
+        codes = list(generate_codes(5000, seed=1))
+        self.assertEqual(len(codes), 5000)
+        self.assertEqual(len(set(codes)), 5000)
+        self.assertEqual(codes, sorted(codes))
+        self.assertTrue(all(len(code) == 10 and code.isdigit() for code in codes))
+        self.assertTrue(all(code[:2] in CHAPTERS for code in codes))
+
+        # 相同种子生成相同数据
+        self.assertEqual(codes, list(generate_codes(5000, seed=1)))
+
+    def test_generate_tariffs(self):
+        tariffs = list(generate_tariffs(500, seed=3, ni_ratio=1.0))
+        self.assertEqual(len(tariffs), 500)
+        for tariff in tariffs:
+            self.assertTrue(tariff['url'].endswith(tariff['code']))
+            self.assertIn('north_ireland_rate', tariff)
+
+        tariffs = list(generate_tariffs(500, seed=3, ni_ratio=0.0))
+        self.assertFalse(any('north_ireland_rate' in t for t in tariffs))
+
+    def test_write_dataset(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "synthetic.db")
+            written = write_dataset(db_path, 2500, chunk_size=1000)
+            self.assertEqual(written, 2500)
+            self.assertEqual(TariffDB(db_path).get_record_count(), 2500)
+
+
+if __name__ == '__main__':
+    unittest.main()
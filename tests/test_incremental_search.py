@@ -0,0 +1,87 @@
+import os
+import queue
+import tempfile
+import threading
+import unittest
+from tariff_db import TariffDB
+from tariff_api import TariffAPI, SearchCancelled
+from incremental_search import IncrementalSearch
+
+
+class TestIncrementalSearch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmp.name, "tariffs.db")
+        TariffDB(db_path).add_tariffs_batch([
+            {'code': f"85{i:08d}", 'description': '', 'rate': '2.00%'} for i in range(50)
+        ] + [
+            {'code': '0101210000', 'description': '', 'rate': '0.00%'},
+        ])
+        self.api = TariffAPI(db_path)
+        self.results = queue.Queue()
+        self.searcher = IncrementalSearch(
+            self.api, lambda q, r, g: self.results.put((q, r, g)), limit=5
+        )
+
+    def tearDown(self):
+        self.searcher.close()
+        self.tmp.cleanup()
+
+    def test_prefix_reuse(self):
+        self.searcher.submit('85')
+        query, results, _ = self.results.get(timeout=5)
+        self.assertEqual(len(results), 5)
+
+        # 追加字符时只在上一次的候选集中过滤
+        self.api.prefix_candidates = None
+        self.searcher.submit('850000001')
+        query, results, _ = self.results.get(timeout=5)
+        self.assertEqual(query, '850000001')
+        self.assertTrue(all(r['code'].startswith('850000001') for r in results))
+
+    def test_only_latest_result_delivered(self):
+        started = threading.Event()
+        release = threading.Event()
+        original = self.api.exact_search
+
+        def slow_exact_search(code):
+            if code == '85':
+                started.set()
+                release.wait(5)
+            return original(code)
+
+        self.api.exact_search = slow_exact_search
+        first = self.searcher.submit('85')
+        started.wait(5)
+        self.searcher.submit('0101')
+        last = self.searcher.submit('010121')
+        release.set()
+
+        query, results, generation = self.results.get(timeout=5)
+        self.assertEqual(generation, last)
+        self.assertFalse(self.searcher.is_current(first))
+        self.assertEqual(results[0]['code'], '0101210000')
+        self.assertTrue(self.results.empty())
+
+    def test_rank_cancelled(self):
+        with self.assertRaises(SearchCancelled):
+            self.api.rank_by_similarity('85', should_stop=lambda: True)
+
+
+    def test_warm_pins_results_until_invalidated(self):
+        self.assertEqual(self.searcher.warm([('8500', True), ('85.00', True), ('0101210000', False)]), 2)
+
+        # 固定的结果不再访问索引
+        original = self.api.prefix_candidates
+        self.api.prefix_candidates = None
+        self.searcher.submit('8500')
+        _, results, _ = self.results.get(timeout=5)
+        self.assertEqual(len(results), 5)
+
+        self.api.prefix_candidates = original
+        self.searcher.invalidate()
+        self.assertEqual(self.searcher._pinned, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
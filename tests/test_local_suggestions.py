@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+from local_suggestions import LocalSuggestionProvider
+from tariff_api import TariffAPI
+from tariff_db import TariffDB
+
+
+class TestLocalSuggestionProvider(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmpdir.name, "tariffs.db")
+        TariffDB(db_path).add_tariffs_batch([
+            {'code': '0101210000', 'description': 'Pure-bred breeding horses', 'rate': '0.00%'},
+            {'code': '0101291000', 'description': 'Horses for slaughter', 'rate': '0.00%'},
+            {'code': '0101300000', 'description': 'Asses', 'rate': '0.00%'},
+            {'code': '8517130000', 'description': 'Smartphones', 'rate': '0.00%'},
+        ])
+        self.provider = LocalSuggestionProvider(TariffAPI(db_path))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_same_shape_as_remote_suggestions(self):
+        success, results = self.provider.get_suggestions("0101")
+        self.assertTrue(success)
+        for result in results:
+            self.assertTrue({'id', 'text', 'formatted_suggestion_type', 'resource_id'} <= set(result))
+
+        by_type = {}
+        for result in results:
+            by_type.setdefault(result['formatted_suggestion_type'], []).append(result['text'])
+        self.assertEqual(by_type['Heading'], ['0101'])
+        self.assertEqual(sorted(by_type['Subheading']), ['010121', '010129', '010130'])
+        self.assertEqual(len(by_type['Commodity']), 3)
+        subheading = next(r for r in results if r['text'] == '010121')
+        self.assertEqual(subheading['id'], '0101210000-80')
+
+    def test_ranked_by_similarity(self):
+        success, results = self.provider.get_suggestions("0101.29.1000")
+        commodities = [r['text'] for r in results if r['formatted_suggestion_type'] == 'Commodity']
+        self.assertEqual(commodities[0], '0101291000')
+        self.assertEqual(results[-len(commodities)]['score'], 1.0)
+
+    def test_falls_back_to_shorter_prefix(self):
+        success, results = self.provider.get_suggestions("0101999999")
+        self.assertTrue(success)
+        self.assertTrue(all(r['text'].startswith('0101') for r in results))
+
+    def test_description_search(self):
+        success, results = self.provider.get_suggestions("horses slaughter")
+        self.assertEqual([r['text'] for r in results], ['0101291000'])
+
+    def test_description_ranked_by_match(self):
+        # 编码在后但描述以查询开头的记录排在前面
+        success, results = self.provider.get_suggestions("horses")
+        self.assertEqual([r['text'] for r in results], ['0101291000', '0101210000'])
+        self.assertGreater(results[0]['score'], results[1]['score'])
+
+    def test_not_found(self):
+        self.assertEqual(self.provider.get_suggestions("9999"), (False, "未找到搜索建议"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from log_buffer import LogBuffer
+
+
+class TestLogBuffer(unittest.TestCase):
+    def test_keeps_most_recent_lines(self):
+        buffer = LogBuffer(max_lines=3)
+        for i in range(10):
+            buffer.append(f"line {i}")
+        self.assertEqual(buffer.lines(), ["line 7", "line 8", "line 9"])
+        self.assertEqual(buffer.total, 10)
+        self.assertEqual(buffer.dropped, 7)
+
+    def test_clear(self):
+        buffer = LogBuffer(max_lines=3)
+        buffer.append("a")
+        buffer.clear()
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(buffer.dropped, 0)
+
+    def test_spill_to_rotating_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "update.log")
+            buffer = LogBuffer(max_lines=2, spill_path=path, max_bytes=200, backup_count=2)
+            for i in range(20):
+                buffer.append(f"line {i}")
+            buffer.close()
+
+            # 内存中只保留最近两行，日志文件滚动保存，最新的行在当前文件中
+            self.assertEqual(len(buffer), 2)
+            self.assertTrue(os.path.exists(path + ".1"))
+            with open(path, encoding='utf-8') as f:
+                self.assertIn("line 19", f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
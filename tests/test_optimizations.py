@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from optimizations import (
+    audit_indexes, integrity_check, last_maintenance, maintain_after_update,
+    page_usage, run_maintenance, vacuum_into,
+)
+from tariff_db import TariffDB
+
+
+def make_tariffs(count):
+    return [{'code': f"{i:010d}", 'description': 'x' * 200, 'rate': '0.00%'} for i in range(count)]
+
+
+class TestMaintenance(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "tariffs.db")
+        self.db = TariffDB(self.db_path)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def add_legacy_index(self):
+        with self.db.pool.writer() as conn, conn:
+            conn.execute("CREATE INDEX idx_code ON tariff_rows(code)")
+            conn.execute("CREATE INDEX idx_rate ON tariff_rows(rate_id)")
+
+    def test_audit_finds_index_duplicating_primary_key(self):
+        self.add_legacy_index()
+        with self.db.pool.reader() as conn:
+            redundant = audit_indexes(conn)
+        self.assertEqual([(i['name'], i['covered_by']) for i in redundant],
+                         [('idx_code', 'sqlite_autoindex_tariff_rows_1')])
+
+    def test_run_maintenance(self):
+        self.add_legacy_index()
+        self.db.add_tariffs_batch(make_tariffs(2000))
+        with self.db.pool.writer() as conn, conn:
+            conn.execute("DELETE FROM tariffs WHERE code > '0000000100'")
+
+        result = run_maintenance(self.db)
+        self.assertEqual(result['dropped_indexes'], ['idx_code'])
+        self.assertEqual(result['integrity'], [])
+        self.assertTrue(result['vacuumed'])
+        self.assertGreater(result['freed_bytes'], 0)
+        self.assertEqual(self.db.get_record_count(), 101)
+
+        with self.db.pool.reader() as conn:
+            self.assertEqual(audit_indexes(conn), [])
+            self.assertEqual(integrity_check(conn, full=True), [])
+            self.assertEqual(page_usage(conn)['free_pages'], 0)
+            self.assertIsNotNone(last_maintenance(conn))
+
+    def test_vacuum_into(self):
+        self.db.add_tariffs_batch(make_tariffs(10))
+        backup = os.path.join(self.tmpdir.name, "backup.db")
+        with self.db.pool.writer() as conn:
+            vacuum_into(conn, backup)
+            with self.assertRaises(FileExistsError):
+                vacuum_into(conn, backup)
+        conn = sqlite3.connect(backup)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM tariffs").fetchone()[0], 10)
+        conn.close()
+
+    def test_maintain_after_update(self):
+        self.assertIsNone(maintain_after_update(self.db))
+
+        self.db.add_tariffs_batch(make_tariffs(50))
+        # 从未维护过，有写入就执行
+        self.assertIsNotNone(maintain_after_update(self.db, min_changes=1000))
+
+        # 刚维护过，写入量不足时跳过
+        self.db.add_tariffs_batch(make_tariffs(50))
+        self.assertIsNone(maintain_after_update(self.db, min_changes=1000))
+        self.assertIsNotNone(maintain_after_update(self.db, min_changes=50))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+
+from query_log import QueryLog
+from tariff_db import TariffDB
+
+
+class TestQueryLog(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = TariffDB(os.path.join(self.tmpdir.name, "tariffs.db"))
+
+    def tearDown(self):
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def test_counts_are_aggregated(self):
+        log = QueryLog(self.db, flush_every=1000)
+        for _ in range(3):
+            log.record('0101.21', True)
+        log.record('010121', False)
+        log.record('85', True)
+        log.record('  ', True)
+        self.assertEqual(log.top(), [])
+
+        log.flush()
+        log.record('85', True)
+        log.close()
+
+        self.assertEqual(log.top(), [('010121', True), ('85', True), ('010121', False)])
+        self.assertEqual(log.top(1), [('010121', True)])
+
+    def test_persists_across_instances(self):
+        log = QueryLog(self.db)
+        log.record('8501', True)
+        log.close()
+        self.assertEqual(QueryLog(self.db).top(), [('8501', True)])
+
+
+if __name__ == '__main__':
+    unittest.main()
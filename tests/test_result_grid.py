@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from result_grid import PagedRows
+from src.core.db.tariff_db import TariffDB
+
+
+class TestPagedRows(unittest.TestCase):
+    def test_iterator_is_read_by_page(self):
+        consumed = []
+
+        def source():
+            for i in range(1000):
+                consumed.append(i)
+                yield i
+
+        rows = PagedRows(page_size=100)
+        rows.set_source(source())
+        self.assertEqual(len(rows), 100)
+        self.assertEqual(rows.estimated_total(), 200)
+
+        # 滚动到第350行时只读取到需要的页
+        top = rows.clamp_top(350, 20)
+        self.assertEqual(top, 350)
+        self.assertEqual(len(consumed), 400)
+        self.assertEqual(rows.window(top, 3), [350, 351, 352])
+
+        # 滚动超出末尾时读取全部并限制首行
+        self.assertEqual(rows.clamp_top(5000, 20), 980)
+        self.assertTrue(rows.exhausted)
+        self.assertEqual(rows.estimated_total(), 1000)
+
+    def test_list_source(self):
+        rows = PagedRows(page_size=10)
+        rows.set_source(list(range(5)))
+        self.assertEqual(rows.estimated_total(), 5)
+        self.assertEqual(rows.clamp_top(3, 10), 0)
+        rows.set_source([])
+        self.assertEqual(len(rows), 0)
+
+
+class TestIterSearchTariffs(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = TariffDB(os.path.join(self.tmp.name, "tariffs.db"))
+        for i in range(25):
+            self.db.update_uk_tariff(f"8517{i:06d}", "phone", "0.00%", "")
+        self.db.update_uk_tariff("0101210000", "horse", "0.00%", "")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_keyset_pages(self):
+        codes = [t['code'] for t in self.db.iter_search_tariffs("8517", fuzzy=True, page_size=10)]
+        self.assertEqual(codes, [f"8517{i:06d}" for i in range(25)])
+        self.assertEqual(self.db.count_search_tariffs("phone", fuzzy=True), 25)
+
+        exact = list(self.db.iter_search_tariffs("0101210000"))
+        self.assertEqual([t['description'] for t in exact], ["horse"])
+
+
+if __name__ == '__main__':
+    unittest.main()
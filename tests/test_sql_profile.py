@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import sql_profile
+from sql_profile import SQLProfiler, TracingConnection, format_report
+from tariff_db import TariffDB
+
+
+class TestSQLProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profiler = SQLProfiler(slow_ms=0)
+        self.conn = sqlite3.connect(":memory:", factory=TracingConnection)
+        self.conn.profiler = self.profiler
+        self.conn.execute("CREATE TABLE t (code TEXT PRIMARY KEY, rate TEXT)")
+        self.conn.executemany("INSERT INTO t VALUES (?, ?)", [(str(i), '0%') for i in range(100)])
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_disabled_records_nothing(self):
+        cursor = self.conn.execute("SELECT code FROM t")
+        self.assertIsInstance(cursor, sqlite3.Cursor)
+        self.assertEqual(self.profiler.report(), [])
+
+    def test_counts_rows_and_plan(self):
+        self.profiler.enable()
+        for _ in range(3):
+            self.assertEqual(len(self.conn.execute("SELECT code, rate FROM t").fetchall()), 100)
+        self.assertEqual(self.conn.execute("SELECT rate FROM  t WHERE code = ?", ('5',)).fetchone(), ('0%',))
+
+        report = {row['sql']: row for row in self.profiler.report()}
+        scan = report["SELECT code, rate FROM t"]
+        self.assertEqual(scan['count'], 3)
+        self.assertEqual(scan['rows'], 300)
+        self.assertTrue(scan['full_scan'])
+
+        lookup = report["SELECT rate FROM t WHERE code = ?"]
+        self.assertEqual(lookup['rows'], 1)
+        self.assertFalse(lookup['full_scan'])
+        self.assertTrue(any('INDEX' in step for step in lookup['plan']))
+        self.assertIn("[全表扫描]", format_report(self.profiler.report()))
+
+    def test_fetched_cursor_iteration(self):
+        self.profiler.enable()
+        cursor = self.conn.execute("SELECT code FROM t ORDER BY code LIMIT 3")
+        self.assertEqual(cursor.fetchone(), ('0',))
+        self.assertEqual(list(cursor), [('1',), ('10',)])
+        self.assertIsNone(cursor.fetchone())
+
+    def test_slow_threshold(self):
+        self.profiler.enable(slow_ms=10_000)
+        self.conn.execute("SELECT code FROM t").fetchall()
+        row = self.profiler.report()[0]
+        self.assertEqual(row['slow'], 0)
+        self.assertEqual(row['plan'], [])
+
+
+class TestTariffDBTracing(unittest.TestCase):
+    def test_tariff_db_statements_are_recorded(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db = TariffDB(os.path.join(tmpdir, "tariffs.db"))
+            sql_profile.PROFILER.reset()
+            sql_profile.PROFILER.enable()
+            try:
+                db.add_tariffs_batch([{'code': '0101210000', 'description': '', 'rate': '0.00%'}])
+                self.assertEqual(db.get_tariff('0101210000')['rate'], '0.00%')
+                self.assertEqual(len(db.get_all_tariffs()), 1)
+                counts = [row['count'] for row in sql_profile.PROFILER.report()]
+            finally:
+                sql_profile.PROFILER.disable()
+                sql_profile.PROFILER.reset()
+                db.close()
+        self.assertEqual(len(counts), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+import unittest
+from startup_profile import parse_importtime
+
+
+class TestStartupProfile(unittest.TestCase):
+    def test_parse_importtime(self):
+        output = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       120 |        120 |     _queue",
+            "import time:       300 |        420 |   queue",
+            "import time:       500 |        920 | tariff_gui",
+            "unrelated line",
+        ])
+        modules = parse_importtime(output)
+        self.assertEqual([m['module'] for m in modules], ['_queue', 'queue', 'tariff_gui'])
+        self.assertEqual([m['depth'] for m in modules], [2, 1, 0])
+        self.assertAlmostEqual(modules[2]['cumulative_ms'], 0.92)
+
+    def test_gui_import_is_lazy(self):
+        # 主窗口模块不应在启动时导入抓取和批量处理相关的重量级依赖
+        code = (
+            "import sys, tariff_gui; "
+            "print(','.join(m for m in ('aiohttp', 'bs4', 'pandas', 'batch_gui', 'update_gui') "
+            "if m in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+        if result.returncode != 0 and 'tkinter' in result.stderr:
+            self.skipTest("tkinter 不可用")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
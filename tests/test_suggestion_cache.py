@@ -0,0 +1,61 @@
+import os
+import tempfile
+import time
+import unittest
+
+from suggestion_cache import SuggestionCache, normalize_query
+from web_search import WebSearchAPI
+
+
+def suggestion(code):
+    return {'id': code, 'text': code, 'formatted_suggestion_type': 'Commodity', 'resource_id': code}
+
+
+class TestSuggestionCache(unittest.TestCase):
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query(" 0101.21 00 "), "01012100")
+        self.assertEqual(normalize_query("  Live   Horses "), "live horses")
+
+    def test_exact_hit_and_expiry(self):
+        cache = SuggestionCache(ttl=60)
+        cache.put("0101", [suggestion("0101210000")])
+        self.assertEqual(cache.get("0101 "), [suggestion("0101210000")])
+
+        cache._entries["0101"]['time'] = time.time() - 120
+        self.assertIsNone(cache.get("0101"))
+        self.assertEqual(len(cache), 0)
+
+    def test_longer_query_filters_complete_prefix_response(self):
+        cache = SuggestionCache(result_limit=10)
+        cache.put("0101", [suggestion("0101210000"), suggestion("0101290000")])
+        self.assertEqual(cache.get("010121"), [suggestion("0101210000")])
+        self.assertEqual(cache.get("0102"), None)
+
+        # 达到返回上限的响应可能被截断，不能用来过滤
+        cache.put("85", [suggestion(f"85{i:08d}") for i in range(10)])
+        self.assertIsNone(cache.get("8517"))
+
+        # 含有非编码建议的响应不用于过滤，否则命中和未命中时返回的建议不同
+        cache.put("28", [suggestion("2801000000"), {'id': '123', 'text': 'sodium chloride',
+                                                     'formatted_suggestion_type': 'Chemical'}])
+        self.assertIsNone(cache.get("2801"))
+
+    def test_persisted_to_disk(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "cache.json")
+            SuggestionCache(path).put("0101", [suggestion("0101210000")])
+            self.assertEqual(SuggestionCache(path).get("0101"), [suggestion("0101210000")])
+            self.assertIsNone(SuggestionCache(path, ttl=-1).get("0101"))
+
+    def test_api_uses_cache(self):
+        api = WebSearchAPI(cache=SuggestionCache())
+        self.assertIsNone(api.cached_suggestions("0101"))
+        api._parse_suggestions({'results': [suggestion("0101210000")]}, "0101")
+        self.assertEqual(api.get_suggestions("010121"), (True, [suggestion("0101210000")]))
+
+        api._parse_suggestions({'results': []}, "9999")
+        self.assertEqual(api.cached_suggestions("9999"), (False, "未找到搜索建议"))
+
+
+if __name__ == '__main__':
+    unittest.main()
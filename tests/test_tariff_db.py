@@ -0,0 +1,173 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from tariff_db import NI_COMMODITY_URL, SCHEMA_VERSION, UK_COMMODITY_URL, TariffDB
+
+LEGACY_SCHEMA = """
+CREATE TABLE tariffs (
+    code TEXT PRIMARY KEY,
+    description TEXT,
+    rate TEXT,
+    url TEXT,
+    north_ireland_rate TEXT,
+    north_ireland_url TEXT
+)
+"""
+
+
+class TestCompactStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "tariffs.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def raw(self, sql, params=()):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def test_migrates_legacy_database(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(LEGACY_SCHEMA)
+        conn.execute("CREATE INDEX idx_code ON tariffs(code)")
+        conn.executemany("INSERT INTO tariffs VALUES (?, ?, ?, ?, ?, ?)", [
+            ('0101210000', '', '0.00%', f"{UK_COMMODITY_URL}0101210000", None, None),
+            ('0101290000', 'horses', '0.00%', f"{UK_COMMODITY_URL}0101290000",
+             '0.00%', f"{NI_COMMODITY_URL}0101290000"),
+            ('0102000000', '', '2.00%', "https://example.com/0102", '4.00%', None),
+        ])
+        conn.commit()
+        before = conn.execute("SELECT * FROM tariffs ORDER BY code").fetchall()
+        conn.close()
+
+        db = TariffDB(self.db_path)
+        with db.pool.reader() as conn:
+            after = conn.execute(
+                "SELECT code, description, rate, url, north_ireland_rate, north_ireland_url "
+                "FROM tariffs ORDER BY code"
+            ).fetchall()
+        db.close()
+
+        # 最后一条有北爱尔兰税率但没有网址，迁移后按默认地址补上
+        self.assertEqual(after[:2], before[:2])
+        self.assertEqual(after[2][:5], before[2][:5])
+        self.assertEqual(after[2][5], f"{NI_COMMODITY_URL}0102000000")
+
+        self.assertEqual(self.raw("PRAGMA user_version"), [(SCHEMA_VERSION,)])
+        self.assertEqual(self.raw("SELECT COUNT(*) FROM rates"), [(3,)])
+        # 只保存与默认地址不同的网址
+        self.assertEqual(self.raw("SELECT code FROM tariff_rows WHERE url IS NOT NULL"), [('0102000000',)])
+
+        # 再次打开不会重复迁移
+        TariffDB(self.db_path).close()
+        self.assertEqual(self.raw("SELECT COUNT(*) FROM tariff_rows"), [(3,)])
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "需要 fork")
+    def test_concurrent_migration(self):
+        # 多个进程同时打开旧版数据库，只有一个执行迁移，其余的等待后直接使用
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(LEGACY_SCHEMA)
+        conn.executemany("INSERT INTO tariffs VALUES (?, ?, ?, ?, ?, ?)", [
+            (f"{i:010d}", '', '2.00%', None, None, None) for i in range(20000)
+        ])
+        conn.commit()
+        conn.close()
+
+        def open_db(queue):
+            try:
+                queue.put(TariffDB(self.db_path).get_record_count())
+            except Exception as e:
+                queue.put(repr(e))
+
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        processes = [context.Process(target=open_db, args=(queue,)) for _ in range(4)]
+        for process in processes:
+            process.start()
+        results = [queue.get(timeout=60) for _ in processes]
+        for process in processes:
+            process.join()
+        self.assertEqual(results, [20000] * 4)
+
+    def test_writes_through_view(self):
+        db = TariffDB(self.db_path)
+        db.add_tariff('0101210000', '', '0.00%')
+        db.add_tariffs_batch([
+            {'code': '0101290000', 'description': '', 'rate': '0.00%'},
+            {'code': '0102000000', 'description': '', 'rate': '2.00%',
+             'north_ireland_rate': '2.00%', 'north_ireland_url': f"{NI_COMMODITY_URL}0102000000"},
+        ])
+        # INSERT OR REPLACE 不能改变已有税率的编号
+        db.add_tariff('0101210000', 'horses', '0.00%')
+        db.update_north_ireland_tariff('0101210000', '4.00%', f"{NI_COMMODITY_URL}0101210000")
+        db.update_uk_tariff('0101290000', 'asses', '6.00%', "https://example.com/0101290000")
+
+        tariff = db.get_tariff('0101210000')
+        self.assertEqual(tariff['description'], 'horses')
+        self.assertEqual(tariff['url'], f"{UK_COMMODITY_URL}0101210000")
+        self.assertEqual(tariff['north_ireland_rate'], '4.00%')
+        self.assertEqual(tariff['north_ireland_url'], f"{NI_COMMODITY_URL}0101210000")
+
+        tariff = db.get_tariff('0101290000')
+        self.assertEqual((tariff['rate'], tariff['url']), ('6.00%', "https://example.com/0101290000"))
+        self.assertIsNone(tariff['north_ireland_url'])
+
+        self.assertEqual(db.get_existing_codes_north_ireland(), {'0101210000', '0102000000'})
+        self.assertEqual(
+            self.raw("SELECT rate FROM rates ORDER BY id"), [('0.00%',), ('2.00%',), ('4.00%',), ('6.00%',)]
+        )
+
+        with db.pool.writer() as conn, conn:
+            conn.execute("DELETE FROM tariffs WHERE code = '0102000000'")
+        self.assertEqual(db.get_record_count(), 2)
+        db.close()
+
+    def test_north_ireland_url_without_rate(self):
+        db = TariffDB(self.db_path)
+        db.add_tariffs_batch([
+            {'code': '0101210000', 'description': '', 'rate': '0.00%',
+             'north_ireland_url': f"{NI_COMMODITY_URL}0101210000"},
+        ])
+        tariff = db.get_tariff('0101210000')
+        self.assertIsNone(tariff['north_ireland_rate'])
+        self.assertEqual(tariff['north_ireland_url'], f"{NI_COMMODITY_URL}0101210000")
+        db.close()
+
+    def test_plain_insert_keeps_conflict_handling(self):
+        db = TariffDB(self.db_path)
+        db.add_tariff('0101210000', 'horses', '0.00%')
+        with db.pool.writer() as conn:
+            with self.assertRaises(sqlite3.IntegrityError):
+                with conn:
+                    conn.execute("INSERT INTO tariffs (code, description, rate) VALUES ('0101210000', '', '2.00%')")
+            with conn:
+                conn.execute("INSERT OR IGNORE INTO tariffs (code, description, rate) VALUES ('0101210000', '', '2.00%')")
+        self.assertEqual(db.get_tariff('0101210000')['rate'], '0.00%')
+        db.close()
+
+    def test_upgrades_version_2_triggers(self):
+        TariffDB(self.db_path).close()
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA user_version = 2")
+        conn.close()
+
+        db = TariffDB(self.db_path)
+        db.add_tariff('0101210000', '', '0.00%')
+        self.assertEqual(self.raw("PRAGMA user_version"), [(SCHEMA_VERSION,)])
+        self.assertEqual(
+            {row[0] for row in self.raw("SELECT name FROM sqlite_master WHERE type = 'trigger'")},
+            {'tariffs_insert', 'tariffs_update', 'tariffs_delete'}
+        )
+        self.assertEqual(db.get_record_count(), 1)
+        db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+from aiohttp.test_utils import AioHTTPTestCase
+from tariff_db import TariffDB
+from tariff_server import TariffService
+
+
+class TestTariffServer(AioHTTPTestCase):
+    async def get_application(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmp.name, "tariffs.db")
+        TariffDB(db_path).add_tariffs_batch([
+            {'code': '0101210000', 'description': '', 'rate': '0.00%'},
+            {'code': '8517120000', 'description': '', 'rate': '2.00%'},
+            {'code': '8517130000', 'description': '', 'rate': '0.00%'},
+        ])
+        return TariffService(db_path, pool_size=2).create_app()
+
+    async def asyncTearDown(self):
+        await super().asyncTearDown()
+        self.tmp.cleanup()
+
+    async def test_exact(self):
+        async with self.client.get('/tariffs/8517.12.0000') as response:
+            self.assertEqual(response.status, 200)
+            self.assertEqual((await response.json())['rate'], '2.00%')
+
+        async with self.client.get('/tariffs/9999999999') as response:
+            self.assertEqual(response.status, 404)
+
+    async def test_search(self):
+        async with self.client.get('/search', params={'q': '851714', 'limit': 2}) as response:
+            results = (await response.json())['results']
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all(r['code'].startswith('8517') for r in results))
+
+    async def test_batch(self):
+        body = {'codes': ['8517120000', '0101210000', '85171'], 'limit': 1}
+        async with self.client.post('/batch', json=body) as response:
+            results = (await response.json())['results']
+        self.assertEqual([r['query'] for r in results], body['codes'])
+        self.assertEqual(results[1]['matches'][0]['similarity'], 1.0)
+        self.assertTrue(results[2]['matches'][0]['code'].startswith('8517'))
+
+        async with self.client.post('/batch', json={'items': []}) as response:
+            self.assertEqual(response.status, 400)
+        async with self.client.post('/batch', json={'codes': '8517120000'}) as response:
+            self.assertEqual(response.status, 400)
+
+    async def test_hierarchy(self):
+        async with self.client.get('/hierarchy') as response:
+            children = (await response.json())['children']
+        self.assertEqual(children, [{'code': '01', 'count': 1}, {'code': '85', 'count': 2}])
+
+        async with self.client.get('/hierarchy/85171') as response:
+            children = (await response.json())['children']
+        self.assertEqual([c['code'] for c in children], ['851712', '851713'])
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from tariff_db import TariffDB
+from tariff_api import TariffAPI
+from tariff_snapshot import TariffSnapshot, SnapshotError, export_snapshot
+
+
+class TestTariffSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "tariffs.db")
+        self.snapshot_path = os.path.join(self.tmp.name, "tariffs.snap")
+        self.db = TariffDB(self.db_path)
+        self.db.add_tariffs_batch([
+            {'code': '8517130000', 'description': 'Smartphones', 'rate': '0.00%',
+             'url': 'https://example.com/8517130000'},
+            {'code': '0101210000', 'description': '纯种马', 'rate': '0.00%',
+             'north_ireland_rate': '0.00%'},
+            {'code': '8517120000', 'description': '', 'rate': '2.00%'},
+        ])
+        self.assertEqual(export_snapshot(self.db_path, self.snapshot_path), 3)
+        self.snapshot = TariffSnapshot(self.snapshot_path)
+
+    def tearDown(self):
+        self.snapshot.close()
+        self.tmp.cleanup()
+
+    def test_lookup_matches_database(self):
+        for code in self.db.get_all_codes():
+            self.assertEqual(self.snapshot.get_tariff(code), self.db.get_tariff(code))
+        self.assertIsNone(self.snapshot.get_tariff('8517'))
+        self.assertIsNone(self.snapshot.get_tariff('85171300001'))
+        self.assertEqual(self.snapshot.get_rate('8517120000'), '2.00%')
+
+    def test_prefix_range(self):
+        codes = [t['code'] for t in self.snapshot.iter_prefix('8517')]
+        self.assertEqual(codes, ['8517120000', '8517130000'])
+        self.assertEqual(len(self.snapshot.prefix_range('9')), 0)
+
+    def test_api_uses_snapshot(self):
+        api = TariffAPI(self.db_path, self.snapshot_path)
+        # 快照是导出时的数据，之后写入数据库的记录不可见
+        self.db.add_tariffs_batch([{'code': '9999999999', 'description': '', 'rate': '1.00%'}])
+        self.assertEqual(api.exact_search('8517.13.0000')['description'], 'Smartphones')
+        self.assertIsNone(api.exact_search('9999999999'))
+        api.snapshot.close()
+
+    def test_invalid_file(self):
+        path = os.path.join(self.tmp.name, "invalid.snap")
+        with open(path, 'wb') as f:
+            f.write(b'not a snapshot' * 10)
+        with self.assertRaises(SnapshotError):
+            TariffSnapshot(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
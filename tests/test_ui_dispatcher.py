@@ -0,0 +1,127 @@
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from ui_dispatcher import UIDispatcher
+
+
+class FakeWidget:
+    """记录 after 回调，由测试手动执行，模拟 Tk 主循环"""
+
+    def __init__(self):
+        self.callbacks = []
+        self.bindings = {}
+        self.fail_after = 0
+
+    def after(self, interval, callback):
+        if self.fail_after:
+            self.fail_after -= 1
+            raise RuntimeError("main thread is not in main loop")
+        self.callbacks.append(callback)
+
+    def bind(self, sequence, func, add=None):
+        self.bindings.setdefault(sequence, []).append(func)
+
+    def destroy(self):
+        for func in self.bindings.get('<Destroy>', []):
+            func(SimpleNamespace(widget=self))
+
+    def _root(self):
+        return self
+
+    def run_pending(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+class TestUIDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.widget = FakeWidget()
+        self.dispatcher = UIDispatcher(self.widget)
+
+    def test_schedules_once_until_drained(self):
+        calls = []
+        for i in range(5):
+            self.dispatcher.call(calls.append, i)
+        self.assertEqual(len(self.widget.callbacks), 1)
+
+        self.widget.run_pending()
+        self.assertEqual(calls, [0, 1, 2, 3, 4])
+        self.assertEqual(self.widget.callbacks, [])
+
+        # 空闲时不再安排回调，有新任务时重新安排
+        self.dispatcher.call(calls.append, 5)
+        self.assertEqual(len(self.widget.callbacks), 1)
+
+    def test_latest_keeps_newest_per_key(self):
+        values = []
+        for i in range(100):
+            self.dispatcher.latest('progress', values.append, i)
+        self.dispatcher.latest('status', values.append, 'done')
+        self.widget.run_pending()
+        self.assertEqual(values, [99, 'done'])
+
+    def test_logs_are_batched_per_sink(self):
+        batches = []
+        for i in range(3):
+            self.dispatcher.log(batches.append, f"line {i}")
+        self.widget.run_pending()
+        self.assertEqual(batches, [["line 0", "line 1", "line 2"]])
+
+    def test_error_does_not_stop_other_tasks(self):
+        calls = []
+        self.dispatcher.call(lambda: 1 / 0)
+        self.dispatcher.call(calls.append, 'ok')
+        self.widget.run_pending()
+        self.assertEqual(calls, ['ok'])
+
+    def test_closed_dispatcher_does_not_schedule(self):
+        self.dispatcher.close()
+        self.dispatcher.call(print)
+        self.assertEqual(self.widget.callbacks, [])
+
+    def test_closed_when_widget_destroyed(self):
+        self.widget.destroy()
+        self.dispatcher.call(print)
+        self.assertEqual(self.widget.callbacks, [])
+
+    def test_retries_when_after_fails(self):
+        # 主循环启动前 after 失败，不能就此停止更新
+        self.dispatcher.interval = 1
+        self.widget.fail_after = 2
+        calls = []
+        self.dispatcher.call(calls.append, 1)
+        self.dispatcher.call(calls.append, 2)
+        deadline = time.time() + 2
+        while not self.widget.callbacks and time.time() < deadline:
+            time.sleep(0.005)
+        self.assertEqual(len(self.widget.callbacks), 1)
+        self.widget.run_pending()
+        self.assertEqual(calls, [1, 2])
+
+        self.dispatcher.call(calls.append, 3)
+        self.widget.run_pending()
+        self.assertEqual(calls, [1, 2, 3])
+
+    def test_shared_per_root(self):
+        first = UIDispatcher.for_widget(self.widget)
+        self.assertIs(UIDispatcher.for_widget(self.widget), first)
+
+    def test_submit_from_threads(self):
+        calls = []
+        threads = [
+            threading.Thread(target=lambda n=n: [self.dispatcher.call(calls.append, n) for _ in range(100)])
+            for n in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.widget.run_pending()
+        self.assertEqual(len(calls), 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
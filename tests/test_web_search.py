@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import unittest
+
+from web_search import AsyncSuggestionClient, WebSearchAPI
+
+
+class FakeAPI(WebSearchAPI):
+    """按查询返回固定结果，'slow' 开头的查询需要较长时间"""
+
+    def __init__(self):
+        super().__init__()
+        self.cancelled = []
+
+    async def get_suggestions_async(self, session, code):
+        try:
+            await asyncio.sleep(5 if code.startswith('slow') else 0)
+        except asyncio.CancelledError:
+            self.cancelled.append(code)
+            raise
+        return True, [{'text': code}]
+
+
+class TestAsyncSuggestionClient(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeAPI()
+        self.client = AsyncSuggestionClient(self.api)
+        self.done = threading.Event()
+        self.results = []
+
+    def tearDown(self):
+        self.client.close()
+
+    def callback(self, code, generation, result):
+        self.results.append((code, generation, result))
+        self.done.set()
+
+    def test_close_twice(self):
+        self.client.close()
+        self.client.close()
+        self.assertFalse(self.client._thread.is_alive())
+
+    def test_superseded_request_is_cancelled(self):
+        self.client.submit('slow0101', self.callback)
+        generation = self.client.submit('0101', self.callback)
+        self.assertTrue(self.done.wait(2))
+
+        self.assertEqual(self.results, [('0101', generation, (True, [{'text': '0101'}]))])
+        self.assertTrue(self.client.is_current(generation))
+        self.assertEqual(self.api.cancelled, ['slow0101'])
+
+    def test_cancel(self):
+        self.client.submit('slow0101', self.callback)
+        self.client.cancel()
+        self.assertFalse(self.done.wait(0.2))
+        self.assertEqual(self.results, [])
+
+    def test_parse_suggestions(self):
+        self.assertEqual(self.api._parse_suggestions({'results': [{'text': 'a'}]}), (True, [{'text': 'a'}]))
+        self.assertEqual(self.api._parse_suggestions({'data': [{'text': 'b'}]}), (True, [{'text': 'b'}]))
+        self.assertFalse(self.api._parse_suggestions({})[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
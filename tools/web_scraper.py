@@ -2,7 +2,7 @@
 
 import aiohttp
 import asyncio
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -34,6 +34,33 @@ async def scrape_urls(urls: List[str], headers: Dict = None, max_concurrent: int
         tasks = [bounded_fetch(session, url) for url in urls]
         return await asyncio.gather(*tasks)
 
+# 这些状态码通常是临时的，值得重试
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+async def fetch_with_backoff(session: aiohttp.ClientSession, url: str, headers: Dict = None,
+                             max_attempts: int = 3, backoff: float = 1.0) -> Tuple[Optional[str], Optional[str]]:
+    """在共享的会话中抓取单个URL，临时错误按指数退避重试
+
+    Returns:
+        (页面内容, 错误信息)，成功时错误信息为 None
+    """
+    error = None
+    for attempt in range(max_attempts):
+        if attempt:
+            await asyncio.sleep(backoff * 2 ** (attempt - 1))
+        try:
+            async with session.get(url, headers=headers) as response:
+                if response.status == 200:
+                    return await response.text(), None
+                error = f"状态码 {response.status}"
+                if response.status not in RETRY_STATUS:
+                    break
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = str(e) or type(e).__name__
+    logger.error(f"抓取失败 {url}: {error}")
+    return None, error
+
 # 如果直接运行此文件，执行测试
 if __name__ == "__main__":
     async def test():
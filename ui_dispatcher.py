@@ -0,0 +1,131 @@
+"""界面更新分发器
+
+后台线程不能直接操作 Tk 控件，原来各个界面都用 after(100) 不停轮询自己的队列，
+空闲时也会每秒唤醒主线程几十次。UIDispatcher 由同一个 Tk 根窗口下的所有界面共享，
+只有提交了任务才安排一次 after 回调，并在一次回调中处理期间积累的所有任务:
+
+- call: 普通任务，按提交顺序执行
+- latest: 同一个 key 只执行最后一次提交（进度、状态等只需显示最新值）
+- log: 同一个接收函数的日志合并为一个列表，一次追加
+
+后台线程调用 after 时由 Tcl 转交主线程执行；主循环尚未启动或暂时退出时 after 会失败，
+此时按 interval 重试，只有控件销毁（<Destroy>）或调用 close 后才停止安排回调。
+"""
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class UIDispatcher:
+    """在主线程中批量执行界面更新
+
+    Args:
+        widget: 任意控件，用于安排 after 回调
+        interval: 收到任务后等待多少毫秒再执行，期间的任务合并处理
+    """
+
+    def __init__(self, widget, interval: int = 50):
+        self.widget = widget
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._calls = deque()
+        self._latest = OrderedDict()
+        self._logs = OrderedDict()
+        self._scheduled = False
+        self._closed = False
+        widget.bind('<Destroy>', self._on_destroy, add='+')
+
+    @classmethod
+    def for_widget(cls, widget) -> 'UIDispatcher':
+        """获取控件所在根窗口共享的分发器"""
+        root = widget._root()
+        dispatcher = getattr(root, '_ui_dispatcher', None)
+        if dispatcher is None:
+            dispatcher = cls(root)
+            root._ui_dispatcher = dispatcher
+        return dispatcher
+
+    def call(self, func: Callable, *args, **kwargs):
+        """在主线程中执行 func"""
+        with self._lock:
+            self._calls.append((func, args, kwargs))
+            wake = self._need_wake()
+        if wake:
+            self._schedule()
+
+    def latest(self, key, func: Callable, *args, **kwargs):
+        """同一个 key 在下次执行前只保留最新的调用
+
+        分发器由整个窗口共享，key 应包含调用方，例如 (self, 'progress')
+        """
+        with self._lock:
+            self._latest.pop(key, None)
+            self._latest[key] = (func, args, kwargs)
+            wake = self._need_wake()
+        if wake:
+            self._schedule()
+
+    def log(self, sink: Callable, message: str):
+        """追加日志，下次执行时以 sink(messages) 一次写入"""
+        with self._lock:
+            self._logs.setdefault(sink, []).append(message)
+            wake = self._need_wake()
+        if wake:
+            self._schedule()
+
+    def close(self):
+        """窗口关闭后不再安排回调"""
+        with self._lock:
+            self._closed = True
+
+    def _on_destroy(self, event):
+        # 绑定在根窗口上时子控件销毁也会触发
+        if event.widget is self.widget:
+            self.close()
+
+    def _need_wake(self) -> bool:
+        """是否需要安排回调，已安排时不重复（调用方持有锁）"""
+        if self._scheduled or self._closed:
+            return False
+        self._scheduled = True
+        return True
+
+    def _schedule(self):
+        # 不能在持有锁时调用 after：后台线程调用 Tk 需要等待主线程，而主线程可能正在等锁
+        try:
+            self.widget.after(self.interval, self._drain)
+        except Exception as e:
+            # 主循环尚未启动或暂时不在运行（main thread is not in main loop），稍后重试；
+            # 任务保留在队列中，_scheduled 保持为 True，期间提交的任务不会重复安排
+            with self._lock:
+                if self._closed:
+                    self._scheduled = False
+                    return
+            logger.debug(f"无法安排界面更新，稍后重试: {str(e)}")
+            timer = threading.Timer(self.interval / 1000, self._schedule)
+            timer.daemon = True
+            timer.start()
+
+    def _drain(self):
+        """执行积累的任务：先写日志，再更新最新状态，最后按顺序执行普通任务"""
+        with self._lock:
+            calls, self._calls = self._calls, deque()
+            latest, self._latest = self._latest, OrderedDict()
+            logs, self._logs = self._logs, OrderedDict()
+            self._scheduled = False
+
+        for sink, messages in logs.items():
+            self._run(sink, (messages,), {})
+        for func, args, kwargs in latest.values():
+            self._run(func, args, kwargs)
+        for func, args, kwargs in calls:
+            self._run(func, args, kwargs)
+
+    def _run(self, func: Callable, args, kwargs):
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"界面更新失败: {str(e)}")
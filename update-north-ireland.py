@@ -21,7 +21,7 @@ class Scraper:
     }
     self.timeout = 30  # 请求超时时间
     self.max_retries = 5 # 最大重试次数
-    self.db = TariffDB()
+    self.db = TariffDB.get()
     self.existing_codes = self.db.get_existing_codes_north_ireland()  # 获取已存在的北爱尔兰编码
     logger.info(f"已存在 {len(self.existing_codes)} 条记录")
 
@@ -1,13 +1,17 @@
 import tkinter as tk
 from tkinter import ttk
 import logging
-import queue
 import threading
 import asyncio
-from update_tariffs import TariffScraper
 import tkinter.messagebox as messagebox
 from typing import List
 
+from ui_dispatcher import UIDispatcher
+from log_buffer import TextLogView
+from failed_items import FailedItemStore, FailedItemsView
+from tariff_db import TariffDB
+from optimizations import maintain_after_update
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -18,6 +22,7 @@ class UpdateFrame(ttk.Frame):
         self.setup_queue()
         self.is_updating = False
         self.last_update = None  # 保存上次更新状态
+        self.setup_failed_items()
 
     def setup_ui(self):
         """设置UI界面"""
@@ -166,26 +171,19 @@ class UpdateFrame(ttk.Frame):
         self.failed_tree.bind('<<TreeviewSelect>>', self.on_failed_select)
 
     def setup_queue(self):
-        """设置消息队列"""
-        self.queue = queue.Queue()
-        self.after(100, self.process_queue)
+        """设置界面更新分发器，后台线程通过它在主线程中更新界面"""
+        self.dispatcher = UIDispatcher.for_widget(self)
+        self.log_view = TextLogView(self.log_text, self.dispatcher.log)
 
-    def process_queue(self):
-        """处理消息队列"""
-        try:
-            while True:
-                func, args, kwargs = self.queue.get_nowait()
-                func(*args, **kwargs)
-                self.queue.task_done()
-        except queue.Empty:
-            pass
-        finally:
-            self.after(100, self.process_queue)
+    def setup_failed_items(self):
+        """加载上次保存的失败项"""
+        self.failed_store = FailedItemStore(TariffDB.get())
+        self.failed_view = FailedItemsView(self.failed_tree)
+        self._refresh_failed_items(self.failed_store.load())
 
     def add_log(self, message: str):
-        """添加日志"""
-        self.log_text.insert(tk.END, f"{message}\n")
-        self.log_text.see(tk.END)
+        """添加日志，可以在任意线程中调用，同一批日志一次写入"""
+        self.log_view.add(message)
 
     def start_update(self):
         """开始更新数据"""
@@ -214,7 +212,7 @@ class UpdateFrame(ttk.Frame):
         self.status_var.set("正在更新数据...")
         self.progress_var.set(0)
         if not self.last_update:
-            self.log_text.delete(1.0, tk.END)
+            self.log_view.clear()
 
         self.is_updating = True
 
@@ -238,20 +236,18 @@ class UpdateFrame(ttk.Frame):
     def _update_data(self):
         """在后台线程中执行数据更新"""
         try:
+            # 抓取依赖 aiohttp 和 BeautifulSoup，首次更新时再导入以加快启动
+            from update_tariffs import TariffScraper
             scraper = TariffScraper()
 
             # 设置进度回调
             def update_progress(progress, current_code=None):
-                self.queue.put((
-                    self._update_progress,
-                    (progress, current_code),
-                    {}
-                ))
+                self.dispatcher.latest((self, 'progress'), self._update_progress, progress, current_code)
             scraper.set_progress_callback(update_progress)
 
             # 设置日志回调
             def log_callback(message):
-                self.queue.put((self.add_log, (message,), {}))
+                self.add_log(message)
             scraper.set_log_callback(log_callback)
 
             # 设置停止检查回调
@@ -281,47 +277,41 @@ class UpdateFrame(ttk.Frame):
             success = True
             # 更新英国数据
             if self.uk_var.get():
-                self.queue.put((self.add_log, ("开始更新英国关税数据...",), {}))
+                self.add_log("开始更新英国关税数据...")
                 success &= loop.run_until_complete(scraper.update_uk_tariffs(codes))
 
             # 更新北爱尔兰数据
             if self.ni_var.get():
-                self.queue.put((self.add_log, ("开始更新北爱尔兰关税数据...",), {}))
+                self.add_log("开始更新北爱尔兰关税数据...")
                 success &= loop.run_until_complete(scraper.update_ni_tariffs(codes))
 
-            # 获取更新失败的记录
-            failed_items = scraper.db.get_scrape_errors()
-            for item in failed_items:
-                self.queue.put((
-                    self.add_failed_item,
-                    (item['code'], item['error_message']),
-                    {}
-                ))
+            # 抓取器直接写入 scrape_errors，更新结束后整体重新加载
+            failed_items = self.failed_store.load()
+            self.dispatcher.call(self._refresh_failed_items, failed_items)
 
             if failed_items:
                 self.add_log(f"有 {len(failed_items)} 个商品更新失败，请查看失败列表")
 
             loop.close()
 
+            # 写入较多时更新统计信息、清理冗余索引和压缩，停止更新时也执行
+            maintain_after_update(scraper.db, log=self.add_log)
+
             if success:
                 self.last_update = None  # 更新成功，清除断点记录
-                self.queue.put((self._update_complete, (), {}))
+                self.dispatcher.call(self._update_complete)
             elif not self.is_updating:
-                self.queue.put((self._update_stopped, (), {}))
+                self.dispatcher.call(self._update_stopped)
             else:
                 raise Exception("更新失败")
 
         except Exception as e:
             logger.error(f"更新数据失败: {str(e)}")
-            self.queue.put((
-                self.status_var.set,
-                (f"更新失败: {str(e)}",),
-                {}
-            ))
+            self.dispatcher.call(self.status_var.set, f"更新失败: {str(e)}")
         finally:
             self.is_updating = False
             # 恢复按钮状态
-            self.queue.put((self._reset_update_ui, (), {}))
+            self.dispatcher.call(self._reset_update_ui)
 
     def _update_progress(self, progress, current_code=None):
         """更新进度"""
@@ -350,6 +340,7 @@ class UpdateFrame(ttk.Frame):
         """重置更新UI状态"""
         self.update_btn.configure(state='normal')
         self.stop_btn.configure(state='disabled')
+        self._update_failed_buttons()
 
     def on_failed_select(self, event):
         """处理失败列表选择事件"""
@@ -360,70 +351,69 @@ class UpdateFrame(ttk.Frame):
 
     def add_failed_item(self, code: str, error: str):
         """添加失败项"""
-        from datetime import datetime
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # 检查是否已存在
-        for item in self.failed_tree.get_children():
-            if self.failed_tree.item(item)['values'][0] == code:
-                # 更新现有项
-                self.failed_tree.item(item, values=(code, error, current_time))
-                break
-        else:
-            # 添加新项
-            self.failed_tree.insert('', 'end', values=(code, error, current_time))
-
-        # 启用相关按钮
-        self.retry_all_btn.configure(state='normal')
-        self.clear_failed_btn.configure(state='normal')
+        item = self.failed_store.add(code, error)
+        self.failed_view.upsert([item])
+        self._update_failed_buttons()
 
     def clear_failed_list(self):
         """清空失败列表"""
-        for item in self.failed_tree.get_children():
-            self.failed_tree.delete(item)
-        self.retry_all_btn.configure(state='disabled')
-        self.retry_selected_btn.configure(state='disabled')
-        self.clear_failed_btn.configure(state='disabled')
+        self.failed_store.clear()
+        self.failed_view.refresh([])
+        self._update_failed_buttons()
+
+    def _refresh_failed_items(self, items):
+        """用全部失败项重建失败列表"""
+        self.failed_view.refresh(items)
+        self._update_failed_buttons()
+
+    def _update_failed_buttons(self):
+        """根据失败列表是否为空启用或禁用相关按钮"""
+        state = 'normal' if self.failed_view.row_count and not self.is_updating else 'disabled'
+        self.retry_all_btn.configure(state=state)
+        self.clear_failed_btn.configure(state=state)
+        if not self.failed_view.selected_codes() or self.is_updating:
+            self.retry_selected_btn.configure(state='disabled')
 
-    async def retry_codes(self, codes: List[str]):
-        """重试指定编码"""
+    async def retry_codes(self, codes: List[str], uk: bool = True, ni: bool = True):
+        """并发重试指定编码，结束后一次性更新失败列表"""
         if not codes:
             return
 
+        from update_tariffs import TariffScraper
+        from bulk_retry import STATUS_SUCCESS, STATUS_FAILED, STATUS_SKIPPED, summarize
         scraper = TariffScraper()
-
-        # 设置回调函数
-        scraper.set_progress_callback(lambda p, c: None)  # 不更新总进度
         scraper.set_log_callback(self.add_log)
         scraper.set_stop_check(lambda: not self.is_updating)
 
         self.add_log(f"开始重试 {len(codes)} 个失败项")
+        done = 0
+
+        def on_outcome(outcome):
+            nonlocal done
+            done += 1
+            self.dispatcher.latest((self, 'progress'), self.progress_var.set, done * 100 / len(codes))
+            if outcome['status'] == STATUS_FAILED:
+                self.add_log(f"重试商品 {outcome['code']} 失败: {outcome['error']}")
+
+        outcomes = await scraper.retry_codes(codes, uk, ni, on_outcome)
+
+        succeeded = [o['code'] for o in outcomes if o['status'] == STATUS_SUCCESS]
+        failed = [(o['code'], o['error']) for o in outcomes if o['status'] == STATUS_FAILED]
+        self.failed_store.remove_many(succeeded)
+        failed_items = self.failed_store.add_many(failed)
+        self.dispatcher.call(self._apply_retry_outcomes, succeeded, failed_items)
+
+        counts = summarize(outcomes)
+        self.add_log(
+            f"重试结束：成功 {counts[STATUS_SUCCESS]} 个，失败 {counts[STATUS_FAILED]} 个，"
+            f"未执行 {counts[STATUS_SKIPPED]} 个"
+        )
 
-        for code in codes:
-            if not self.is_updating:
-                break
-
-            self.add_log(f"重试商品 {code}")
-            success = True
-
-            if self.uk_var.get():
-                success &= await scraper.update_uk_tariffs([code])
-            if self.ni_var.get():
-                success &= await scraper.update_ni_tariffs([code])
-
-            if success:
-                # 从失败列表中移除
-                for item in self.failed_tree.get_children():
-                    if self.failed_tree.item(item)['values'][0] == code:
-                        self.failed_tree.delete(item)
-                        break
-            else:
-                self.add_log(f"重试商品 {code} 失败")
-
-        # 检查是否还有失败项
-        if not self.failed_tree.get_children():
-            self.retry_all_btn.configure(state='disabled')
-            self.clear_failed_btn.configure(state='disabled')
+    def _apply_retry_outcomes(self, succeeded: List[str], failed_items):
+        """把重试结果同步到失败列表"""
+        self.failed_view.remove(succeeded)
+        self.failed_view.upsert(failed_items)
+        self._update_failed_buttons()
 
     def retry_selected(self):
         """重试选中的失败项"""
@@ -431,47 +421,42 @@ class UpdateFrame(ttk.Frame):
         if not selected_items:
             return
 
-        codes = [
-            self.failed_tree.item(item)['values'][0]
-            for item in selected_items
-        ]
-
-        # 在后台线程中执行重试
-        thread = threading.Thread(
-            target=self._retry_in_thread,
-            args=(codes,),
-            daemon=True
-        )
-        thread.start()
+        self._start_retry(self.failed_view.selected_codes())
 
     def retry_all(self):
         """重试所有失败项"""
-        codes = [
-            self.failed_tree.item(item)['values'][0]
-            for item in self.failed_tree.get_children()
-        ]
+        self._start_retry(self.failed_store.codes())
+
+    def _start_retry(self, codes: List[str]):
+        """禁用相关按钮并在后台线程中执行重试"""
+        if not codes or self.is_updating:
+            return
+        if not self.uk_var.get() and not self.ni_var.get():
+            messagebox.showwarning("警告", "请至少选择一项要更新的内容")
+            return
+        self.is_updating = True
+        self.update_btn.configure(state='disabled')
+        self.stop_btn.configure(state='normal')
+        self.retry_selected_btn.configure(state='disabled')
+        self.retry_all_btn.configure(state='disabled')
+        self.clear_failed_btn.configure(state='disabled')
+
+        self.progress_var.set(0)
 
-        # 在后台线程中执行重试
         thread = threading.Thread(
             target=self._retry_in_thread,
-            args=(codes,),
+            args=(codes, self.uk_var.get(), self.ni_var.get()),
             daemon=True
         )
         thread.start()
 
-    def _retry_in_thread(self, codes: List[str]):
+    def _retry_in_thread(self, codes: List[str], uk: bool, ni: bool):
         """在后台线程中执行重试"""
-        self.is_updating = True
-        self.update_btn.configure(state='disabled')
-        self.stop_btn.configure(state='normal')
-        self.retry_selected_btn.configure(state='disabled')
-        self.retry_all_btn.configure(state='disabled')
-
         try:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
-            loop.run_until_complete(self.retry_codes(codes))
+            loop.run_until_complete(self.retry_codes(codes, uk, ni))
             loop.close()
         finally:
             self.is_updating = False
-            self.queue.put((self._reset_update_ui, (), {}))
\ No newline at end of file
+            self.dispatcher.call(self._reset_update_ui)
\ No newline at end of file
@@ -19,7 +19,7 @@ class Scraper:
         }
         self.timeout = 30  # 请求超时时间
         self.max_retries = 3  # 最大重试次数
-        self.db = TariffDB()
+        self.db = TariffDB.get()
         self.progress_callback = None
         self.total_items = 0
         self.processed_items = 0
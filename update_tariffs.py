@@ -3,6 +3,8 @@ import logging
 from typing import Dict, List, Set, Optional, Tuple
 from tariff_db import TariffDB
 from tools.web_scraper import scrape_urls
+from bulk_retry import BulkRetry
+from optimizations import maintain_after_update
 from bs4 import BeautifulSoup
 import re
 
@@ -18,7 +20,7 @@ class TariffScraper:
         }
         self.timeout = 30
         self.max_retries = 3
-        self.db = TariffDB()
+        self.db = TariffDB.get()
         self.progress_callback = None
         self.total_items = 0
         self.processed_items = 0
@@ -186,6 +188,30 @@ class TariffScraper:
             logger.error(f"更新北爱尔兰关税数据失败: {str(e)}")
             return False
 
+    async def retry_codes(self, codes: List[str], uk: bool = True, ni: bool = True,
+                          on_outcome=None, max_concurrent: int = 8) -> List[Dict]:
+        """并发重试一组编码，返回每个编码的结果，见 BulkRetry.run"""
+        targets = []
+        if uk:
+            targets.append(("英国数据", self.uk_base_url, lambda code, data: self.db.update_uk_tariff(
+                code, data['description'], data['rate'], data['url']
+            )))
+        if ni:
+            targets.append(("北爱尔兰数据", self.ni_base_url, lambda code, data: self.db.update_north_ireland_tariff(
+                code, data['rate'], data['url']
+            )))
+
+        retry = BulkRetry(
+            self.parse_commodity_page,
+            targets,
+            headers=self.headers,
+            max_concurrent=max_concurrent,
+            max_attempts=self.max_retries,
+            timeout=self.timeout,
+            should_stop=self.check_should_stop
+        )
+        return await retry.run(codes, on_outcome)
+
     async def scrape_with_retry(self, urls: List[str]) -> List[str]:
         """带重试的抓取"""
         for retry in range(self.max_retries):
@@ -245,6 +271,7 @@ def main():
     loop = asyncio.get_event_loop()
     loop.run_until_complete(scraper.scrape_tariffs())
     loop.close()
+    maintain_after_update(scraper.db, log=logger.info)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,9 +3,14 @@ from tkinter import ttk, messagebox
 import webbrowser
 import logging
 import time
+import asyncio
+import threading
 import requests
 import sys
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ui_dispatcher import UIDispatcher
+from suggestion_cache import SuggestionCache, DEFAULT_CACHE_PATH
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -27,7 +32,8 @@ class WebSearchAPI:
 
     BASE_URL = "https://www.trade-tariff.service.gov.uk"
 
-    def __init__(self):
+    def __init__(self, cache: Optional[SuggestionCache] = None):
+        self.cache = cache
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
@@ -35,21 +41,67 @@ class WebSearchAPI:
         self.max_retries = 3
         self.retry_delay = 1
 
+    @property
+    def suggestions_url(self) -> str:
+        return f"{self.BASE_URL}/search_suggestions.json"
+
+    def _suggestion_params(self, code: str) -> Dict:
+        """搜索建议的请求参数"""
+        return {
+            'q': code,
+            'term': code,
+            # 添加额外参数以匹配官网行为
+            'suggestion_type': 'search',
+            'format': 'json'
+        }
+
+    def cached_suggestions(self, code: str) -> Optional[Tuple[bool, List[Dict] | str]]:
+        """从缓存中获取搜索建议，未命中时返回 None"""
+        if self.cache is None:
+            return None
+        results = self.cache.get(code)
+        if results is None:
+            return None
+        logger.debug(f"搜索建议命中缓存: code={code}")
+        return (True, results) if results else (False, "未找到搜索建议")
+
+    def _parse_suggestions(self, data, code: Optional[str] = None) -> Tuple[bool, List[Dict] | str]:
+        """从响应数据中取出建议列表，传入 code 时把结果写入缓存"""
+        success, results = self._extract_suggestions(data)
+        if code is not None and self.cache is not None and (success or results == "未找到搜索建议"):
+            self.cache.put(code, results if success else [])
+        return success, results
+
+    def _extract_suggestions(self, data) -> Tuple[bool, List[Dict] | str]:
+        if data:
+            # 检查不同的结果字段
+            results = data.get('results', [])
+            if not results and 'data' in data:
+                results = data['data']
+
+            if results:
+                logger.debug(f"找到 {len(results)} 个建议结果")
+                return True, results
+
+            logger.debug("API返回结果为空")
+            logger.debug(f"完整响应数据: {data}")
+            return False, "未找到搜索建议"
+
+        logger.debug("API返回数据为空")
+        return False, "API返回为空"
+
     def get_suggestions(self, code: str) -> Tuple[bool, List[Dict] | str]:
         """获取搜索建议"""
         logger.debug(f"开始获取搜索建议: code={code}")
+        cached = self.cached_suggestions(code)
+        if cached is not None:
+            return cached
 
         for attempt in range(self.max_retries):
             try:
                 # 构建请求URL和参数
-                url = f"{self.BASE_URL}/search_suggestions.json"
-                params = {
-                    'q': code,
-                    'term': code,
-                    # 添加额外参数以匹配官网行为
-                    'suggestion_type': 'search',
-                    'format': 'json'
-                }
+                url = self.suggestions_url
+                params = self._suggestion_params(code)
 
                 logger.debug(f"请求URL: {url}, 参数: {params}")
 
@@ -77,24 +129,7 @@ class WebSearchAPI:
                     logger.debug(f"原始响应内容: {response.text}")
                     return False, "响应格式错误"
 
-                if data:
-                    # 检查不同的结果字段
-                    results = data.get('results', [])
-                    if not results and 'data' in data:
-                        results = data['data']
-
-                    if results:
-                        logger.debug(f"找到 {len(results)} 个建议结果")
-                        for result in results:
-                            logger.debug(f"建议: {result}")
-                        return True, results
-
-                    logger.debug("API返回结果为空")
-                    logger.debug(f"完整响应数据: {data}")
-                    return False, "未找到搜索建议"
-
-                logger.debug("API返回数据为空")
-                return False, "API返回为空"
+                return self._parse_suggestions(data, code)
 
             except requests.exceptions.RequestException as e:
                 logger.error(f"获取搜索建议失败 (尝试 {attempt + 1}/{self.max_retries}): {str(e)}")
@@ -104,6 +139,34 @@ class WebSearchAPI:
                     continue
                 return False, f"请求失败: {str(e)}"
 
+    async def get_suggestions_async(self, session, code: str) -> Tuple[bool, List[Dict] | str]:
+        """在共享的 aiohttp 会话中获取搜索建议，返回值与 get_suggestions 相同
+
+        重试之间的等待可以被取消，被新输入取代的请求会立即结束
+        """
+        import aiohttp
+
+        cached = self.cached_suggestions(code)
+        if cached is not None:
+            return cached
+
+        for attempt in range(self.max_retries):
+            try:
+                async with session.get(self.suggestions_url, params=self._suggestion_params(code)) as response:
+                    response.raise_for_status()
+                    try:
+                        data = await response.json(content_type=None)
+                    except ValueError as e:
+                        logger.error(f"JSON解析失败: {str(e)}")
+                        return False, "响应格式错误"
+                return self._parse_suggestions(data, code)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"获取搜索建议失败 (尝试 {attempt + 1}/{self.max_retries}): {str(e)}")
+                if attempt < self.max_retries - 1:
+                    await asyncio.sleep(self.retry_delay)
+                    continue
+                return False, f"请求失败: {str(e) or type(e).__name__}"
+
     def get_url_by_type(self, item_type: str, item_id: str) -> str:
         """根据类型获取对应的URL
 
@@ -156,16 +219,131 @@ class WebSearchAPI:
         logger.debug(f"未找到完全匹配，使用搜索页面: {url}")
         return True, url, None
 
+class AsyncSuggestionClient:
+    """在后台事件循环中获取搜索建议
+
+    所有请求共用一个 aiohttp 会话（连接池）；新的请求会取消尚未完成的旧请求，
+    回调只会收到最新请求的结果。回调在后台线程中调用，界面需要自行切换到主线程。
+
+    Args:
+        api: 提供 get_suggestions_async 的接口
+        max_connections: 连接池大小
+    """
+
+    def __init__(self, api: WebSearchAPI, max_connections: int = 4):
+        self.api = api
+        self.max_connections = max_connections
+        self._session = None
+        self._future = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="web-suggestions", daemon=True)
+        self._thread.start()
+
+    def submit(self, code: str, callback: Callable) -> int:
+        """获取 code 的搜索建议，完成后调用 callback(code, generation, (success, data))
+
+        Returns:
+            本次请求的序号
+        """
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            if self._future:
+                self._future.cancel()
+            self._future = asyncio.run_coroutine_threadsafe(
+                self._fetch(code, generation, callback), self._loop
+            )
+        return generation
+
+    def cancel(self):
+        """取消正在进行的请求"""
+        with self._lock:
+            self._generation += 1
+            if self._future:
+                self._future.cancel()
+                self._future = None
+
+    def is_current(self, generation: int) -> bool:
+        return generation == self._generation
+
+    def close(self):
+        """取消请求，关闭会话并停止后台事件循环，重复调用时不做任何事"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self.cancel()
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_session(), self._loop).result(timeout=5)
+        except Exception as e:
+            logger.debug(f"关闭会话失败: {str(e)}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    async def _get_session(self):
+        if self._session is None:
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                headers=self.api.headers,
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.api.timeout)
+            )
+        return self._session
+
+    async def _close_session(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _fetch(self, code: str, generation: int, callback: Callable):
+        try:
+            session = await self._get_session()
+            result = await self.api.get_suggestions_async(session, code)
+        except asyncio.CancelledError:
+            logger.debug(f"已取消获取建议: {code}")
+            raise
+        except Exception as e:
+            logger.error(f"获取搜索建议失败: {str(e)}")
+            result = (False, f"请求失败: {str(e)}")
+        if self.is_current(generation):
+            callback(code, generation, result)
+
+
 class WebSearchUI:
-    """官网搜索UI组件"""
+    """官网搜索UI组件
+
+    Args:
+        parent: 父控件
+        status_var: 状态栏变量
+        tariff_api: 提供时优先从本地索引生成建议，不需要联网
+        remote_fallback: 本地没有建议时是否再请求官网
+    """
 
-    def __init__(self, parent: ttk.Frame, status_var: tk.StringVar):
+    def __init__(self, parent: ttk.Frame, status_var: tk.StringVar, tariff_api=None,
+                 remote_fallback: bool = False):
         self.parent = parent
         self.status_var = status_var
-        self.api = WebSearchAPI()
+        self.api = WebSearchAPI(cache=SuggestionCache(DEFAULT_CACHE_PATH))
+        self.local = None
+        if tariff_api is not None:
+            from local_suggestions import LocalSuggestionProvider
+            self.local = LocalSuggestionProvider(tariff_api)
+        self.remote_fallback = remote_fallback or self.local is None
         self.suggestion_results = {}
+        self.client = AsyncSuggestionClient(self.api)
+        self.dispatcher = UIDispatcher.for_widget(parent)
+        # 界面销毁时关闭会话和后台事件循环
+        parent.bind('<Destroy>', self._on_destroy, add='+')
         self._setup_ui()
 
+    def _on_destroy(self, event):
+        # 子控件销毁也会触发父控件上的绑定
+        if event.widget is self.parent:
+            self.client.close()
+
     def _setup_ui(self):
         """创建UI组件"""
         # 搜索框区域
@@ -239,11 +417,30 @@ class WebSearchUI:
 
         if len(code) < 4:
             logger.debug("输入长度不足4个字符，清空建议列表")
+            if hasattr(self, '_suggestion_timer'):
+                self.parent.after_cancel(self._suggestion_timer)
+            self.client.cancel()
             self._clear_suggestions()
             return
 
         if hasattr(self, '_suggestion_timer'):
             self.parent.after_cancel(self._suggestion_timer)
+
+        # 本地建议只需几毫秒，直接显示；没有结果且允许时再请求官网
+        if self.local is not None:
+            local = self.local.get_suggestions(code)
+            if local[0] or not self.remote_fallback:
+                self.client.cancel()
+                self._show_suggestions(local)
+                return
+
+        # 缓存命中时立即显示，不需要等待防抖
+        cached = self.api.cached_suggestions(code)
+        if cached is not None:
+            self.client.cancel()
+            self._show_suggestions(cached)
+            return
+
         logger.debug(f"设置防抖定时器: {code}")
         self._suggestion_timer = self.parent.after(300, self._fetch_suggestions, code)
 
@@ -254,9 +451,24 @@ class WebSearchUI:
         self.suggestion_results.clear()
 
     def _fetch_suggestions(self, code):
-        """获取搜索建议"""
+        """在后台获取搜索建议，不阻塞界面"""
         logger.debug(f"开始获取建议: {code}")
-        success, data = self.api.get_suggestions(code)
+        self.status_var.set("正在获取搜索建议...")
+        self.client.submit(code, self._on_suggestions)
+
+    def _on_suggestions(self, code, generation, result):
+        """后台请求完成，切换到主线程显示"""
+        self.dispatcher.latest((self, 'suggestions'), self._apply_suggestions, code, generation, result)
+
+    def _apply_suggestions(self, code, generation, result):
+        """显示最新一次请求的结果，过期的结果直接丢弃"""
+        if not self.client.is_current(generation) or code != self.code_var.get().strip():
+            return
+        self._show_suggestions(result)
+
+    def _show_suggestions(self, result):
+        """显示 (success, data) 形式的建议结果"""
+        success, data = result
 
         self._clear_suggestions()
 
@@ -267,6 +479,7 @@ class WebSearchUI:
             return
 
         logger.debug(f"成功获取建议，开始分组显示")
+        self.status_var.set(f"找到 {len(data)} 条搜索建议")
         self._display_suggestions(data)
 
     def _display_suggestions(self, data):
@@ -329,10 +542,33 @@ class WebSearchUI:
             messagebox.showwarning("警告", "请输入海关编码")
             return
 
+        url = self._local_url(code)
+        if url:
+            webbrowser.open(url)
+            self.status_var.set(f"已在浏览器中打开: {url}")
+            return
+        if not self.remote_fallback:
+            url = f"{self.api.BASE_URL}/find_commodity?q={code}"
+            webbrowser.open(url)
+            self.status_var.set(f"已在浏览器中打开: {url}")
+            return
+
         success, url, error = self.api.search(code)
         if not success:
             self.status_var.set("搜索建议获取失败，使用默认搜索页面")
             logger.error(f"搜索失败: {error}")
 
         webbrowser.open(url)
-        self.status_var.set(f"已在浏览器中打开: {url}")
\ No newline at end of file
+        self.status_var.set(f"已在浏览器中打开: {url}")
+
+    def _local_url(self, code: str) -> Optional[str]:
+        """本地有完全匹配的编码时直接生成链接"""
+        if self.local is None:
+            return None
+        success, data = self.local.get_suggestions(code)
+        if not success:
+            return None
+        exact = next((result for result in data if result['text'] == code), None)
+        if exact is None:
+            return None
+        return self.api.get_url_by_type(exact['formatted_suggestion_type'], exact['id'])